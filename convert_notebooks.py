@@ -1,40 +1,479 @@
-import sys
+import argparse
+import hashlib
+import json
 import logging
+import sys
+import time
+from copy import deepcopy
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+# Only modules that are quick to import are imported here, such that a build
+# with nothing to do finishes quickly. The remaining modules (and nbconvert)
+# are imported once a website needs to be built.
 from src import (load_config,
-                 NotebookFolder)
+                 write_latex_macros,
+                 write_search_content,
+                 site_libs_dir,
+                 collect_used_names,
+                 purge_stylesheets,
+                 AssetManifest,
+                 write_caching_rules,
+                 deny_web_access,
+                 write_page_hashes,
+                 write_service_worker,
+                 FilesystemSnapshot,
+                 CellCache,
+                 BuildStats,
+                 write_build_metrics,
+                 BuildHistory,
+                 BuildPlan,
+                 PreviewServer,
+                 ExporterPool,
+                 ConversionPipeline,
+                 parse_shard,
+                 assign_shards,
+                 write_shard_manifest,
+                 load_shard_manifests)
 
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-if __name__ == '__main__':
-    if len(sys.argv) == 1:
-        log.info('No config provided, using .\config.yml')
-        config_path = '.\config.yml'
-    else:
-        config_path = sys.argv[-1]
-        log.info(f'Using config {config_path}')
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description='Convert a hierarchy of Jupyter Notebooks into a website')
+    parser.add_argument('config_paths', nargs='*', metavar='config_path',
+                        help=r'Path to config file (default .\config.yml). '
+                             r'Multiple websites are built concurrently if '
+                             r'multiple config files are provided')
+    parser.add_argument('--rescan', action='store_true',
+                        help='Ignore the saved snapshot of the notebook '
+                             'directories, such that every directory is '
+                             'treated as changed')
+    parser.add_argument('--trusted', action='store_true',
+                        help='Read notebooks without schema validation using '
+                             'the fastest available JSON decoder')
+    parser.add_argument('--validate', action='store_true',
+                        help='Only validate all notebooks against the '
+                             'nbformat schema, without converting them')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse and render every notebook instead of '
+                             'using cached notebook metadata and HTML cells')
+    parser.add_argument('--plan', action='store_true',
+                        help='Only list the pages and files that a build '
+                             'would regenerate and why, with an estimate of '
+                             'the conversion time and output size')
+    parser.add_argument('--report', action='store_true',
+                        help='Only show the recorded build history, with the '
+                             'pages whose conversion time or size jumped '
+                             'between builds')
+    parser.add_argument('--serve', type=int, nargs='?', const=8000,
+                        default=None, metavar='PORT',
+                        help='Serve a preview of the website of the first '
+                             'config (default port 8000), rendering each page '
+                             'once it is requested')
+    parser.add_argument('--shard', default=None, metavar='i/N',
+                        help='Only convert shard i of N of the notebooks and '
+                             'write a shard manifest. Index pages and search '
+                             'content are created afterwards using --merge N')
+    parser.add_argument('--merge', type=int, default=None, metavar='N',
+                        help='Merge the output of N shards by creating the '
+                             'index pages and search content')
+    return parser.parse_args(args)
+
+
+def get_build_fingerprint(config: dict, snapshot: FilesystemSnapshot, args) -> str:
+    """Fingerprint of everything the output of a build depends on
+
+    This includes the config, the notebook directories, the converter code,
+    templates and site-libs (which are copied to the website when
+    fingerprinting assets or purging CSS), and the command line arguments
+    that affect the output.
+    """
+    fingerprint = hashlib.sha1(json.dumps(config, sort_keys=True,
+                                          default=str).encode('utf-8'))
+    fingerprint.update(snapshot.fingerprint().encode('utf-8'))
+
+    converter_dir = Path(__file__).absolute().parent
+    template_dir = config['template'].get('template_dir', converter_dir / 'templates')
+    filepaths = [Path(__file__).absolute(),
+                 *converter_dir.glob('src/*.py'),
+                 *Path(template_dir).rglob('*'),
+                 *site_libs_dir.rglob('*')]
+    for filepath in sorted(filepaths):
+        stat = filepath.stat()
+        fingerprint.update(f'{filepath}:{stat.st_size}:{stat.st_mtime}'.encode('utf-8'))
+
+    fingerprint.update(f'{args.trusted}:{args.no_cache}'.encode('utf-8'))
+    return fingerprint.hexdigest()
+
+
+def get_inputs_mtime(config_path, config: dict) -> float:
+    """Latest modification time of the config and templates"""
+    template_dir = Path(config['template']['template_dir'])
+    filepaths = [Path(config_path), *template_dir.rglob('*')]
+    if 'latex_macros_file' in config:
+        filepaths.append(config['base_dir'] / config['latex_macros_file'])
+    return max(filepath.stat().st_mtime for filepath in filepaths)
+
+
+def plan_build(log_notebook_structure, config_path, config: dict,
+               target_dir: Path, costs_path: Path) -> BuildPlan:
+    """Determine what a build would regenerate, see BuildPlan"""
+    plan = BuildPlan(target_dir,
+                     costs=BuildStats.load_costs(costs_path),
+                     inputs_mtime=get_inputs_mtime(config_path, config))
+    plan.plan_notebooks(log_notebook_structure.iter_pages())
+    plan.plan_index_pages(log_notebook_structure.iter_index_notebooks())
+    plan.plan_search_content()
+    if config['template'].get('latex_macros'):
+        plan.plan_assets(['latex_macros.js'])
+    if config['template'].get('lean'):
+        # Unused CSS is purged based on the names used by all pages
+        filenames = ['jt.css', f'{config["template"]["theme"]}.min.css']
+        if config.get('fingerprint_assets'):
+            asset_manifest = AssetManifest(target_dir,
+                                           site_depth=config['template']['site_depth'])
+            paths = [asset_manifest.purged_url(filename) for filename in filenames]
+        else:
+            paths = [f'css/{filename}' for filename in filenames]
+        plan.plan_assets(paths, depends_on_pages=True)
+    return plan
+
+
+def build_website(config_path, args, cell_cache: CellCache = None,
+                  exporter_pool: ExporterPool = None) -> bool:
+    """Build the website of a single config
+
+    Args:
+        config_path: Path to config file
+        args: Parsed command line arguments, see parse_args
+        cell_cache: Cache of rendered HTML cells, may be shared between
+            websites. Only used if --no-cache is not passed.
+        exporter_pool: Pool of exporters, may be shared between websites
+
+    Returns:
+        False if any notebook is invalid when using --validate, else True
+    """
+    t0 = time.perf_counter()
+    log.info(f'Using config {config_path}')
     config = load_config(config_path)
+    cache_dir = config['cache_dir'] / config['name']
+    html_target_dir = config['html_target_dir'] / config['name']
+    # Build information that is shared between machines is kept with the output
+    build_dir = html_target_dir / '.build'
+    costs_path = build_dir / BuildStats.costs_filename
+    build_stats = BuildStats()
+
+    log.info('Scanning notebook directories')
+    with build_stats.phase('scan'):
+        snapshot_path = cache_dir / 'filesystem_snapshot.json'
+        previous_snapshot = None if args.rescan else FilesystemSnapshot.load(snapshot_path)
+        snapshot = FilesystemSnapshot(config['base_dir'])
+        snapshot.scan(previous=previous_snapshot)
+
+    # Builds of all pages are skipped if nothing changed since the last build.
+    # A plan is always shown, also if nothing changed.
+    fingerprint_path = cache_dir / 'build_fingerprint'
+    fingerprint = None
+    if (args.shard is None and args.merge is None
+            and not args.validate and not args.plan):
+        fingerprint = get_build_fingerprint(config, snapshot, args)
+        if (html_target_dir.exists() and fingerprint_path.exists()
+                and fingerprint_path.read_text() == fingerprint):
+            log.info('Nothing changed since the last build')
+            build_stats.record_skipped(snapshot.count_files('.ipynb'))
+            if config.get('metrics_dir'):
+                write_build_metrics(config['metrics_dir'], config['name'],
+                                    build_stats=build_stats,
+                                    duration=time.perf_counter() - t0,
+                                    snapshot=snapshot,
+                                    up_to_date=True)
+            return True
+
+    from src import BuildContext, NotebookCache, NotebookFolder, Watchdog
+
+    context = BuildContext(config['base_dir'],
+                           name=config['name'],
+                           snapshot=snapshot,
+                           # Notebooks are validated separately when using
+                           # --validate, and are not rendered when using --plan
+                           trusted_read=args.trusted or args.validate or args.plan,
+                           build_stats=build_stats)
+    if not args.no_cache:
+        context.notebook_cache = NotebookCache(cache_dir)
+        context.cell_cache = cell_cache
+
+    if args.merge is not None:
+        log.info(f'Loading manifests of {args.merge} shards')
+        # Notebook metadata of shards is added to the cache, such that the
+        # notebooks do not need to be parsed again
+        for manifest in load_shard_manifests(build_dir / 'shards', args.merge):
+            if context.notebook_cache is not None:
+                context.notebook_cache.import_entries(manifest['notebooks'])
+            context.build_stats.notebooks.update(manifest['costs'])
 
     log.info('Parsing notebooks into LogFolder and LogNotebook objects')
-    log_notebook_structure = NotebookFolder(path=config['base_dir'],
-                                            name=config['name'],
-                                            sections=config['sections'])
+    with build_stats.phase('parse'):
+        log_notebook_structure = NotebookFolder(path=context.base_dir,
+                                                name=config['name'],
+                                                sections=config['sections'],
+                                                context=context)
+    # A plan is a dry run, which does not modify the cache
+    if not args.plan:
+        snapshot.save(snapshot_path)
+        if context.notebook_cache is not None:
+            context.notebook_cache.save()
+
+    if args.validate:
+        log.info('Validating notebooks')
+        invalid_notebooks = log_notebook_structure.validate_notebooks()
+        log.info(f'{len(invalid_notebooks)} invalid notebooks found')
+        return not invalid_notebooks
 
     log.info('Creating index notebooks')
-    log_notebook_structure.compile_index_notebook()
+    with build_stats.phase('index'):
+        log_notebook_structure.compile_index_notebook(**config.get('index_pages', {}))
+
+    if args.plan:
+        plan = plan_build(log_notebook_structure, config_path, config,
+                          target_dir=html_target_dir, costs_path=costs_path)
+        print(f'Build plan of {config["name"]}:\n{plan.format()}')
+        return True
+
+    # Assets referenced by pages are fingerprinted while rendering
+    asset_manifest = None
+    if config.get('fingerprint_assets'):
+        asset_manifest = AssetManifest(html_target_dir,
+                                       site_depth=config['template']['site_depth'])
+        config['template']['assets'] = asset_manifest
 
     log.info('Generating templates')
-    log_notebook_structure.generate_template(config=config['template'])
+    with build_stats.phase('templates'):
+        log_notebook_structure.generate_template(config=config['template'])
+    if config['template'].get('latex_macros'):
+        write_latex_macros(config['template']['latex_macros'],
+                           save_path=html_target_dir / 'latex_macros.js')
+    # Notebooks exceeding a limit are replaced by a placeholder page
+    watchdog = Watchdog(**config.get('watchdog', {}))
+    pipeline = ConversionPipeline(target_dir=html_target_dir,
+                                  exporter_pool=exporter_pool,
+                                  watchdog=watchdog,
+                                  **config.get('pipeline', {}))
+
+    if args.shard is not None:
+        shard_index, num_shards = parse_shard(args.shard)
+        notebooks = list(log_notebook_structure.iter_pages())
+        shards = assign_shards(notebooks,
+                               num_shards=num_shards,
+                               costs=BuildStats.load_costs(costs_path))
+        shard_notebooks = shards[shard_index - 1]
+        build_stats.record_skipped(len(notebooks) - len(shard_notebooks))
+
+        log.info(f'Converting {len(shard_notebooks)} log notebooks of shard '
+                 f'{shard_index}/{num_shards} to HTML')
+        with watchdog, build_stats.phase('convert'):
+            pipeline.run(shard_notebooks)
+
+        deny_web_access(build_dir)
+        write_shard_manifest(build_dir / 'shards',
+                             shard_index=shard_index,
+                             num_shards=num_shards,
+                             notebooks=shard_notebooks,
+                             costs=context.build_stats.notebooks)
+        if asset_manifest is not None:
+            asset_manifest.save(prune=False)
+    else:
+        if args.merge is None:
+            log.info('Converting log notebooks to HTML')
+            with watchdog, build_stats.phase('convert'):
+                pipeline.run(log_notebook_structure.iter_pages())
+        else:
+            # Notebooks were converted by the shards
+            build_stats.record_skipped(len(list(log_notebook_structure.iter_pages())))
+
+        log.info('Converting index notebooks to HTML')
+        with watchdog, build_stats.phase('convert_index'):
+            pipeline.run(log_notebook_structure.iter_index_notebooks())
 
-    log.info('Converting log notebooks to HTML')
-    log_notebook_structure.convert_to_HTML(target_dir=config['html_target_dir'] / config['name'])
+        log.info('Generating HTML Tipuesearch content')
+        with build_stats.phase('search'):
+            write_search_content(log_notebook_structure.generate_tipuesearch_content(),
+                                 target_dir=html_target_dir)
 
-    log.info('Generating HTML Tipuesearch content')
-    log_notebook_structure.generate_tipuesearch_content(
-        save_path=config['html_target_dir'] / config['name'] / 'tipuesearch_content.js')
+        if config['template'].get('lean'):
+            log.info('Purging unused CSS')
+            with build_stats.phase('purge_css'):
+                used_names = collect_used_names(
+                    pages=html_target_dir.rglob('*.html'),
+                    scripts=[*site_libs_dir.glob('js/*.js'),
+                             site_libs_dir / 'site_libs/jquery-3.3.1.min.js',
+                             site_libs_dir / 'site_libs/jquery-ui-1.12.1/jquery-ui.js',
+                             *site_libs_dir.glob('site_libs/tipuesearch/*.js'),
+                             *site_libs_dir.glob('site_libs/bootstrap-3.3.5/js/*.js')],
+                    # Lazily loaded summaries of index pages
+                    fragments=html_target_dir.rglob('*.summaries.json'))
+                theme = config['template']['theme']
+                purge_stylesheets(
+                    {'jt.css': 'css/jt.css',
+                     f'{theme}.min.css': f'site_libs/bootstrap-3.3.5/css/{theme}.min.css'},
+                    target_dir=html_target_dir,
+                    used_names=used_names,
+                    site_depth=config['template']['site_depth'],
+                    asset_manifest=asset_manifest)
+                if asset_manifest is not None:
+                    asset_manifest.update_purged_urls(html_target_dir.rglob('*.html'))
+
+        if config['template'].get('service_worker'):
+            log.info('Writing page hashes and service worker')
+            with build_stats.phase('service_worker'):
+                write_page_hashes(html_target_dir)
+                write_service_worker(
+                    html_target_dir,
+                    precache_urls=asset_manifest.urls if asset_manifest is not None else [])
+
+        if asset_manifest is not None:
+            log.info('Writing asset manifest and caching rules')
+            with build_stats.phase('assets'):
+                # Assets of other shards are only known if all pages were converted
+                asset_manifest.save(prune=args.merge is None)
+                write_caching_rules(html_target_dir,
+                                    nginx_path=build_dir / 'nginx_caching.conf')
+
+        # Build information is kept with the output, but is not served
+        deny_web_access(build_dir)
+        context.build_stats.save_costs(costs_path)
+        context.build_stats.save_report(build_dir / BuildStats.report_filename)
+        BuildHistory(build_dir / BuildHistory.filename).record(
+            context.build_stats, duration=time.perf_counter() - t0)
+
+        # Pages that failed to convert are converted again in the next build
+        if fingerprint is not None and not pipeline.failures:
+            fingerprint_path.write_text(fingerprint)
+
+    if context.notebook_cache is not None:
+        context.notebook_cache.save()
+
+    if config.get('metrics_dir'):
+        write_build_metrics(config['metrics_dir'], config['name'],
+                            build_stats=build_stats,
+                            duration=time.perf_counter() - t0,
+                            snapshot=snapshot,
+                            notebook_cache=context.notebook_cache,
+                            cell_cache=context.cell_cache)
 
     log.info('Converting log notebooks to PDF')
     # log_notebook_structure.convert_to_PDF(target_dir=config['pdf_target_dir'])
     # Hannes_notebook = log_notebook_structure.notebook_folders[1].notebooks[3]
     # Hannes_notebook.convert_to_PDF(target_dir=config['pdf_target_dir'])
+
+    return True
+
+
+def report_website(config_path):
+    """Print the build history of a website, see BuildHistory"""
+    config = load_config(config_path)
+    build_dir = config['html_target_dir'] / config['name'] / '.build'
+    history = BuildHistory(build_dir / BuildHistory.filename)
+    print(f'Build history of {config["name"]}:\n'
+          f'{history.format_report(**config.get("build_history", {}))}')
+
+
+def serve_website(config_path, args, cell_cache: CellCache = None,
+                  exporter_pool: ExporterPool = None):
+    """Serve a preview of a website, rendering pages once requested
+
+    Pages are saved in the preview folder of the cache dir, and are not
+    fingerprinted, purged or cached by a service worker.
+    """
+    from src import BuildContext, NotebookCache, NotebookFolder
+
+    config = load_config(config_path)
+    cache_dir = config['cache_dir'] / config['name']
+    preview_dir = config['cache_dir'] / 'preview' / config['name']
+    notebook_cache = None if args.no_cache else NotebookCache(cache_dir)
+    template_config = {**config['template'], 'lean': False, 'service_worker': False}
+
+    def load_notebook_folder(previous_snapshot: FilesystemSnapshot = None):
+        snapshot = FilesystemSnapshot(config['base_dir'])
+        snapshot.scan(previous=previous_snapshot)
+
+        context = BuildContext(config['base_dir'],
+                               name=config['name'],
+                               snapshot=snapshot,
+                               trusted_read=args.trusted,
+                               notebook_cache=notebook_cache,
+                               cell_cache=cell_cache)
+
+        log.info('Parsing notebooks into LogFolder and LogNotebook objects')
+        log_notebook_structure = NotebookFolder(path=context.base_dir,
+                                                name=config['name'],
+                                                sections=config['sections'],
+                                                context=context)
+        log_notebook_structure.compile_index_notebook(**config.get('index_pages', {}))
+        log_notebook_structure.generate_template(config=deepcopy(template_config))
+        return log_notebook_structure
+
+    snapshot_path = cache_dir / 'filesystem_snapshot.json'
+    log_notebook_structure = load_notebook_folder(
+        previous_snapshot=None if args.rescan else FilesystemSnapshot.load(snapshot_path))
+    if template_config.get('latex_macros'):
+        write_latex_macros(template_config['latex_macros'],
+                           save_path=preview_dir / 'latex_macros.js')
+
+    def reload():
+        # Only directories that changed are listed again
+        return load_notebook_folder(previous_snapshot=preview.notebook_folder.snapshot)
+
+    preview = PreviewServer(log_notebook_structure,
+                            target_dir=preview_dir,
+                            site_depth=template_config['site_depth'],
+                            exporter_pool=exporter_pool,
+                            reload=reload,
+                            port=args.serve)
+    preview.serve_forever()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if not args.config_paths:
+        log.info('No config provided, using .\config.yml')
+        args.config_paths = ['.\config.yml']
+
+    if args.report:
+        for config_path in args.config_paths:
+            report_website(config_path)
+        sys.exit()
+
+    # Exporters and rendered cells are shared by all websites. Pages are not
+    # rendered when only showing a plan, which leaves the cache untouched.
+    config = load_config(args.config_paths[0])
+    exporter_pool = ExporterPool(
+        template_cache_dir=None if args.plan else config['cache_dir'] / 'templates')
+    cell_cache = None
+    if not args.no_cache and not args.plan:
+        cell_cache = CellCache(config['cache_dir'] / 'cells',
+                               max_size=config.get('cell_cache_size', 256) * 1e6)
+
+    if args.serve is not None:
+        serve_website(args.config_paths[0], args,
+                      cell_cache=cell_cache,
+                      exporter_pool=exporter_pool)
+        if cell_cache is not None:
+            cell_cache.save()
+        sys.exit()
+
+    # Websites are built concurrently
+    with ThreadPoolExecutor(max_workers=len(args.config_paths)) as executor:
+        futures = [executor.submit(build_website, config_path, args,
+                                   cell_cache=cell_cache,
+                                   exporter_pool=exporter_pool)
+                   for config_path in args.config_paths]
+        results = [future.result() for future in futures]
+
+    if cell_cache is not None:
+        cell_cache.save()
+
+    if not all(results):
+        sys.exit(1)
@@ -5,8 +5,16 @@ import json
 import subprocess
 import collections
 from hashlib import sha1
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
 from dateutil.parser import parse
 from bs4 import BeautifulSoup
+# lxml parses pages in C, otherwise headers are extracted with the
+# streaming parser of the standard library
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
 
 def is_date(string):
     try:
@@ -82,26 +90,89 @@ def get_notebook_link(repo, cid, fn):
     else:
         return '<code>{}</code>'.format(fn)
 
+COMMITS_CACHE = '.sos/jnbinder_commits.json'
+_git_repos = {}
+_file_commits = {}
+
+def get_git_repo():
+    '''Return (root directory, HEAD commit id) of the git repository of the
+    working directory, looked up once per process.'''
+    cwd = os.getcwd()
+    if cwd not in _git_repos:
+        _git_repos[cwd] = tuple(get_output('git rev-parse --show-toplevel HEAD').splitlines())
+    return _git_repos[cwd]
+
+def collect_file_commits(cache_file=COMMITS_CACHE):
+    '''
+    Return {path relative to repo root: {"long", "short", "author", "date",
+    "revisions"}} for every file in the git history, collected in a single
+    streaming `git log --name-only` pass instead of several git commands per
+    file. Results are cached in memory and in cache_file by HEAD commit id,
+    so they are only collected again after a new commit.
+    '''
+    head = get_git_repo()[1]
+    if head in _file_commits:
+        return _file_commits[head]
+    if cache_file and os.path.isfile(cache_file):
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+            if cache.get('head') == head:
+                _file_commits[head] = cache['files']
+                return cache['files']
+        except (ValueError, KeyError):
+            pass
+    files = {}
+    commit = None
+    # commits are separated by \x1e and their fields by \x1f, followed by
+    # the names of the files changed by the commit, newest commit first
+    proc = subprocess.Popen(['git', '-c', 'core.quotepath=off', 'log', '--name-only',
+                             '--date=local', '--pretty=format:%x1e%H%x1f%h%x1f%an%x1f%cd'],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    for line in proc.stdout:
+        line = line.decode('utf-8', errors='replace').rstrip('\n')
+        if line.startswith('\x1e'):
+            commit = dict(zip(['long', 'short', 'author', 'date'], line[1:].split('\x1f')))
+        elif line and commit is not None:
+            if line in files:
+                files[line]['revisions'] += 1
+            else:
+                files[line] = dict(commit, revisions=1)
+    if proc.wait() != 0:
+        raise RuntimeError('git log failed with exit code {}'.format(proc.returncode))
+    _file_commits[head] = files
+    if cache_file:
+        os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+        with open(cache_file, 'w') as f:
+            json.dump({'head': head, 'files': files}, f)
+    return files
+
 def get_commit_info(fn, conf):
     out = ''
     if conf['add_commit_info']:
         try:
-            long_fmt = get_output('git log -n 1 --pretty=format:%H -- {}'.format(fn))
-            short_fmt = get_output('git log -n 1 --pretty=format:%h -- {}'.format(fn))
+            # git log lists paths relative to the repo root
+            root = get_git_repo()[0]
+            files = collect_file_commits()
+        except (RuntimeError, OSError):
+            # git is not installed, or this is not a git repo with commits
+            return out
+        path = os.path.relpath(os.path.abspath(fn), os.path.abspath(root)).replace(os.sep, '/')
+        # files that were never committed have no commit info
+        info = files.get(path)
+        if info is not None:
+            long_fmt = info['long']
+            short_fmt = info['short']
             rev_string = 'by {} on {} <a href=\\"{}\\">revision {}, {}</a>'.\
-                       format(get_output('git log -n 1 --format="%an" {}'.format(long_fmt)),
-                              get_output('git show -s --format="%cd" --date=local {}'.format(long_fmt)),
+                       format(info['author'],
+                              info['date'],
                               get_commit_link(conf['repo'], long_fmt),
-                              get_output('git log --oneline {} | wc -l'.format(fn)), short_fmt)
+                              info['revisions'], short_fmt)
             out = '<p><small>Exported from {} committed {} {}</small></p>'.\
                   format(get_notebook_link(conf['repo'], long_fmt, fn), rev_string,
                          '<a href=\\"{}\\">{}</a>'.\
                          format(conf['__about_commit__'], '<span class=\\"fa fa-question-circle\\"></span>')
                          if conf['__about_commit__'] else '')
-        except:
-            # if git related command fails, indicating it is not a git repo
-            # I'll just pass ...
-            pass
     return out.replace('/', '\/')
 
 def get_nav(dirs, home_label, prefix = './'):
@@ -966,6 +1037,70 @@ def make_template(conf, dirs, outdir):
         with open('{}/{}.tpl'.format(outdir, item), 'w') as f:
             f.write(get_notebook_tpl(conf, dirs, item).strip())
 
+FIRST_CELL_RE = re.compile(r'\s*\{\s*"cells"\s*:\s*\[\s*')
+
+def read_first_cell(fn, chunk_size=65536):
+    '''
+    Return the first cell of a notebook, or None if it has no cells, without
+    reading the rest of the notebook (e.g. images in outputs). Notebooks
+    saved by Jupyter start with their cells, other notebooks are read fully.
+    '''
+    decoder = json.JSONDecoder()
+    with open(fn, encoding='utf-8') as f:
+        text = f.read(chunk_size)
+        match = FIRST_CELL_RE.match(text)
+        if match is None:
+            cells = json.loads(text + f.read())['cells']
+            return cells[0] if cells else None
+        start = match.end()
+        while True:
+            if text[start:start + 1] == ']':
+                return None
+            try:
+                return decoder.raw_decode(text, start)[0]
+            except ValueError:
+                # first cell is not complete yet, read more
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                text += chunk
+                chunk_size *= 2
+
+def get_source_lines(cell):
+    '''Return the source of a cell as a list of lines'''
+    if cell is None:
+        return []
+    source = cell.get('source', [])
+    return source.splitlines(True) if isinstance(source, str) else source
+
+def markdown_cell(*source):
+    return {"cell_type": "markdown", "metadata": {}, "source": list(source)}
+
+NOTEBOOK_METADATA = {
+    "kernelspec": {
+        "display_name": "Python 3",
+        "language": "python",
+        "name": "python3"
+    },
+    "language_info": {
+        "codemirror_mode": {
+            "name": "ipython",
+            "version": 3
+        },
+        "file_extension": ".py",
+        "mimetype": "text/x-python",
+        "name": "python",
+        "nbconvert_exporter": "python",
+        "pygments_lexer": "ipython3",
+        "version": "3.6.0"
+    }
+}
+
+def make_nb(cells):
+    '''Return the JSON of a notebook with a list of cells'''
+    return json.dumps({"cells": cells, "metadata": NOTEBOOK_METADATA,
+                       "nbformat": 4, "nbformat_minor": 2}, indent=1, ensure_ascii=False)
+
 def get_notebook_toc(path, exclude):
     map1 = dict()
     map2 = dict()
@@ -973,12 +1108,11 @@ def get_notebook_toc(path, exclude):
         if os.path.basename(fn) in ['_index.ipynb', 'index.ipynb'] or fn in exclude:
             continue
         name = os.path.basename(fn[:-6]).strip()
-        with open(fn) as f:
-            data = json.load(f)
+        source = get_source_lines(read_first_cell(fn))
         try:
             idx = 0
             while True:
-                title = data["cells"][0]["source"][idx].strip()
+                title = source[idx].strip()
                 if title:
                     break
                 idx += 1
@@ -1030,25 +1164,9 @@ def get_toc(path, exclude):
 
 def make_index_nb(path, exclude, long_description = False, reverse_alphabet = False):
     sos_files = [x for x in sorted(glob.glob(os.path.join(path, "*.sos")), reverse = reverse_alphabet) if not x in exclude]
-    out = '''
-{
- "cells": [
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "# %s"
-   ]
-  },''' % os.path.basename(path.capitalize())
+    cells = [markdown_cell("# %s" % os.path.basename(path.capitalize()))]
     if len(sos_files):
-        out += '''
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "## Notebooks"
-   ]
-  },'''
+        cells.append(markdown_cell("## Notebooks"))
     date_section = None
     add_date_section = False
     for fn in sorted(glob.glob(os.path.join(path, "*.ipynb")), reverse = reverse_alphabet):
@@ -1059,10 +1177,8 @@ def make_index_nb(path, exclude, long_description = False, reverse_alphabet = Fa
         if is_date(tmp) and date_section != tmp:
             date_section = tmp
             add_date_section = True
-        with open(fn) as f:
-            data = json.load(f)
         try:
-            source = [x.strip() for x in data["cells"][0]["source"] if x.strip()]
+            source = [x.strip() for x in get_source_lines(read_first_cell(fn)) if x.strip()]
             if long_description and source[0].startswith('#') and len(source) >= 2 and not source[1].startswith('#'):
                 title = source[0].lstrip('#').strip()
                 description = source[1].lstrip('#').strip()
@@ -1073,111 +1189,21 @@ def make_index_nb(path, exclude, long_description = False, reverse_alphabet = Fa
             continue
         if add_date_section:
             add_date_section = False
-            out += '''
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "### %s\\n"
-   ]
-  },''' % date_section
+            cells.append(markdown_cell("### %s\n" % date_section))
+        link = "[**%s**](%s/%s)<br>" % (title, path, os.path.splitext(os.path.basename(fn))[0] + '.html')
         if title != description:
-            out += '''
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "[**%s**](%s/%s)<br>\\n",
-    %s
-   ]
-  },''' % (title, path, os.path.splitext(os.path.basename(fn))[0] + '.html', json.dumps("&nbsp; &nbsp;" + description))
+            cells.append(markdown_cell(link + "\n", "&nbsp; &nbsp;" + description))
         else:
-            out += '''
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "[**%s**](%s/%s)<br>"
-   ]
-  },''' % (title, path, os.path.splitext(os.path.basename(fn))[0] + '.html')
+            cells.append(markdown_cell(link))
     if len(sos_files):
-        out += '''
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "## Pipelines"
-   ]
-  },'''
+        cells.append(markdown_cell("## Pipelines"))
     for fn in sos_files:
         name = os.path.splitext(os.path.basename(fn))[0].replace('_', ' ')
-        out += '''
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "[%s](%s/%s)"
-   ]
-  },''' % (name, path, os.path.splitext(os.path.basename(fn))[0] + '.pipeline.html')
-    out = out.strip(',') + '''
- ],
- "metadata": {
-  "kernelspec": {
-   "display_name": "Python 3",
-   "language": "python",
-   "name": "python3"
-  },
-  "language_info": {
-   "codemirror_mode": {
-    "name": "ipython",
-    "version": 3
-   },
-   "file_extension": ".py",
-   "mimetype": "text/x-python",
-   "name": "python",
-   "nbconvert_exporter": "python",
-   "pygments_lexer": "ipython3",
-   "version": "3.6.0"
-  }
- },
- "nbformat": 4,
- "nbformat_minor": 2
-}'''
-    return out.strip()
+        cells.append(markdown_cell("[%s](%s/%s)" % (name, path, os.path.splitext(os.path.basename(fn))[0] + '.pipeline.html')))
+    return make_nb(cells)
 
 def make_empty_nb(name):
-    return '''{
- "cells": [
-  {
-   "cell_type": "markdown",
-   "metadata": {},
-   "source": [
-    "# Welcome to %s!"
-   ]
-  }
- ],
- "metadata": {
-  "kernelspec": {
-   "display_name": "Python 3",
-   "language": "python",
-   "name": "python3"
-  },
-  "language_info": {
-   "codemirror_mode": {
-    "name": "ipython",
-    "version": 3
-   },
-   "file_extension": ".py",
-   "mimetype": "text/x-python",
-   "name": "python",
-   "nbconvert_exporter": "python",
-   "pygments_lexer": "ipython3",
-   "version": "3.6.0"
-  }
- },
- "nbformat": 4,
- "nbformat_minor": 2
-}''' % name
+    return make_nb([markdown_cell("# Welcome to %s!" % name)])
 
 def protect_page(page, page_tpl, password, write):
     # page: docs/{name}
@@ -1257,10 +1283,142 @@ def parse_html(url, html):
             all_text.append(part)
     return all_text
 
-def generate_tipue_content(html_files, base_url, docs_dir):
+HEADER_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+TIPUE_CACHE = '.sos/jnbinder_tipue.json'
+
+class HeaderParser(HTMLParser):
+    '''
+    Streaming parser that only keeps the title and the headers of a page,
+    as [{"level", "text", "id", "anchor"}, ...] in document order, where id
+    is that of the first link with an id in the header, and anchor the href
+    of the first anchor-link.
+    '''
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.headers = []
+        self._header = None
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in HEADER_TAGS and self._header is None:
+            self._header = {'level': tag, 'text': '', 'id': None, 'anchor': None}
+        elif tag == 'title' and self.title is None:
+            self._in_title = True
+            self.title = ''
+        elif tag == 'a' and self._header is not None:
+            if attrs.get('id') and self._header['id'] is None:
+                self._header['id'] = attrs['id']
+            if 'anchor-link' in (attrs.get('class') or '').split() and self._header['anchor'] is None:
+                self._header['anchor'] = attrs.get('href')
+
+    def handle_endtag(self, tag):
+        if self._header is not None and tag == self._header['level']:
+            self.headers.append(self._header)
+            self._header = None
+        elif tag == 'title':
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._header is not None:
+            self._header['text'] += data
+        elif self._in_title:
+            self.title += data
+
+def get_headers(data):
+    '''Return the title (None if missing) and headers of a page, see HeaderParser'''
+    if lxml is not None:
+        doc = lxml.html.document_fromstring(data, parser=lxml.html.HTMLParser(encoding='utf-8'))
+        title = doc.find('.//title')
+        headers = []
+        for header in doc.iter(*HEADER_TAGS):
+            ids = [a.get('id') for a in header.iter('a') if a.get('id')]
+            anchors = [a.get('href') for a in header.iter('a')
+                       if 'anchor-link' in (a.get('class') or '').split()]
+            headers.append({'level': header.tag, 'text': header.text_content(),
+                            'id': ids[0] if ids else None,
+                            'anchor': anchors[0] if anchors else None})
+        return (title.text_content() if title is not None else None), headers
+    parser = HeaderParser()
+    parser.feed(data.decode('utf-8', errors='replace'))
+    parser.close()
+    return parser.title, parser.headers
+
+def parse_html_headers(url, html, data=None):
+    '''
+    Fast version of parse_html that only looks at the header elements,
+    returning tipue entries as dicts instead of JSON strings.
+    '''
+    if data is None:
+        with open(html, 'rb') as f:
+            data = f.read()
+    title, headers = get_headers(data)
+    maintitle = None
+    for level in ('h1', 'h2'):
+        maintitle = next((header['text'] for header in headers if header['level'] == level), None)
+        if maintitle is not None:
+            break
+    if maintitle is None:
+        maintitle = title if title is not None else os.path.basename(html).rsplit('.')[0]
+    entries = []
+    for header in headers:
+        # remove special character
+        part = re.sub(r'[^a-zA-Z0-9_\-=\'".,\\]', ' ', header['text']).replace('"', "'").strip() + "\n"
+        part = re.sub(r'\s+', ' ', part)
+        if header['id']:
+            tag = '#' + header['id']
+        else:
+            tag = header['anchor'] or ''
+        entries.append({"mainTitle": maintitle.replace('¶', ''), "title": header['text'].replace('¶', ''),
+                        "text": part, "tags": "", "mainUrl": url, "url": url + tag})
+    return entries
+
+def _parse_html_task(task):
+    url, html, data = task
+    return parse_html_headers(url, html, data)
+
+def generate_tipue_content(html_files, base_url, docs_dir, fast = True, workers = None, cache_file = TIPUE_CACHE):
     # input is a list of html files and their url
     n = len(docs_dir)
-    text = [parse_html(url, html) for (url, html) in [(os.path.join(base_url, item[len(docs_dir):]), item) for item in html_files]]
+    pages = [(os.path.join(base_url, item[len(docs_dir):]), item) for item in html_files]
+    if fast:
+        # pages whose content and url are unchanged are not parsed again
+        cache = {}
+        if cache_file and os.path.isfile(cache_file):
+            try:
+                with open(cache_file) as f:
+                    cache = json.load(f)
+            except ValueError:
+                pass
+        entries = {}
+        tasks = []
+        hashes = {}
+        for url, html in pages:
+            with open(html, 'rb') as f:
+                data = f.read()
+            hashes[html] = sha1(data).hexdigest()
+            cached = cache.get(html)
+            if cached and cached['hash'] == hashes[html] and cached['url'] == url:
+                entries[html] = cached['entries']
+            else:
+                tasks.append((url, html, data))
+        if len(tasks) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_parse_html_task, tasks,
+                                            chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))))
+        else:
+            results = [_parse_html_task(task) for task in tasks]
+        for (url, html, data), result in zip(tasks, results):
+            entries[html] = result
+        if cache_file:
+            os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+            with open(cache_file, 'w') as f:
+                json.dump({html: {'hash': hashes[html], 'url': url, 'entries': entries[html]}
+                           for url, html in pages}, f)
+        text = [[json.dumps(entry) for entry in entries[html]] for url, html in pages]
+    else:
+        text = [parse_html(url, html) for (url, html) in pages]
     # write the output to file.
     with open(os.path.join(docs_dir, 'site_libs/tipuesearch', 'tipuesearch_content.js'), 'w') as out:
         out.write('''\
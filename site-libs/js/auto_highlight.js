@@ -1,6 +1,33 @@
-hljs.initHighlightingOnLoad();
-if (window.hljs && document.readyState && document.readyState === "complete") {
-  window.setTimeout(function() {
-    hljs.initHighlighting();
-  }, 0);
+// Highlight code blocks once they are (almost) visible, instead of all code
+// blocks when the page is loaded
+function highlight_visible_code() {
+  var code_blocks = document.querySelectorAll('pre code');
+
+  if (!('IntersectionObserver' in window)) {
+    Array.prototype.forEach.call(code_blocks, function(block) {
+      hljs.highlightBlock(block);
+    });
+    return;
+  }
+
+  var observer = new IntersectionObserver(function(entries, observer) {
+    entries.forEach(function(entry) {
+      if (entry.isIntersecting) {
+        hljs.highlightBlock(entry.target);
+        observer.unobserve(entry.target);
+      }
+    });
+  }, {rootMargin: '200px'});
+
+  Array.prototype.forEach.call(code_blocks, function(block) {
+    observer.observe(block);
+  });
+}
+
+if (window.hljs) {
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', highlight_visible_code);
+  } else {
+    highlight_visible_code();
+  }
 }
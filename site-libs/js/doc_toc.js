@@ -40,6 +40,60 @@ var make_link = function (h, num_lbl) {
 };
 
 
+// Table of contents created during conversion ======================================
+function toc_from_entries(ul, cfg) {
+    // Each entry is [level, title, anchor, section number, header id]
+    var lists = [ul[0]];
+    var last_item = null;
+    cfg.entries.forEach(function (entry) {
+        var level = entry[0];
+        // walk down levels
+        var parent = last_item || lists[lists.length - 1];
+        while (lists.length < level) {
+            var new_ul = document.createElement('ul');
+            new_ul.className = 'toc-item';
+            parent.appendChild(new_ul);
+            lists.push(new_ul);
+            parent = new_ul;
+        }
+        // walk up levels
+        lists.length = level;
+
+        var num_lbl = document.createElement('span');
+        num_lbl.className = 'toc-item-num';
+        num_lbl.textContent = entry[3] + '\u00a0\u00a0';
+
+        var a = document.createElement('a');
+        a.href = '#' + entry[2];
+        a.appendChild(num_lbl);
+        a.appendChild(document.createTextNode(entry[1]));
+
+        last_item = document.createElement('li');
+        last_item.appendChild(a);
+        lists[lists.length - 1].appendChild(last_item);
+
+        // Like toc_from_headers, the header id is replaced by the unique
+        // anchor, and an anchor with the original id is added. Headers with
+        // the same id are renamed in order, so the next one is found next.
+        var h = document.getElementById(entry[4]);
+        if (h) {
+            var saveid = entry[4].replace(/\$/g, '').replace('\\', '');
+            h.id = entry[2];
+            h.setAttribute('saveid', saveid);
+            var has_named_anchor = Array.prototype.some.call(
+                h.querySelectorAll('a[name]'),
+                function (a) { return a.name === saveid; });
+            if (!has_named_anchor) {
+                var named_anchor = document.createElement('a');
+                named_anchor.name = saveid;
+                h.insertBefore(named_anchor, h.firstChild);
+            }
+            h.insertBefore(num_lbl.cloneNode(true), h.firstChild);
+        }
+    });
+}
+
+
 // Table of Contents =================================================================
 function table_of_contents(sidebar, cfg) {
     sidebar.append(
@@ -53,6 +107,27 @@ function table_of_contents(sidebar, cfg) {
     // update toc element
     $("#toc").empty().append(ul);
 
+    if (cfg.entries !== undefined) {
+      toc_from_entries(ul, cfg);
+    } else {
+      toc_from_headers(ul, cfg);
+    }
+
+    // Show section numbers if enabled
+    cfg.number_sections ? $('.toc-item-num').show() : $('.toc-item-num').hide()
+
+    // Ensure that TOC covers rest of sidebar
+    $( window ).resize(function() {
+        $('#toc').height($('#sidebar').height() - $('#sidebar-header').height() - 20);
+        console.log($('#sidebar').height() - $('#sidebar-header').height() - 20)
+      })
+
+}
+
+
+// Table of contents created by searching the page for headers =====================
+function toc_from_headers(ul, cfg) {
+
     var depth = 1; //var depth = ol_depth(ol);
     var li = ul; //yes, initialize li with ul!
     var all_headers = $("#notebook").find(":header");
@@ -127,14 +202,4 @@ function table_of_contents(sidebar, cfg) {
 
 
     });
-
-    // Show section numbers if enabled
-    cfg.number_sections ? $('.toc-item-num').show() : $('.toc-item-num').hide()
-
-    // Ensure that TOC covers rest of sidebar
-    $( window ).resize(function() {
-        $('#toc').height($('#sidebar').height() - $('#sidebar-header').height() - 20);
-        console.log($('#sidebar').height() - $('#sidebar-header').height() - 20)
-      })
-
 }
\ No newline at end of file
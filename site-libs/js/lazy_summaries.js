@@ -0,0 +1,54 @@
+// Load notebook summaries of index pages once they are (almost) visible.
+// Summaries of an index page are stored in a JSON file {link: summary HTML},
+// which is only requested once
+var summary_requests = {};
+
+function load_summaries(url) {
+  if (!(url in summary_requests)) {
+    summary_requests[url] = fetch(url).then(function(response) {
+      return response.json();
+    });
+  }
+  return summary_requests[url];
+}
+
+function show_summary(element) {
+  load_summaries(element.dataset.summaries).then(function(summaries) {
+    var summary = summaries[element.dataset.link];
+    if (summary !== undefined) {
+      element.innerHTML = summary;
+      // Math in the summary is typeset if MathJax has already started
+      if (window.MathJax && MathJax.Hub) {
+        MathJax.Hub.Queue(["Typeset", MathJax.Hub, element]);
+      }
+    }
+  });
+}
+
+function load_visible_summaries() {
+  var elements = document.querySelectorAll('.lazy-summary');
+
+  if (!('IntersectionObserver' in window)) {
+    Array.prototype.forEach.call(elements, show_summary);
+    return;
+  }
+
+  var observer = new IntersectionObserver(function(entries, observer) {
+    entries.forEach(function(entry) {
+      if (entry.isIntersecting) {
+        show_summary(entry.target);
+        observer.unobserve(entry.target);
+      }
+    });
+  }, {rootMargin: '500px'});
+
+  Array.prototype.forEach.call(elements, function(element) {
+    observer.observe(element);
+  });
+}
+
+if (document.readyState === 'loading') {
+  document.addEventListener('DOMContentLoaded', load_visible_summaries);
+} else {
+  load_visible_summaries();
+}
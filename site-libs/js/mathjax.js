@@ -1,6 +1,10 @@
-MathJax.Hub.Config({
+// MathJax configuration, loaded before MathJax itself.
+// Math is only typeset once it is (almost) visible, instead of typesetting the
+// whole page at startup
+window.MathJax = {
   extensions: ["tex2jax.js"],
   jax: ["input/TeX", "output/HTML-CSS"],
+  skipStartupTypeset: true,
   tex2jax: {
     inlineMath: [ ['$','$'], ["\\\\(","\\\\)"] ],
     displayMath: [ ['$$','$$'], ["\\\\[","\\\\]"] ],
@@ -15,5 +19,42 @@ MathJax.Hub.Config({
         "font-size": "110%",
       }
     }
+  },
+  AuthorInit: function() {
+    MathJax.Hub.Register.StartupHook("End", typeset_visible_math);
+  }
+};
+
+function define_latex_macros() {
+  // Macros (see latex_macros.js) are defined by typesetting them once
+  if (window.latex_macros) {
+    var macros = document.createElement('div');
+    macros.style.display = 'none';
+    macros.textContent = '$' + window.latex_macros + '$';
+    document.body.appendChild(macros);
+    MathJax.Hub.Queue(["Typeset", MathJax.Hub, macros]);
   }
-});
\ No newline at end of file
+}
+
+function typeset_visible_math() {
+  define_latex_macros();
+
+  var elements = document.querySelectorAll('.text_cell_render, .output_area');
+  if (!('IntersectionObserver' in window)) {
+    MathJax.Hub.Queue(["Typeset", MathJax.Hub]);
+    return;
+  }
+
+  var observer = new IntersectionObserver(function(entries, observer) {
+    entries.forEach(function(entry) {
+      if (entry.isIntersecting) {
+        MathJax.Hub.Queue(["Typeset", MathJax.Hub, entry.target]);
+        observer.unobserve(entry.target);
+      }
+    });
+  }, {rootMargin: '500px'});
+
+  Array.prototype.forEach.call(elements, function(element) {
+    observer.observe(element);
+  });
+}
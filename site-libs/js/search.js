@@ -0,0 +1,129 @@
+// Site search. The search content (see search_manifest.js) is only loaded
+// once the search box is focused or submitted, and is loaded and searched in
+// a web worker. If workers are unavailable (e.g. for local files), the search
+// content is loaded in the main thread instead.
+(function() {
+  var script = document.currentScript;
+  var base_path = script.dataset.basePath;
+  var site_libs_path = script.dataset.siteLibsPath;
+  var max_results = 50;
+
+  var worker = null;
+  var ready = false;
+  var fallback_pages = null;
+  var pending_query = null;
+
+  function absolute_url(url) {
+    return new URL(url, document.baseURI).href;
+  }
+
+  function load_script(url, callback) {
+    var element = document.createElement('script');
+    element.src = url;
+    element.onload = callback;
+    document.head.appendChild(element);
+  }
+
+  function load_in_main_thread() {
+    worker = null;
+    load_script(site_libs_path + '/js/search_index.js', function() {
+      load_script(base_path + '/' + search_manifest.content, function() {
+        fallback_pages = tipuesearch.pages;
+        on_ready();
+      });
+    });
+  }
+
+  function load_search_content() {
+    if (worker !== null || fallback_pages !== null || window.search_manifest === undefined) {
+      return;
+    }
+    try {
+      worker = new Worker(site_libs_path + '/js/search_worker.js');
+    } catch (error) {
+      load_in_main_thread();
+      return;
+    }
+    worker.onmessage = function(event) {
+      if (event.data.ready) {
+        on_ready();
+      } else {
+        show_results(event.data);
+      }
+    };
+    worker.onerror = load_in_main_thread;
+    worker.postMessage({content_url: absolute_url(base_path + '/' + search_manifest.content)});
+  }
+
+  function on_ready() {
+    ready = true;
+    if (pending_query !== null) {
+      search(pending_query);
+    }
+  }
+
+  function search(query) {
+    if (!ready) {
+      pending_query = query;
+      load_search_content();
+    } else if (worker !== null) {
+      worker.postMessage({query: query, max_results: max_results});
+    } else {
+      var found = search_pages(fallback_pages, query, max_results);
+      show_results({query: query, total: found.total, results: found.results});
+    }
+  }
+
+  function show_results(search) {
+    var container = document.getElementById('tipue_search_content');
+    container.innerHTML = '';
+
+    var warning = document.createElement('div');
+    warning.id = 'tipue_search_results_count';
+    warning.textContent = search.total + ' results for "' + search.query + '"';
+    container.appendChild(warning);
+
+    search.results.forEach(function(result) {
+      var title = document.createElement('div');
+      title.className = 'tipue_search_content_title';
+      var link = document.createElement('a');
+      link.href = base_path + '/' + result.url;
+      link.textContent = result.title;
+      title.appendChild(link);
+
+      var text = document.createElement('div');
+      text.className = 'tipue_search_content_text';
+      text.textContent = result.snippet;
+
+      container.appendChild(title);
+      container.appendChild(text);
+    });
+
+    document.getElementById('notebook-container').style.display = 'none';
+  }
+
+  // The search box is created by the sidebar, so events are delegated
+  document.addEventListener('focusin', function(event) {
+    if (event.target.id === 'tipue_search_input') {
+      load_search_content();
+    }
+  });
+
+  document.addEventListener('submit', function(event) {
+    var input = event.target.querySelector('#tipue_search_input');
+    if (input !== null) {
+      event.preventDefault();
+      search(input.value);
+    }
+  });
+
+  // Search queries passed in the URL, e.g. page.html?q=query
+  var query = new URLSearchParams(window.location.search).get('q');
+  if (query) {
+    if (document.readyState === 'loading') {
+      document.addEventListener('DOMContentLoaded', function() { search(query); });
+    } else {
+      search(query);
+    }
+  }
+})();
@@ -0,0 +1,52 @@
+// Search through the search content (tipuesearch.pages), used both by the
+// search worker and by the main thread if workers are unavailable
+function search_pages(pages, query, max_results) {
+  var terms = query.toLowerCase().split(/\s+/).filter(function(term) {
+    return term.length > 0;
+  });
+  if (!terms.length) {
+    return {total: 0, results: []};
+  }
+
+  var results = [];
+  pages.forEach(function(page) {
+    var title = page.title.toLowerCase();
+    var text = page.text.toLowerCase();
+    var score = 0;
+    var first_match = -1;
+
+    for (var k = 0; k < terms.length; k++) {
+      var in_title = title.indexOf(terms[k]) !== -1;
+      var position = text.indexOf(terms[k]);
+      if (!in_title && position === -1) {
+        return;  // Every term must match
+      }
+      if (in_title) {
+        score += 20;
+      }
+      while (position !== -1) {
+        if (first_match === -1 || position < first_match) {
+          first_match = position;
+        }
+        score += 1;
+        position = text.indexOf(terms[k], position + terms[k].length);
+      }
+    }
+
+    results.push({
+      title: page.title,
+      url: page.url,
+      score: score,
+      snippet: get_snippet(page.text, first_match)
+    });
+  });
+
+  results.sort(function(a, b) { return b.score - a.score; });
+  return {total: results.length, results: results.slice(0, max_results)};
+}
+
+function get_snippet(text, position) {
+  var start = Math.max(position - 80, 0);
+  var snippet = text.slice(start, start + 250).replace(/&nbsp/g, ' ');
+  return (start > 0 ? '... ' : '') + snippet + ' ...';
+}
@@ -0,0 +1,18 @@
+// Web worker that loads and searches the search content, such that the
+// (large) search content is not parsed on the main thread
+importScripts('search_index.js');
+
+var pages = null;
+
+onmessage = function(event) {
+  var message = event.data;
+  if (message.content_url !== undefined) {
+    importScripts(message.content_url);
+    pages = tipuesearch.pages;
+    postMessage({ready: true});
+  } else if (message.query !== undefined) {
+    var search = search_pages(pages, message.query, message.max_results);
+    postMessage({query: message.query, total: search.total,
+                 results: search.results});
+  }
+};
@@ -0,0 +1,144 @@
+// Service worker of a website, copied to the website root by the converter,
+// which defines precache_urls and cache_version (see src/service_worker.py).
+//
+// - Precached files (fingerprinted assets) and other files whose filename
+//   contains a content hash never change, and are served from the cache.
+// - Pages are served from the cache if their hash matches the hash in
+//   page_hashes.json, written by every build. Otherwise the page is fetched.
+// - Other files of the website (manifests, summaries) are fetched, falling
+//   back to the cache when offline.
+// - Files outside the website (site-libs) are served from the cache while
+//   being revalidated in the background (stale-while-revalidate).
+var precache_name = 'precache-' + cache_version;
+var pages_name = 'pages';
+var runtime_name = 'runtime';
+var page_hashes_url = new URL('page_hashes.json', self.registration.scope).href;
+var fingerprint_regex = /\.[0-9a-f]{12}\.(js|css)$/;
+
+self.addEventListener('install', function(event) {
+  event.waitUntil(caches.open(precache_name).then(function(cache) {
+    return cache.addAll(precache_urls);
+  }).then(function() {
+    return self.skipWaiting();
+  }));
+});
+
+self.addEventListener('activate', function(event) {
+  // Remove precached assets of previous builds
+  event.waitUntil(caches.keys().then(function(names) {
+    return Promise.all(names.filter(function(name) {
+      return name.indexOf('precache-') === 0 && name !== precache_name;
+    }).map(function(name) {
+      return caches.delete(name);
+    }));
+  }).then(function() {
+    return self.clients.claim();
+  }));
+});
+
+function to_hex(buffer) {
+  return Array.prototype.map.call(new Uint8Array(buffer), function(value) {
+    return ('0' + value.toString(16)).slice(-2);
+  }).join('');
+}
+
+function response_hash(response) {
+  return response.clone().arrayBuffer().then(function(buffer) {
+    return crypto.subtle.digest('SHA-1', buffer);
+  }).then(to_hex);
+}
+
+// Path of a page relative to the website root, as used in page_hashes.json
+function page_key(url) {
+  var key = decodeURIComponent(url.pathname).slice(
+    decodeURIComponent(new URL(self.registration.scope).pathname).length);
+  return (key === '' || key.slice(-1) === '/') ? key + 'index.html' : key;
+}
+
+function fetch_and_cache(request, cache_name) {
+  return fetch(request).then(function(response) {
+    if (response.ok) {
+      var copy = response.clone();
+      caches.open(cache_name).then(function(cache) {
+        cache.put(request, copy);
+      });
+    }
+    return response;
+  });
+}
+
+function network_first(request, cache_name) {
+  return fetch_and_cache(request, cache_name).catch(function(error) {
+    return caches.match(request).then(function(cached) {
+      if (cached === undefined) {
+        throw error;
+      }
+      return cached;
+    });
+  });
+}
+
+function cache_first(request, cache_name) {
+  return caches.match(request).then(function(cached) {
+    return cached || fetch_and_cache(request, cache_name);
+  });
+}
+
+function stale_while_revalidate(request, cache_name) {
+  return caches.match(request).then(function(cached) {
+    var fetched = fetch_and_cache(request, cache_name);
+    if (cached === undefined) {
+      return fetched;
+    }
+    fetched.catch(function() {});  // Offline, the cached file is used
+    return cached;
+  });
+}
+
+function get_page_hashes() {
+  // Revalidated on every page request, such that modified pages are fetched
+  return network_first(new Request(page_hashes_url, {cache: 'no-cache'}), pages_name)
+    .then(function(response) {
+      return response.json();
+    }).catch(function() {
+      return {};
+    });
+}
+
+function serve_page(request) {
+  var url = new URL(request.url);
+  var page_url = url.origin + url.pathname;
+  return Promise.all([caches.match(page_url), get_page_hashes()]).then(function(results) {
+    var cached = results[0];
+    var expected_hash = results[1][page_key(url)];
+    if (cached === undefined) {
+      return fetch_and_cache(page_url, pages_name);
+    } else if (expected_hash === undefined) {
+      return stale_while_revalidate(page_url, pages_name);
+    }
+    return response_hash(cached).then(function(hash) {
+      if (hash === expected_hash) {
+        return cached;
+      }
+      return network_first(page_url, pages_name);
+    });
+  });
+}
+
+self.addEventListener('fetch', function(event) {
+  var request = event.request;
+  var url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.mode === 'navigate' || /\.html$/.test(url.pathname)) {
+    event.respondWith(serve_page(request));
+  } else if (fingerprint_regex.test(url.pathname)) {
+    event.respondWith(cache_first(request, runtime_name));
+  } else if (url.href.indexOf(self.registration.scope) === 0) {
+    event.respondWith(network_first(request, runtime_name));
+  } else {
+    event.respondWith(stale_while_revalidate(request, runtime_name));
+  }
+});
@@ -1,5 +1,57 @@
-from .tools import *
-from .converter_preprocessors import *
-from .compilers import *
-from .notebooks import *
-from .tools import *
\ No newline at end of file
+import importlib
+
+# Submodules are only imported once one of their names is accessed, such that
+# e.g. nbconvert is not imported by a build that has nothing to convert.
+_submodule_names = {
+    'tools': ['DEFAULT_CONF', 'load_config', 'write_latex_macros',
+              'generate_template'],
+    'converter_preprocessors': ['RemoveInitializationCellPreprocessor',
+                                'RemoveBeforeSummaryPreprocessor',
+                                'RemoveCellJavaScript',
+                                'NewPagePreprocessor',
+                                'RemoveWarningsPreprocessor',
+                                'WrapPrintPreprocessor',
+                                'AddTitlePreprocessor',
+                                'DetectMathPreprocessor',
+                                'InteractivePlotToStaticPreProcessor'],
+    'compilers': ['NotebookCompiler', 'CompactNotebookCompiler'],
+    'snapshot': ['DirectoryEntry', 'DirectorySnapshot', 'FilesystemSnapshot'],
+    'reading': ['read_notebook', 'reads_notebook', 'validate_notebook'],
+    'cache': ['NotebookMetadata', 'NotebookCache'],
+    'build_stats': ['BuildStats'],
+    'metrics': ['MetricsFile', 'write_build_metrics'],
+    'history': ['BuildHistory'],
+    'sharding': ['parse_shard', 'assign_shards', 'write_shard_manifest',
+                 'load_shard_manifests'],
+    'watchdog': ['NotebookLimitExceeded', 'Watchdog', 'get_memory_usage'],
+    'pipeline': ['ExporterPool', 'ConversionPipeline'],
+    'cell_cache': ['CellCache', 'get_render_key'],
+    'context': ['BuildContext'],
+    'assets': ['site_libs_dir', 'collect_used_names', 'purge_css',
+               'purge_stylesheets', 'AssetManifest', 'write_caching_rules',
+               'deny_web_access'],
+    'search': ['write_search_content'],
+    'service_worker': ['write_page_hashes', 'write_service_worker'],
+    'planning': ['BuildPlan'],
+    'preview': ['PreviewServer'],
+    'notebooks': ['Notebook', 'LogNotebook', 'SummaryNotebook',
+                  'LogIndexNotebook', 'NotebookFolder'],
+}
+_name_submodules = {name: submodule
+                    for submodule, names in _submodule_names.items()
+                    for name in names}
+
+__all__ = list(_name_submodules)
+
+
+def __getattr__(name):
+    if name not in _name_submodules:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module = importlib.import_module(f'.{_name_submodules[name]}', __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
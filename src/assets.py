@@ -0,0 +1,457 @@
+import re
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+
+__all__ = ['site_libs_dir',
+           'collect_used_names',
+           'purge_css',
+           'purge_stylesheets',
+           'AssetManifest',
+           'write_caching_rules',
+           'deny_web_access']
+
+logger = logging.getLogger(__name__)
+
+# Folder site-libs of the converter, containing the original stylesheets
+site_libs_dir = Path(__file__).parent.parent / 'site-libs'
+
+_attribute_regex = re.compile(r'''\b(?:class|id)\s*=\s*["']([^"']*)["']''')
+_word_regex = re.compile(r'-?[_a-zA-Z][\w-]*')
+_comment_regex = re.compile(r'/\*.*?\*/', re.DOTALL)
+_selector_name_regex = re.compile(r'[.#](-?[_a-zA-Z][\w-]*)')
+_url_regex = re.compile(
+    r'''url\(\s*(['"]?)(?!data:|[a-z]+://|/|#)([^'")]+)\1\s*\)''')
+
+
+def _collect_attribute_names(HTML: str, names: Set[str]):
+    for attribute in _attribute_regex.findall(HTML):
+        names.update(attribute.split())
+
+
+def collect_used_names(pages: Iterable[Path],
+                       scripts: Iterable[Path] = (),
+                       fragments: Iterable[Path] = ()) -> Set[str]:
+    """Collect all class names and ids that may be used in the website
+
+    Args:
+        pages: Generated HTML pages, of which the class and id attributes are
+            collected
+        scripts: Scripts that may add elements or classes to pages. Since
+            class names cannot be reliably extracted, every word is collected.
+        fragments: JSON files {key: HTML} of fragments that are inserted into
+            pages, such as lazily loaded summaries of index pages
+
+    Returns:
+        Set of used class names and ids
+    """
+    names = set()
+    for page in pages:
+        page_HTML = Path(page).read_text(encoding='utf-8', errors='ignore')
+        _collect_attribute_names(page_HTML, names)
+    for fragments_path in fragments:
+        try:
+            fragments_HTML = json.loads(Path(fragments_path).read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f'Could not read HTML fragments {fragments_path}')
+            continue
+        for fragment in fragments_HTML.values():
+            _collect_attribute_names(fragment, names)
+    for script in scripts:
+        script_text = Path(script).read_text(encoding='utf-8', errors='ignore')
+        names.update(_word_regex.findall(script_text))
+    return names
+
+
+def _split_blocks(css: str) -> List[Tuple[str, Union[str, None]]]:
+    """Split CSS into top-level (prelude, body) blocks
+
+    Statements without a body, such as @import, have body None.
+    """
+    blocks = []
+    position = 0
+    depth = 0
+    block_start = None
+    for match in re.finditer(r'[{};]', css):
+        character = match.group()
+        if character == ';' and depth == 0:
+            blocks.append((css[position:match.end()].strip(), None))
+            position = match.end()
+        elif character == '{':
+            if depth == 0:
+                block_start = match.start()
+            depth += 1
+        elif character == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[position:block_start].strip(),
+                               css[block_start + 1:match.start()]))
+                position = match.end()
+    return [(prelude, body) for prelude, body in blocks if prelude]
+
+
+def _selector_is_used(selector: str, used_names: Set[str]) -> bool:
+    # Attribute selectors and negations do not require any name to be used
+    selector = re.sub(r'\[[^\]]*\]|:not\([^)]*\)', '', selector)
+    return all(name in used_names
+               for name in _selector_name_regex.findall(selector))
+
+
+def purge_css(css: str, used_names: Set[str]) -> str:
+    """Remove CSS rules whose selectors refer to unused classes or ids
+
+    A rule is kept if any of its selectors only refers to used class names and
+    ids. Rules inside @media and @supports blocks are purged as well, other
+    at-rules (@font-face, @keyframes, etc.) are kept.
+
+    Args:
+        css: Stylesheet to purge
+        used_names: Used class names and ids, see ``collect_used_names``
+
+    Returns:
+        Purged and minified stylesheet
+    """
+    css = _comment_regex.sub('', css)
+    purged_blocks = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            purged_blocks.append(prelude)
+        elif prelude.startswith(('@media', '@supports')):
+            purged_body = purge_css(body, used_names)
+            if purged_body:
+                purged_blocks.append(f'{prelude}{{{purged_body}}}')
+        elif prelude.startswith('@'):
+            purged_blocks.append(f'{prelude}{{{body.strip()}}}')
+        else:
+            selectors = [selector.strip() for selector in prelude.split(',')
+                         if _selector_is_used(selector, used_names)]
+            if selectors:
+                purged_blocks.append(f'{",".join(selectors)}{{{body.strip()}}}')
+    return '\n'.join(purged_blocks)
+
+
+def _rewrite_urls(css: str, site_libs_path: str, relative_path: Union[str, Path]) -> str:
+    """Rewrite relative URLs of a moved stylesheet to its original location
+
+    Args:
+        css: Stylesheet
+        site_libs_path: URL of the site-libs folder relative to the new
+            location of the stylesheet
+        relative_path: Original path of the stylesheet relative to site-libs
+    """
+    source_url = '/'.join([site_libs_path, Path(relative_path).parent.as_posix()])
+    return _url_regex.sub(
+        lambda match: f'url({match.group(1)}{source_url}/{match.group(2)}{match.group(1)})',
+        css)
+
+
+def purge_stylesheets(stylesheets: Dict[str, str],
+                      target_dir: Path,
+                      used_names: Set[str],
+                      site_depth: int = 1,
+                      asset_manifest: 'AssetManifest' = None):
+    """Purge stylesheets from site-libs and save them in the website
+
+    Purged stylesheets are saved as ``css/{filename}``, or as fingerprinted
+    assets if an asset manifest is provided (see ``AssetManifest.add``).
+    Since the stylesheets are moved, relative URLs (e.g. of fonts) are
+    rewritten to point to the original location in site-libs.
+
+    Args:
+        stylesheets: {filename: path relative to site-libs} of stylesheets to
+            purge
+        target_dir: Root directory of the website
+        used_names: Used class names and ids, see ``collect_used_names``
+        site_depth: Depth of the website root below the folder containing
+            site-libs
+        asset_manifest: Optional manifest to which the purged stylesheets
+            are added as fingerprinted assets
+    """
+    target_dir = Path(target_dir)
+    for filename, relative_path in stylesheets.items():
+        source_path = site_libs_dir / relative_path
+        css = source_path.read_text(encoding='utf-8')
+        purged_css = purge_css(css, used_names)
+
+        if asset_manifest is not None:
+            purged_path = f'{AssetManifest.purged_folder}/{filename}'
+            depth = site_depth + len(Path(asset_manifest.folder, purged_path).parents) - 1
+        else:
+            purged_path = f'css/{filename}'
+            depth = site_depth + len(Path(purged_path).parents) - 1
+        purged_css = _rewrite_urls(purged_css, '../' * depth + 'site-libs', relative_path)
+
+        if asset_manifest is not None:
+            asset_manifest.add(purged_path, purged_css.encode('utf-8'))
+        else:
+            (target_dir / purged_path).parent.mkdir(parents=True, exist_ok=True)
+            (target_dir / purged_path).write_text(purged_css, encoding='utf-8')
+        logger.info(f'Purged {relative_path} from {len(css) // 1000} KB '
+                    f'to {len(purged_css) // 1000} KB')
+
+
+class AssetManifest:
+    """Content-hashed copies of the site-libs assets referenced by pages
+
+    Assets are fingerprinted when pages are rendered (see the ``asset`` macro
+    in templates/notebook.html): the first time an asset is referenced, it is
+    copied to ``{target_dir}/assets`` with a hash of its contents in its
+    filename, e.g. ``assets/js/search.0123456789ab.js``. Since the URL of an
+    asset changes whenever it is modified, browsers can cache it indefinitely
+    (see ``write_caching_rules``).
+
+    Relative URLs in stylesheets (e.g. of fonts) are rewritten to point to the
+    original location in site-libs. Assets that load other files relative to
+    their own URL, such as MathJax, should not be fingerprinted.
+
+    Stylesheets that are purged after all pages are rendered are added as
+    ``assets/purged/{filename}``. Pages are rendered with the URL of the
+    previous build, and updated if the purged stylesheet changed (see
+    ``update_purged_urls``).
+
+    Args:
+        target_dir: Root directory of the website
+        site_depth: Depth of the website root below the folder containing
+            site-libs
+    """
+    folder = 'assets'
+    purged_folder = 'purged'
+    manifest_filename = 'manifest.json'
+
+    def __init__(self, target_dir: Union[str, Path], site_depth: int = 1):
+        self.target_dir = Path(target_dir)
+        self.site_depth = site_depth
+        # {path relative to site-libs: path relative to target_dir}
+        self.assets: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Purged stylesheets are only known after rendering all pages
+        self.previous_assets = self.load_saved()
+
+    def load_saved(self) -> Dict[str, str]:
+        """Assets of the manifest saved by the previous build, if any"""
+        manifest_path = self.target_dir / self.folder / self.manifest_filename
+        if not manifest_path.exists():
+            return {}
+        try:
+            return json.loads(manifest_path.read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f'Could not read asset manifest {manifest_path}')
+            return {}
+
+    def __deepcopy__(self, memo):
+        # Resources are copied by nbconvert, while the manifest is shared by
+        # all pages
+        return self
+
+    def __repr__(self):
+        return f'AssetManifest({str(self.target_dir)!r}, {len(self.assets)} assets)'
+
+    @property
+    def urls(self) -> List[str]:
+        """URLs of all fingerprinted assets, relative to the website root"""
+        with self._lock:
+            return [url for url in self.assets.values() if url is not None]
+
+    def url(self, relative_path: str) -> Union[str, None]:
+        """URL of the fingerprinted asset, relative to the website root
+
+        Args:
+            relative_path: Path of the asset relative to site-libs
+
+        Returns:
+            URL relative to the website root, None if the asset does not exist
+        """
+        with self._lock:
+            if relative_path not in self.assets:
+                self.assets[relative_path] = self._fingerprint(relative_path)
+            return self.assets[relative_path]
+
+    def purged_url(self, filename: str) -> str:
+        """URL of a purged stylesheet, relative to the website root
+
+        Returns the URL of the stylesheet purged in this build, else of the
+        previous build. If it was never purged, the URL without content hash
+        is returned, which is replaced once it is purged.
+        """
+        purged_path = f'{self.purged_folder}/{filename}'
+        with self._lock:
+            url = self.assets.get(purged_path) or self.previous_assets.get(purged_path)
+        return url or f'{self.folder}/{purged_path}'
+
+    def add(self, relative_path: str, content: bytes) -> str:
+        """Add a generated asset, such as a purged stylesheet
+
+        Args:
+            relative_path: Path of the asset relative to the assets folder
+            content: Contents of the asset
+
+        Returns:
+            URL relative to the website root
+        """
+        url = self._write(relative_path, content)
+        with self._lock:
+            self.assets[relative_path] = url
+        return url
+
+    def update_purged_urls(self, pages: Iterable[Path]) -> int:
+        """Replace outdated URLs of purged stylesheets in pages
+
+        Args:
+            pages: HTML pages of the website
+
+        Returns:
+            Number of pages that were updated
+        """
+        with self._lock:
+            purged_assets = {path: url for path, url in self.assets.items()
+                             if path.startswith(f'{self.purged_folder}/')}
+        if not purged_assets:
+            return 0
+
+        # Matches purged stylesheets with and without content hash
+        url_regex = re.compile('|'.join(
+            re.escape(f'{self.folder}/{Path(path).parent.as_posix()}/{Path(path).stem}')
+            + r'(?:\.[0-9a-f]{12})?' + re.escape(Path(path).suffix)
+            for path in purged_assets))
+        urls = {f'{self.folder}/{path}': url for path, url in purged_assets.items()}
+
+        def replace_url(match):
+            url = match.group()
+            base_url = re.sub(r'\.[0-9a-f]{12}(\.\w+)$', r'\1', url)
+            return urls[base_url]
+
+        updated = 0
+        for page in pages:
+            page_HTML = Path(page).read_text(encoding='utf-8')
+            updated_HTML = url_regex.sub(replace_url, page_HTML)
+            if updated_HTML != page_HTML:
+                Path(page).write_text(updated_HTML, encoding='utf-8')
+                updated += 1
+        if updated:
+            logger.info(f'Updated URLs of purged stylesheets in {updated} pages')
+        return updated
+
+    def _fingerprint(self, relative_path: str) -> Union[str, None]:
+        source_path = site_libs_dir / relative_path
+        if not source_path.is_file():
+            logger.warning(f'Asset {relative_path} not found in site-libs')
+            return None
+
+        content = source_path.read_bytes()
+        if source_path.suffix == '.css':
+            # Stylesheet is copied to assets/{parent folder}
+            depth = self.site_depth + 1 + len(Path(relative_path).parents) - 1
+            css = _rewrite_urls(content.decode('utf-8'),
+                                site_libs_path='../' * depth + 'site-libs',
+                                relative_path=relative_path)
+            content = css.encode('utf-8')
+        return self._write(relative_path, content)
+
+    def _write(self, relative_path: str, content: bytes) -> str:
+        """Write content to the assets folder with its hash in the filename"""
+        relative_path = Path(relative_path)
+        content_hash = hashlib.sha1(content).hexdigest()[:12]
+        fingerprinted_path = Path(self.folder) / relative_path.with_name(
+            f'{relative_path.stem}.{content_hash}{relative_path.suffix}')
+
+        target_path = self.target_dir / fingerprinted_path
+        if not target_path.exists():
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            target_path.write_bytes(content)
+        return fingerprinted_path.as_posix()
+
+    def save(self, prune: bool = True):
+        """Save the manifest, and remove fingerprinted assets of previous builds
+
+        Args:
+            prune: Remove fingerprinted assets that are not in the manifest.
+                Should be False if not all pages were rendered.
+        """
+        assets_dir = self.target_dir / self.folder
+        assets_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            assets = {path: url for path, url in sorted(self.assets.items())
+                      if url is not None}
+        (assets_dir / self.manifest_filename).write_text(
+            json.dumps(assets, indent=1), encoding='utf-8')
+
+        if prune:
+            used_paths = {self.target_dir / path for path in assets.values()}
+            for filepath in assets_dir.rglob('*'):
+                if (filepath.is_file() and filepath.name != self.manifest_filename
+                        and filepath not in used_paths):
+                    filepath.unlink()
+
+
+_htaccess = """# Generated by the notebook converter, see AssetManifest
+<IfModule mod_headers.c>
+  # Fingerprinted files change URL when their contents change
+  <FilesMatch "\\.[0-9a-f]{12}\\.(js|css)$">
+    Header set Cache-Control "public, max-age=31536000, immutable"
+  </FilesMatch>
+  # Pages, manifests and other generated files are revalidated on every visit
+  <FilesMatch "(\\.html|\\.json|^search_manifest\\.js|^latex_macros\\.js|^service_worker\\.js)$">
+    Header set Cache-Control "no-cache"
+  </FilesMatch>
+</IfModule>
+"""
+
+_nginx = """# Generated by the notebook converter, see AssetManifest
+# Include in the server or location block serving the website
+# nginx uses the first matching regex location, so the deny rule comes first.
+# Build information (see deny_web_access) is not part of the website
+location ~ "/\\.build/" {
+    deny all;
+}
+location ~* "\\.[0-9a-f]{12}\\.(js|css)$" {
+    add_header Cache-Control "public, max-age=31536000, immutable";
+}
+location ~* "(\\.html|\\.json|/search_manifest\\.js|/latex_macros\\.js|/service_worker\\.js)$" {
+    add_header Cache-Control "no-cache";
+}
+"""
+
+_htaccess_deny = """# Generated by the notebook converter, see deny_web_access
+<IfModule mod_authz_core.c>
+  Require all denied
+</IfModule>
+<IfModule !mod_authz_core.c>
+  Order allow,deny
+  Deny from all
+</IfModule>
+"""
+
+
+def write_caching_rules(target_dir: Union[str, Path], nginx_path: Union[str, Path]):
+    """Write HTTP caching rules for Apache (.htaccess) and nginx
+
+    Fingerprinted files (assets and search content) are cached indefinitely,
+    while pages and files with fixed URLs are revalidated on every visit.
+
+    Args:
+        target_dir: Root directory of the website, where .htaccess is written
+        nginx_path: Path of the nginx config snippet
+    """
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    (Path(target_dir) / '.htaccess').write_text(_htaccess, encoding='utf-8')
+    Path(nginx_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(nginx_path).write_text(_nginx, encoding='utf-8')
+
+
+def deny_web_access(directory: Union[str, Path]):
+    """Deny HTTP access to a folder inside the website, using .htaccess
+
+    Build information, such as the build history and report, is kept in the
+    .build folder of the website, such that it is shared by builds on
+    different machines, but should not be served. For nginx, the snippet
+    written by ``write_caching_rules`` contains the corresponding rule.
+
+    Args:
+        directory: Folder to which access is denied
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    (Path(directory) / '.htaccess').write_text(_htaccess_deny, encoding='utf-8')
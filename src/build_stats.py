@@ -0,0 +1,158 @@
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Union
+from contextlib import contextmanager
+
+
+__all__ = ['BuildStats']
+
+logger = logging.getLogger(__name__)
+
+
+class BuildStats:
+    """Timing and size statistics collected during a build
+
+    Per-notebook costs (conversion time and output size) are kept between
+    builds in a cost file, which is used to balance work across shards.
+    A report of the build, listing the slowest and largest pages and the
+    notebooks that failed to convert, is saved with every build.
+    """
+    costs_filename = 'notebook_costs.json'
+    report_filename = 'build_report.json'
+
+    def __init__(self):
+        # {relative notebook path: {'seconds': float, 'bytes': int, ...}}
+        self.notebooks: Dict[str, dict] = {}
+        # {phase name: duration in seconds}
+        self.phases: Dict[str, float] = {}
+        # {relative notebook path: {'stage', 'error', 'seconds', 'placeholder'}}
+        self.failures: Dict[str, dict] = {}
+        # Pages converted and bytes written by this build, whereas notebooks
+        # can also contain costs of pages converted by shards
+        self.converted = 0
+        self.bytes_written = 0
+        # Notebooks that this build did not convert, since nothing changed
+        # or since they are converted by another shard
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Context manager that records the duration of a build phase"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - t0
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0) + duration
+
+    def record_notebook(self, relative_path: Path, seconds: float, bytes: int,
+                        metadata=None):
+        """Record the conversion of a page
+
+        Args:
+            relative_path: Relative path of notebook
+            seconds: Conversion time
+            bytes: Size of page
+            metadata: Optional NotebookMetadata of the notebook, from which
+                the number of cells and outputs and the notebook size are
+                recorded. Index pages have no metadata.
+        """
+        costs = {'seconds': seconds, 'bytes': bytes}
+        if metadata is not None:
+            costs.update(cells=metadata.outputs.get('cells'),
+                         outputs=metadata.outputs.get('outputs'),
+                         input_bytes=metadata.size)
+        with self._lock:
+            self.notebooks[Path(relative_path).as_posix()] = costs
+            self.converted += 1
+            self.bytes_written += bytes
+
+    def record_skipped(self, count: int = 1):
+        """Record notebooks that are not converted by this build"""
+        with self._lock:
+            self.skipped += count
+
+    def record_failure(self, relative_path: Path, stage: str, error: str,
+                       seconds: float = None, placeholder: bool = False):
+        """Record a notebook that failed to convert
+
+        Args:
+            relative_path: Relative path of notebook
+            stage: Conversion stage that failed, e.g. 'render'
+            error: Error message
+            seconds: Time spent converting the notebook before failing
+            placeholder: Whether a placeholder page was written instead
+        """
+        with self._lock:
+            self.failures[Path(relative_path).as_posix()] = {
+                'stage': stage, 'error': error, 'seconds': seconds,
+                'placeholder': placeholder}
+
+    def report(self, top: int = 10) -> dict:
+        """Summary of the build
+
+        Args:
+            top: Number of slowest and largest pages listed
+
+        Returns:
+            Dict with phase durations, totals, the slowest and largest pages,
+            and the notebooks that failed to convert
+        """
+        with self._lock:
+            notebooks = dict(self.notebooks)
+            failures = dict(self.failures)
+            phases = dict(self.phases)
+
+        def largest(key):
+            paths = sorted(notebooks, key=lambda path: notebooks[path][key],
+                           reverse=True)
+            return [{'path': path, **notebooks[path]} for path in paths[:top]]
+
+        return {'phases': phases,
+                'notebooks': len(notebooks),
+                'seconds': sum(costs['seconds'] for costs in notebooks.values()),
+                'bytes': sum(costs['bytes'] for costs in notebooks.values()),
+                'slowest': largest('seconds'),
+                'largest': largest('bytes'),
+                'failures': failures}
+
+    def save_report(self, filepath: Union[str, Path]) -> dict:
+        """Save the build report as JSON, and log the failed notebooks"""
+        report = self.report()
+        for path, failure in report['failures'].items():
+            logger.warning(f'Failed to {failure["stage"]} {path}: '
+                           f'{failure["error"]}')
+        if report['failures']:
+            logger.warning(f'{len(report["failures"])} notebooks failed to '
+                           f'convert, see {filepath}')
+
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(json.dumps(report, indent=1), encoding='utf-8')
+        return report
+
+    @staticmethod
+    def load_costs(filepath: Union[str, Path]) -> Dict[str, dict]:
+        """Load per-notebook costs recorded in previous builds"""
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return {}
+        try:
+            return json.loads(filepath.read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f'Could not read notebook costs {filepath}')
+            return {}
+
+    def save_costs(self, filepath: Union[str, Path]):
+        """Update the per-notebook costs file with the costs of this build"""
+        filepath = Path(filepath)
+        costs = self.load_costs(filepath)
+        with self._lock:
+            costs.update(self.notebooks)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(json.dumps(costs, indent=1), encoding='utf-8')
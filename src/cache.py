@@ -0,0 +1,207 @@
+import json
+import logging
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Union
+import nbformat
+
+from .tools import get_header_outline, get_summary_cells
+
+
+__all__ = ['NotebookMetadata',
+           'NotebookCache']
+
+logger = logging.getLogger(__name__)
+
+
+def _compact_cell(cell):
+    """Copy of a cell without outputs and attachments"""
+    compact_cell = {'cell_type': cell['cell_type'],
+                    'metadata': cell.get('metadata', {}),
+                    'source': cell['source']}
+    if cell['cell_type'] == 'code':
+        compact_cell['outputs'] = []
+        compact_cell['execution_count'] = None
+    return nbformat.from_dict(compact_cell)
+
+
+class NotebookMetadata:
+    """Compact representation of a parsed notebook
+
+    Contains everything that is needed to construct the NotebookFolder tree,
+    compile index notebooks, and generate search content, such that a notebook
+    that is unchanged does not need to be parsed.
+
+    Args:
+        size: File size of notebook
+        mtime: File modification time of notebook
+        content_hash: sha1 hash of notebook file contents
+        markdown_text: Source of all markdown cells, separated by newlines
+        summary_cells: Cells in the summary section, without their outputs
+        headers: (level, title) of every markdown header
+        outputs: Output metadata, containing the number of cells, code cells,
+            and outputs, the number of outputs per output type/mimetype,
+            and the total size of all output data.
+    """
+    def __init__(self,
+                 size: int,
+                 mtime: float,
+                 content_hash: str,
+                 markdown_text: str = '',
+                 summary_cells: list = (),
+                 headers: list = (),
+                 outputs: dict = None):
+        self.size = size
+        self.mtime = mtime
+        self.content_hash = content_hash
+        self.markdown_text = markdown_text
+        self.summary_cells = [nbformat.from_dict(cell) for cell in summary_cells]
+        self.headers = [tuple(header) for header in headers]
+        self.outputs = outputs or {}
+
+    @classmethod
+    def from_notebook(cls, notebook, size: int, mtime: float, content_hash: str):
+        markdown_text = ''
+        outputs = {'cells': len(notebook.cells),
+                   'code_cells': 0,
+                   'outputs': 0,
+                   'output_types': {},
+                   'output_size': 0}
+        for cell in notebook.cells:
+            if cell['cell_type'] == 'markdown':
+                markdown_text += cell['source'] + '\n'
+            elif cell['cell_type'] == 'code':
+                outputs['code_cells'] += 1
+                for output in cell.get('outputs', []):
+                    outputs['outputs'] += 1
+                    output_types = list(output.get('data', {})) or [output['output_type']]
+                    for output_type in output_types:
+                        outputs['output_types'][output_type] = \
+                            outputs['output_types'].get(output_type, 0) + 1
+                    for data in [*output.get('data', {}).values(), output.get('text', '')]:
+                        outputs['output_size'] += len(data) if isinstance(data, str) else 0
+
+        return cls(size=size,
+                   mtime=mtime,
+                   content_hash=content_hash,
+                   markdown_text=markdown_text,
+                   summary_cells=[_compact_cell(cell)
+                                  for cell in get_summary_cells(notebook.cells)],
+                   headers=get_header_outline(notebook.cells),
+                   outputs=outputs)
+
+    def to_dict(self):
+        return {'size': self.size,
+                'mtime': self.mtime,
+                'content_hash': self.content_hash,
+                'markdown_text': self.markdown_text,
+                'summary_cells': self.summary_cells,
+                'headers': self.headers,
+                'outputs': self.outputs}
+
+
+class NotebookCache:
+    """On-disk cache of NotebookMetadata for every notebook
+
+    Entries are keyed by the notebook path relative to the base dir, and are
+    valid as long as the file size and modification time are unchanged.
+    If these have changed but the file contents hash is the same (e.g. the file
+    was copied or touched), the entry is still used.
+
+    Args:
+        cache_dir: Directory in which the cache file is stored
+    """
+    filename = 'notebook_metadata.json'
+    version = 1
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        self.cache_dir = Path(cache_dir)
+        self.entries: Dict[str, NotebookMetadata] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def filepath(self):
+        return self.cache_dir / self.filename
+
+    def load(self):
+        if not self.filepath.exists():
+            return
+
+        try:
+            cache = json.loads(self.filepath.read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f'Could not read notebook cache {self.filepath}')
+            return
+
+        if cache.get('version') == self.version:
+            self.entries = {path: NotebookMetadata(**entry)
+                            for path, entry in cache['entries'].items()}
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            cache = {'version': self.version,
+                     'entries': {path: entry.to_dict()
+                                 for path, entry in self.entries.items()}}
+        self.filepath.write_text(json.dumps(cache), encoding='utf-8')
+
+    def import_entries(self, entries: Dict[str, dict]):
+        """Add metadata entries {relative path: metadata dict}, e.g. from shards"""
+        with self._lock:
+            self.entries.update({path: NotebookMetadata(**entry)
+                                 for path, entry in entries.items()})
+
+    def get(self, relative_path: Path, absolute_path: Path,
+            size: int, mtime: float) -> NotebookMetadata:
+        """Get cached notebook metadata if it is still valid
+
+        Args:
+            relative_path: Notebook path relative to base dir, used as key
+            absolute_path: Notebook filepath, used to hash its contents if its
+                size or modification time has changed
+            size: Current notebook file size
+            mtime: Current notebook file modification time
+
+        Returns:
+            Cached NotebookMetadata, or None if not cached or outdated
+        """
+        key = Path(relative_path).as_posix()
+        metadata = self.entries.get(key)
+        if metadata is not None and (metadata.size, metadata.mtime) != (size, mtime):
+            content_hash = hashlib.sha1(Path(absolute_path).read_bytes()).hexdigest()
+            if content_hash == metadata.content_hash:
+                metadata.size, metadata.mtime = size, mtime
+            else:
+                metadata = None
+
+        with self._lock:
+            if metadata is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return metadata
+
+    def update(self, relative_path: Path, notebook, data: bytes,
+               size: int, mtime: float) -> NotebookMetadata:
+        """Add or replace the metadata of a parsed notebook
+
+        Args:
+            relative_path: Notebook path relative to base dir, used as key
+            notebook: NotebookNode parsed from data
+            data: Raw notebook file contents, used for the content hash
+            size: Notebook file size
+            mtime: Notebook file modification time
+
+        Returns:
+            NotebookMetadata of notebook
+        """
+        metadata = NotebookMetadata.from_notebook(
+            notebook, size=size, mtime=mtime,
+            content_hash=hashlib.sha1(data).hexdigest())
+        with self._lock:
+            self.entries[Path(relative_path).as_posix()] = metadata
+        return metadata
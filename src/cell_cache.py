@@ -0,0 +1,323 @@
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from copy import copy
+from pathlib import Path
+from functools import lru_cache
+from collections import OrderedDict
+from typing import List, Union
+
+
+__all__ = ['CellCache',
+           'get_render_key']
+
+logger = logging.getLogger(__name__)
+
+
+def _get_templates_signature(template_path: Path) -> tuple:
+    """Name, size and modification time of all templates in the template dir"""
+    signature = []
+    for filepath in sorted(Path(template_path).parent.glob('*')):
+        if filepath.is_file():
+            stat = filepath.stat()
+            signature.append((filepath.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+@lru_cache(maxsize=64)
+def _hash_render_settings(exporter_name: str, template_path: str,
+                          templates_signature: tuple, settings: str) -> str:
+    import nbconvert
+
+    render_key = hashlib.sha1()
+    render_key.update(exporter_name.encode())
+    render_key.update(nbconvert.__version__.encode())
+    render_key.update(settings.encode())
+    if template_path is not None:
+        for name, _, _ in templates_signature:
+            render_key.update(name.encode())
+            render_key.update((Path(template_path).parent / name).read_bytes())
+    return render_key.hexdigest()
+
+
+def get_render_key(HTML_exporter, template_path: Path = None, **settings) -> str:
+    """Key of everything besides the cell itself that affects its rendered HTML
+
+    Consists of the exporter class, the nbconvert version, the contents of all
+    templates in the template directory, and any additional settings.
+    Templates are only read again once their size or modification time
+    changes, such that a template that is modified while exporters are reused
+    (e.g. by the preview server) results in a new key.
+    """
+    templates_signature = ()
+    if template_path is not None:
+        template_path = str(template_path)
+        templates_signature = _get_templates_signature(template_path)
+    return _hash_render_settings(type(HTML_exporter).__qualname__,
+                                 template_path,
+                                 templates_signature,
+                                 json.dumps(settings, sort_keys=True, default=str))
+
+
+class CellCache:
+    """Content-addressed cache of rendered HTML cell fragments
+
+    Fragments are keyed by the cell contents (source, outputs, metadata) and a
+    render key (see ``get_render_key``), and stored as files in the cache
+    directory. Once the total size of all fragments exceeds ``max_size``, the
+    least recently used fragments are removed.
+
+    Args:
+        cache_dir: Directory in which fragments are stored
+        max_size: Maximum total size of all fragments in bytes
+    """
+    index_filename = 'index.json'
+    pages_filename = 'pages.json'
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = 256e6):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+        # LRU ordered {key: fragment size}, least recently used first
+        self.entries = OrderedDict()
+        # Cell keys and layout of every rendered page {page key: page info}
+        self.pages = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        index_path = self.cache_dir / self.index_filename
+        pages_path = self.cache_dir / self.pages_filename
+        if not index_path.exists() or not pages_path.exists():
+            return
+
+        try:
+            entries = json.loads(index_path.read_text(encoding='utf-8'))
+            pages = json.loads(pages_path.read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f'Could not read cell cache index {index_path}')
+            return
+
+        self.entries = OrderedDict(entries)
+        self.size = sum(self.entries.values())
+        self.pages = pages
+
+    def save(self):
+        """Save LRU index and pages, fragments are already saved when added"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            entries = list(self.entries.items())
+            pages = dict(self.pages)
+        index_path = self.cache_dir / self.index_filename
+        index_path.write_text(json.dumps(entries), encoding='utf-8')
+        pages_path = self.cache_dir / self.pages_filename
+        pages_path.write_text(json.dumps(pages), encoding='utf-8')
+
+    @staticmethod
+    def key(cell, render_key: str) -> str:
+        # Cell ids are excluded since they are random for newly created cells
+        cell_json = json.dumps({key: val for key, val in cell.items() if key != 'id'},
+                               sort_keys=True)
+        return hashlib.sha1((render_key + cell_json).encode()).hexdigest()
+
+    def _filepath(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.html'
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key: str) -> str:
+        """Get a fragment, returns None if not cached"""
+        with self._lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        try:
+            return self._filepath(key).read_text(encoding='utf-8')
+        except OSError:  # Fragment was removed
+            with self._lock:
+                self.size -= self.entries.pop(key, 0)
+            return None
+
+    def put(self, key: str, fragment: str):
+        filepath = self._filepath(key)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(fragment, encoding='utf-8')
+
+        with self._lock:
+            self.size -= self.entries.pop(key, 0)
+            self.entries[key] = len(fragment)
+            self.size += len(fragment)
+
+            evicted_keys = []
+            while self.size > self.max_size and len(self.entries) > 1:
+                evicted_key, evicted_size = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                evicted_keys.append(evicted_key)
+
+        for evicted_key in evicted_keys:
+            self._filepath(evicted_key).unlink(missing_ok=True)
+
+    def render_cells(self, notebook, resources: dict, HTML_exporter,
+                     render_key: str, keys: List[str] = None) -> List[str]:
+        """Render the HTML fragment of every cell, only rendering new cells
+
+        Cells that are not cached are rendered together with the exporter
+        in a single notebook, separated by boundary markers, after which the
+        output is split into the fragment of each cell.
+
+        Args:
+            notebook: Preprocessed notebook
+            resources: Resources used for rendering
+            HTML_exporter: Exporter used to render cells
+            render_key: Render key, see ``get_render_key``
+            keys: Optional precomputed cell keys
+
+        Returns:
+            HTML fragment of each cell
+        """
+        if keys is None:
+            keys = [self.key(cell, render_key) for cell in notebook.cells]
+        fragments = [self.get(key) for key in keys]
+
+        missing_indices = [k for k, fragment in enumerate(fragments)
+                           if fragment is None]
+        if missing_indices:
+            missing_cells = [notebook.cells[k] for k in missing_indices]
+            rendered_fragments = self._render_between_boundaries(
+                notebook, missing_cells, resources, HTML_exporter)[1:-1]
+            if len(rendered_fragments) != len(missing_indices):
+                raise RuntimeError('Could not split rendered notebook into cells')
+
+            for k, fragment in zip(missing_indices, rendered_fragments):
+                fragments[k] = fragment
+                self.put(keys[k], fragment)
+
+        return fragments
+
+    @staticmethod
+    def _render_between_boundaries(notebook, cells: list, resources: dict,
+                                   HTML_exporter) -> List[str]:
+        """Render cells separated by boundaries, and split the output
+
+        Returns:
+            List containing the page header, the HTML of each cell, and the
+            page footer
+        """
+        # Imported here, such that the cache can be loaded without nbformat
+        from nbformat.v4 import new_raw_cell
+
+        # Plain text, such that templates sanitizing raw HTML keep the boundary
+        boundary = f'cell-boundary-{uuid.uuid4().hex}'
+        # Cell ids were introduced in nbformat 4.5, and must be unique
+        has_ids = (notebook.get('nbformat', 4), notebook.get('nbformat_minor', 0)) >= (4, 5)
+
+        def new_boundary_cell():
+            cell = new_raw_cell(boundary, metadata={'raw_mimetype': 'text/html'})
+            if has_ids:
+                cell['id'] = f'boundary-{uuid.uuid4().hex[:16]}'
+            else:
+                cell.pop('id', None)
+            return cell
+
+        boundary_notebook = copy(notebook)
+        boundary_notebook.cells = [new_boundary_cell()]
+        for cell in cells:
+            boundary_notebook.cells += [cell, new_boundary_cell()]
+
+        output, _ = HTML_exporter.from_notebook_node(boundary_notebook,
+                                                     resources=resources)
+        return output.split(boundary)
+
+    def render_page(self, notebook, resources: dict, HTML_exporter,
+                    render_key: str, page_key: str,
+                    previous_page_path: Path = None) -> str:
+        """Render a notebook page from its (cached) cell fragments
+
+        The page consists of the page header, followed by the HTML of every
+        cell, and the page footer. Header and footer are rendered every time.
+
+        Log notebooks mostly grow by appending cells. If the cells of the page
+        that was rendered previously are the first cells of the notebook, only
+        the appended cells are rendered, and spliced into the previous page.
+        Otherwise the page is created from the fragments of every cell.
+
+        Pages may be rewritten after rendering, e.g. once the URLs of purged
+        stylesheets in their head are known (see ``AssetManifest``). The cells
+        of the previous page are therefore located relative to the end of the
+        page, and compared to the hash of the cells as they were rendered.
+
+        Args:
+            notebook: Preprocessed notebook
+            resources: Resources used for rendering
+            HTML_exporter: Exporter used to render cells
+            render_key: Render key, see ``get_render_key``
+            page_key: Key of page, e.g. its relative path
+            previous_page_path: Path of previously rendered page, if it exists
+
+        Returns:
+            HTML code of page
+        """
+        keys = [self.key(cell, render_key) for cell in notebook.cells]
+        header, footer = self._render_between_boundaries(
+            notebook, [], resources, HTML_exporter)
+
+        cells_HTML = None
+        previous_page = self.pages.get(page_key)
+        if (previous_page is not None
+                and previous_page_path is not None
+                and keys[:len(previous_page['cell_keys'])] == previous_page['cell_keys']):
+            cells_HTML = self._get_previous_cells_HTML(previous_page,
+                                                       previous_page_path)
+
+        if cells_HTML is not None:
+            num_previous_cells = len(previous_page['cell_keys'])
+            appended_notebook = copy(notebook)
+            appended_notebook.cells = notebook.cells[num_previous_cells:]
+            if appended_notebook.cells:
+                logger.info(f'Appending {len(appended_notebook.cells)} cells '
+                            f'to {page_key}')
+                cells_HTML += ''.join(self.render_cells(
+                    appended_notebook, resources, HTML_exporter,
+                    render_key=render_key, keys=keys[num_previous_cells:]))
+        else:
+            cells_HTML = ''.join(self.render_cells(
+                notebook, resources, HTML_exporter,
+                render_key=render_key, keys=keys))
+
+        page = header + cells_HTML + footer
+        with self._lock:
+            self.pages[page_key] = {
+                'cell_keys': keys,
+                'footer_length': len(footer),
+                'cells_length': len(cells_HTML),
+                'cells_hash': hashlib.sha1(cells_HTML.encode('utf-8')).hexdigest()}
+        return page
+
+    @staticmethod
+    def _get_previous_cells_HTML(previous_page: dict, previous_page_path: Path):
+        """HTML of all cells in a previously rendered page
+
+        Returns None if the page does not exist or its cells were modified
+        since.
+        """
+        if 'cells_hash' not in previous_page:  # Page info of older version
+            return None
+        try:
+            page = Path(previous_page_path).read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+        stop = len(page) - previous_page['footer_length']
+        cells_HTML = page[max(stop - previous_page['cells_length'], 0):stop]
+        if hashlib.sha1(cells_HTML.encode('utf-8')).hexdigest() != previous_page['cells_hash']:
+            return None
+        return cells_HTML
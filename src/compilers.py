@@ -8,6 +8,7 @@ from traitlets.config import Config
 from .converter_preprocessors import (NewPagePreprocessor,
                                       RemoveWarningsPreprocessor,
                                       WrapPrintPreprocessor)
+from .reading import read_notebook
 
 
 __all__ = ['NotebookCompiler',
@@ -22,6 +23,7 @@ class NotebookCompiler:
                      RemoveWarningsPreprocessor,
                      WrapPrintPreprocessor]
     measurement_config = {'start': 1, 'end': None}
+    trusted_read = False
 
     def __init__(self, name='', config=None):
         self.name = name
@@ -39,14 +41,14 @@ class NotebookCompiler:
     def parse_header_notebook(self, notebook_filename):
         logger.info(f'Parsing header notebook: {notebook_filename}')
         notebook_filepath = os.path.join(self.source_dir, notebook_filename)
-        notebook = nbformat.read(notebook_filepath, as_version=nbformat.NO_CONVERT)
+        notebook = read_notebook(notebook_filepath, trusted=self.trusted_read)
         self.notebook.cells += notebook.cells
         return notebook.cells
 
     def parse_measurement_notebook(self, notebook_filename, update=True):
         logger.info(f'Parsing measurement notebook: {notebook_filename}')
         notebook_filepath = os.path.join(self.source_dir, notebook_filename)
-        notebook = nbformat.read(notebook_filepath, as_version=nbformat.NO_CONVERT)
+        notebook = read_notebook(notebook_filepath, trusted=self.trusted_read)
         cells = notebook.cells
 
         # Clear optional template at the end of the notebook
@@ -0,0 +1,63 @@
+import logging
+from pathlib import Path
+from typing import Union
+
+from .snapshot import FilesystemSnapshot
+from .cache import NotebookCache
+from .cell_cache import CellCache
+from .build_stats import BuildStats
+
+
+__all__ = ['BuildContext']
+
+logger = logging.getLogger(__name__)
+
+
+class BuildContext:
+    """State shared by all notebooks and notebook folders of one website
+
+    Every NotebookFolder and Notebook refers to the context of the website it
+    belongs to, such that multiple websites can be built in the same process,
+    and even concurrently. Caches may be shared between contexts.
+
+    Args:
+        base_dir: Base directory of the notebooks
+        name: Name of the website, used to distinguish its pages in caches
+            shared with other websites
+        snapshot: Snapshot of the notebook directories, scanned if not provided
+        template_config: Default template config of notebooks
+        trusted_read: Skip schema validation and use a faster JSON decoder
+            (see read_notebook)
+        notebook_cache: Optional cache of parsed notebook metadata
+        cell_cache: Optional cache of rendered HTML cells
+        build_stats: Optional statistics to which conversion costs are recorded
+    """
+    def __init__(self,
+                 base_dir: Union[str, Path],
+                 name: str = '',
+                 snapshot: FilesystemSnapshot = None,
+                 template_config: dict = None,
+                 trusted_read: bool = False,
+                 notebook_cache: NotebookCache = None,
+                 cell_cache: CellCache = None,
+                 build_stats: BuildStats = None):
+        self.base_dir = Path(base_dir).absolute()
+        self.name = name
+
+        # Directory listings are shared by all notebook folders
+        if snapshot is None:
+            snapshot = FilesystemSnapshot(self.base_dir)
+            snapshot.scan()
+        self.snapshot = snapshot
+
+        self.template_config = template_config if template_config is not None else {}
+        self.trusted_read = trusted_read
+        self.notebook_cache = notebook_cache
+        self.cell_cache = cell_cache
+        self.build_stats = build_stats
+
+        # Main sections of the website, registered while extracting folders
+        self.sections = {}
+
+    def __repr__(self):
+        return f'BuildContext({self.name!r}, base_dir={str(self.base_dir)!r})'
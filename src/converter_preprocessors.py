@@ -1,3 +1,4 @@
+import re
 import logging
 import textwrap
 from nbconvert.preprocessors import Preprocessor
@@ -12,6 +13,7 @@ __all__ = ['RemoveInitializationCellPreprocessor',
            'RemoveWarningsPreprocessor',
            'WrapPrintPreprocessor',
            'AddTitlePreprocessor',
+           'DetectMathPreprocessor',
            'InteractivePlotToStaticPreProcessor']
 
 
@@ -84,6 +86,39 @@ class AddTitlePreprocessor(Preprocessor):
         return nb, resources
 
 
+class DetectMathPreprocessor(Preprocessor):
+    """Set ``resources['has_math']`` if the notebook contains any math
+
+    Math is searched for in markdown cells and in LaTeX and markdown outputs.
+    Pages without math do not need to load MathJax.
+    """
+    # Like pandoc, inline math may not start or end with a space, and the
+    # closing $ may not be followed by a digit, such that amounts of money
+    # (e.g. "costs $5 and $10") are not considered math
+    math_regex = re.compile(r'\$[^\s$](?:[^$]*[^\s$])?\$(?!\d)|\\\(|\\\[|\\begin\{')
+    math_mimetypes = ['text/latex', 'text/markdown']
+
+    def preprocess(self, nb, resources):
+        resources['has_math'] = any(self.cell_has_math(cell) for cell in nb.cells)
+        return nb, resources
+
+    @classmethod
+    def text_has_math(cls, text: str) -> bool:
+        return bool(cls.math_regex.search(text))
+
+    def cell_has_math(self, cell):
+        if cell['cell_type'] == 'markdown':
+            return self.text_has_math(cell['source'])
+        elif cell['cell_type'] == 'code':
+            for output in cell['outputs']:
+                data = output.get('data', {})
+                if 'text/latex' in data:
+                    return True
+                elif self.text_has_math(data.get('text/markdown', '')):
+                    return True
+        return False
+
+
 ### PDF preprocessors
 
 class NewPagePreprocessor(Preprocessor):
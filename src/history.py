@@ -0,0 +1,218 @@
+import time
+import sqlite3
+import logging
+from pathlib import Path
+from contextlib import closing
+from typing import List, Union
+
+from .build_stats import BuildStats
+
+
+__all__ = ['BuildHistory']
+
+logger = logging.getLogger(__name__)
+
+_schema = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    duration REAL,
+    pages INTEGER,
+    failures INTEGER,
+    seconds REAL,
+    bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS notebooks (
+    build_id INTEGER NOT NULL REFERENCES builds(id),
+    path TEXT NOT NULL,
+    seconds REAL,
+    bytes INTEGER,
+    cells INTEGER,
+    outputs INTEGER,
+    input_bytes INTEGER,
+    error TEXT,
+    PRIMARY KEY (build_id, path)
+);
+CREATE INDEX IF NOT EXISTS notebooks_path ON notebooks (path, build_id);
+"""
+
+
+def _format_bytes(bytes: float) -> str:
+    if bytes is None:
+        return '-'
+    elif bytes < 1e6:
+        return f'{bytes / 1e3:.0f} kB'
+    return f'{bytes / 1e6:.1f} MB'
+
+
+class BuildHistory:
+    """SQLite database with the statistics of every build of a website
+
+    For every build, the conversion time, page size, number of cells and
+    outputs, and notebook size of every converted page is stored, as well as
+    the pages that failed to convert. The history is kept with the output
+    (in the .build folder, which is not served, see ``deny_web_access``),
+    such that builds on different machines add to the same history.
+
+    Args:
+        filepath: Path of database, created if it does not exist
+    """
+    filename = 'build_history.sqlite'
+
+    def __init__(self, filepath: Union[str, Path]):
+        self.filepath = Path(filepath)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        # The database may be on a network drive that is slow to unlock
+        connection = sqlite3.connect(str(self.filepath), timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(_schema)
+        return connection
+
+    def record(self, build_stats: BuildStats, duration: float = None) -> int:
+        """Add a build to the history
+
+        Args:
+            build_stats: Statistics collected during the build
+            duration: Total build duration in seconds
+
+        Returns:
+            Id of build
+        """
+        notebooks = dict(build_stats.notebooks)
+        failures = dict(build_stats.failures)
+        rows = [(path, costs['seconds'], costs['bytes'], costs.get('cells'),
+                 costs.get('outputs'), costs.get('input_bytes'), None)
+                for path, costs in notebooks.items()]
+        rows += [(path, failure['seconds'], None, None, None, None,
+                  failure['error'])
+                 for path, failure in failures.items() if path not in notebooks]
+
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                'INSERT INTO builds (finished, duration, pages, failures, seconds, bytes) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (time.time(), duration, len(notebooks), len(failures),
+                 sum(costs['seconds'] for costs in notebooks.values()),
+                 sum(costs['bytes'] for costs in notebooks.values())))
+            build_id = cursor.lastrowid
+            connection.executemany(
+                'INSERT INTO notebooks (build_id, path, seconds, bytes, cells, '
+                'outputs, input_bytes, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(build_id, *row) for row in rows])
+        logger.info(f'Build {build_id} added to build history {self.filepath}')
+        return build_id
+
+    def builds(self, limit: int = 10) -> List[sqlite3.Row]:
+        """Most recent builds, oldest first"""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                'SELECT * FROM builds ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return rows[::-1]
+
+    def jumps(self, factor: float = 1.5,
+              min_seconds: float = 1,
+              min_bytes: int = 100e3) -> List[dict]:
+        """Pages whose conversion time or size jumped since their previous build
+
+        The most recent conversion of every page is compared with the
+        conversion before it. Small absolute changes are ignored, since the
+        time of converting small notebooks fluctuates strongly.
+
+        Args:
+            factor: Minimum ratio between the new and previous value
+            min_seconds: Minimum increase of the conversion time in seconds
+            min_bytes: Minimum increase of the page size in bytes
+
+        Returns:
+            [{'path', 'build_id', 'metric', 'previous', 'current', ...}],
+            sorted by the largest ratio first
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute("""
+                SELECT path, build_id, seconds, bytes, cells, outputs, input_bytes,
+                       LAG(seconds) OVER previous AS previous_seconds,
+                       LAG(bytes) OVER previous AS previous_bytes,
+                       LAG(cells) OVER previous AS previous_cells,
+                       LAG(outputs) OVER previous AS previous_outputs,
+                       LAG(input_bytes) OVER previous AS previous_input_bytes,
+                       ROW_NUMBER() OVER (PARTITION BY path ORDER BY build_id DESC) AS recency
+                FROM notebooks
+                WHERE error IS NULL
+                WINDOW previous AS (PARTITION BY path ORDER BY build_id)
+            """).fetchall()
+
+        jumps = []
+        for row in rows:
+            if row['recency'] != 1:
+                continue
+            for metric, minimum in [('seconds', min_seconds), ('bytes', min_bytes)]:
+                previous, current = row[f'previous_{metric}'], row[metric]
+                if (previous and current is not None
+                        and current - previous >= minimum
+                        and current >= factor * previous):
+                    jumps.append({'path': row['path'],
+                                  'build_id': row['build_id'],
+                                  'metric': metric,
+                                  'previous': previous,
+                                  'current': current,
+                                  'ratio': current / previous,
+                                  **{key: (row[f'previous_{key}'], row[key])
+                                     for key in ['cells', 'outputs', 'input_bytes']}})
+        return sorted(jumps, key=lambda jump: jump['ratio'], reverse=True)
+
+    def slowest(self, build_id: int, limit: int = 10) -> List[sqlite3.Row]:
+        """Slowest pages of a build"""
+        with closing(self._connect()) as connection:
+            return connection.execute(
+                'SELECT * FROM notebooks WHERE build_id = ? AND error IS NULL '
+                'ORDER BY seconds DESC LIMIT ?', (build_id, limit)).fetchall()
+
+    def format_report(self, builds: int = 10, **jump_kwargs) -> str:
+        """Human-readable report of recent builds and pages that got slower
+
+        Args:
+            builds: Number of recent builds listed
+            **jump_kwargs: Thresholds for flagging pages, see ``jumps``
+        """
+        recent_builds = self.builds(limit=builds)
+        if not recent_builds:
+            return 'No builds recorded'
+
+        lines = [f'Last {len(recent_builds)} builds:',
+                 f'  {"build":>6}  {"finished":<16}  {"duration":>9}  {"pages":>6}  '
+                 f'{"failed":>6}  {"convert":>9}  {"size":>9}']
+        for build in recent_builds:
+            finished = time.strftime('%Y-%m-%d %H:%M', time.localtime(build['finished']))
+            duration = f'{build["duration"]:.1f} s' if build['duration'] is not None else '-'
+            lines.append(f'  {build["id"]:>6}  {finished:<16}  {duration:>9}  '
+                         f'{build["pages"]:>6}  {build["failures"]:>6}  '
+                         f'{build["seconds"]:>7.1f} s  {_format_bytes(build["bytes"]):>9}')
+
+        last_build = recent_builds[-1]
+        lines.append(f'Slowest pages of build {last_build["id"]}:')
+        for row in self.slowest(last_build['id']):
+            lines.append(f'  {row["path"]}: {row["seconds"]:.1f} s, '
+                         f'{_format_bytes(row["bytes"])}')
+
+        jumps = self.jumps(**jump_kwargs)
+        lines.append(f'Pages whose conversion time or size jumped: {len(jumps)}')
+        for jump in jumps:
+            if jump['metric'] == 'seconds':
+                change = f'{jump["previous"]:.1f} s -> {jump["current"]:.1f} s'
+            else:
+                change = (f'{_format_bytes(jump["previous"])} -> '
+                          f'{_format_bytes(jump["current"])}')
+            causes = [f'{key} {previous} -> {current}'
+                      for key, (previous, current) in [('cells', jump['cells']),
+                                                       ('outputs', jump['outputs'])]
+                      if previous != current]
+            previous_input, current_input = jump['input_bytes']
+            if previous_input != current_input:
+                causes.append(f'notebook {_format_bytes(previous_input)} -> '
+                              f'{_format_bytes(current_input)}')
+            cause = f' ({", ".join(causes)})' if causes else ''
+            lines.append(f'  {jump["path"]} (build {jump["build_id"]}): '
+                         f'{change}{cause}')
+        return '\n'.join(lines)
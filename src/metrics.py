@@ -0,0 +1,132 @@
+import os
+import re
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from .build_stats import BuildStats
+from .snapshot import FilesystemSnapshot
+
+
+__all__ = ['MetricsFile', 'write_build_metrics']
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = {key: str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for key, value in labels.items()}
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped.items()) + '}'
+
+
+class MetricsFile:
+    """Gauges written in the text format of the node exporter textfile collector
+
+    The node exporter exposes all ``*.prom`` files in the directory passed as
+    ``--collector.textfile.directory`` to Prometheus. Files are written
+    atomically, such that the collector never reads a partially written file.
+
+    Args:
+        prefix: Prefix of all metric names
+        labels: Labels added to every sample, e.g. {'website': name}
+    """
+    def __init__(self, prefix: str = 'notebook_website',
+                 labels: Dict[str, str] = None):
+        self.prefix = prefix
+        self.labels = labels or {}
+        # {metric name: (help text, [(labels, value), ...])}
+        self.metrics: Dict[str, Tuple[str, List[Tuple[dict, float]]]] = {}
+
+    def add(self, name: str, value: float, help: str,
+            labels: Dict[str, str] = None):
+        """Add a sample of a gauge, samples of a gauge differ in their labels"""
+        name = f'{self.prefix}_{name}'
+        _, samples = self.metrics.setdefault(name, (help, []))
+        samples.append(({**self.labels, **(labels or {})}, value))
+
+    def format(self) -> str:
+        lines = []
+        for name, (help, samples) in self.metrics.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {float(value)!r}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, filepath: Union[str, Path]):
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = filepath.with_name(f'.{filepath.name}.{os.getpid()}')
+        temporary_path.write_text(self.format(), encoding='utf-8')
+        os.replace(temporary_path, filepath)
+
+
+def write_build_metrics(metrics_dir: Union[str, Path],
+                        name: str,
+                        build_stats: BuildStats,
+                        duration: float,
+                        snapshot: FilesystemSnapshot = None,
+                        notebook_cache=None,
+                        cell_cache=None,
+                        up_to_date: bool = False) -> Path:
+    """Write metrics of a website build to notebook_website_{name}.prom
+
+    Args:
+        metrics_dir: Directory read by the node exporter textfile collector
+        name: Website name, added as the ``website`` label
+        build_stats: Statistics collected during the build
+        duration: Total build duration in seconds
+        snapshot: Filesystem snapshot, used to count the notebooks scanned
+        notebook_cache: Optional NotebookCache used by the build
+        cell_cache: Optional CellCache used by the build. Since it can be
+            shared by websites, its hit ratio covers all websites built.
+        up_to_date: Whether the build was skipped since nothing changed
+
+    Returns:
+        Path of metrics file
+    """
+    metrics = MetricsFile(labels={'website': name})
+    metrics.add('build_timestamp_seconds', time.time(),
+                'Unix time at which the build finished')
+    metrics.add('build_duration_seconds', duration,
+                'Total duration of the build')
+    metrics.add('build_up_to_date', int(up_to_date),
+                'Whether the build was skipped since nothing changed')
+    for phase, seconds in build_stats.phases.items():
+        metrics.add('build_phase_duration_seconds', seconds,
+                    'Duration of a phase of the build', labels={'phase': phase})
+
+    if snapshot is not None:
+        metrics.add('notebooks_scanned', snapshot.count_files('.ipynb'),
+                    'Number of notebooks found in the notebook directories')
+    metrics.add('notebooks_skipped', build_stats.skipped,
+                'Number of notebooks not converted since nothing changed or '
+                'since they are converted by another shard')
+    metrics.add('pages_converted', build_stats.converted,
+                'Number of pages (notebooks and index pages) converted')
+    metrics.add('pages_failed', len(build_stats.failures),
+                'Number of pages that failed to convert')
+    metrics.add('bytes_written', build_stats.bytes_written,
+                'Total size of pages written in bytes')
+    pages_bytes = [costs['bytes'] for costs in build_stats.notebooks.values()]
+    metrics.add('largest_page_bytes', max(pages_bytes, default=0),
+                'Size of the largest page in bytes')
+
+    for cache_name, cache in [('notebook', notebook_cache), ('cell', cell_cache)]:
+        if cache is None:
+            continue
+        labels = {'cache': cache_name}
+        lookups = cache.hits + cache.misses
+        metrics.add('cache_hits', cache.hits, 'Number of cache hits', labels)
+        metrics.add('cache_misses', cache.misses, 'Number of cache misses', labels)
+        metrics.add('cache_hit_ratio', cache.hits / lookups if lookups else 1,
+                    'Fraction of cache lookups that were hits', labels)
+
+    filename = re.sub(r'[^\w.-]', '_', f'notebook_website_{name}') + '.prom'
+    filepath = Path(metrics_dir) / filename
+    metrics.write(filepath)
+    logger.info(f'Build metrics written to {filepath}')
+    return filepath
@@ -1,39 +1,63 @@
 import re
 import json
-from copy import copy
+import time
+import hashlib
+from copy import copy, deepcopy
 from typing import Union, List
 from pathlib import Path
 import logging
 from traitlets.config import Config
 from nbconvert import HTMLExporter, PDFExporter
+from nbconvert.filters import markdown2html
 import nbformat
 from nbformat.v4 import new_notebook, new_code_cell, new_markdown_cell, new_raw_cell
 
-from .tools import increase_header_level, reroute_internal_links
+from .tools import (increase_header_level,
+                    reroute_internal_links,
+                    get_table_of_contents,
+                    get_summary_cells,
+                    ClientHighlightFilter)
 from .converter_preprocessors import *
+from .snapshot import FilesystemSnapshot
+from .context import BuildContext
+from .reading import reads_notebook, validate_notebook
+from .cache import NotebookCache, NotebookMetadata
+from .build_stats import BuildStats
+from .pipeline import ConversionPipeline, ExporterPool
+from .cell_cache import CellCache, get_render_key
 
 
+__all__ = ['Notebook',
+           'LogNotebook',
+           'SummaryNotebook',
+           'LogIndexNotebook',
+           'NotebookFolder']
+
 logger = logging.getLogger(__name__)
 
 
 class Notebook:
-    base_dir = None
     HTML_preprocessors = []
     PDF_preprocessors = [InteractivePlotToStaticPreProcessor,
                          NewPagePreprocessor]
-    template_config = {}
 
     def __init__(self, path, name: str = None, index: int = None,
                  read: bool = True, parent: 'NotebookFolder' = None,
-                 template_config: dict = None, **kwargs):
-        assert self.base_dir is not None, "Notebook.base_dir must be set"
+                 template_config: dict = None, context: BuildContext = None,
+                 **kwargs):
+        if context is None:
+            assert parent is not None, "Notebook requires a context or parent"
+            context = parent.context
+        self.context = context
 
         self.name = name
         self.index = index
         self.parent = parent
 
         if template_config is not None:
-            Notebook.template_config = template_config
+            self.template_config = template_config
+        else:
+            self.template_config = self.context.template_config
 
         # Set absolute and relative path
         if path is None:
@@ -43,7 +67,7 @@ class Notebook:
         else:
             if path.is_absolute():
                 self.absolute_path = path
-                self.relative_path = path.relative_to(NotebookFolder.base_dir)
+                self.relative_path = path.relative_to(self.base_dir)
             else:
                 self.absolute_path = self.base_dir / path
                 self.relative_path = path
@@ -52,10 +76,13 @@ class Notebook:
         self.template_path = None
         self.HTML_path = None
 
-        # Read notebook into nbformat Notebook object
+        # The notebook is only read when needed. If read is True, its metadata
+        # is loaded, either from the notebook cache or by reading the notebook
+        self._notebook = None
+        self._read = read
+        self.metadata: NotebookMetadata = None
         if read:
-            self.notebook = nbformat.read(str(self.absolute_path),
-                                          as_version=nbformat.NO_CONVERT)
+            self.metadata = self.load_metadata()
 
     def __str__(self):
         if self.index is not None:
@@ -63,6 +90,76 @@ class Notebook:
         else:
             return self.name
 
+    @property
+    def base_dir(self) -> Path:
+        return self.context.base_dir
+
+    @property
+    def trusted_read(self) -> bool:
+        return self.context.trusted_read
+
+    @property
+    def notebook_cache(self) -> NotebookCache:
+        return self.context.notebook_cache
+
+    @property
+    def cell_cache(self) -> CellCache:
+        return self.context.cell_cache
+
+    @property
+    def build_stats(self) -> BuildStats:
+        return self.context.build_stats
+
+    @property
+    def notebook(self):
+        if self._notebook is None and self._read:
+            self.load_notebook()
+        return self._notebook
+
+    @notebook.setter
+    def notebook(self, notebook):
+        self._notebook = notebook
+
+    def stat(self):
+        """Size and modification time of notebook file"""
+        if self.context.snapshot is not None:
+            try:
+                entry = self.context.snapshot.stat(self.absolute_path)
+                return entry.size, entry.mtime
+            except KeyError:
+                pass
+        stat = self.absolute_path.stat()
+        return stat.st_size, stat.st_mtime
+
+    def load_notebook(self):
+        """Read notebook into nbformat Notebook object, updating its metadata"""
+        data = self.absolute_path.read_bytes()
+        self._notebook = reads_notebook(data, trusted=self.trusted_read)
+
+        size, mtime = self.stat()
+        if self.notebook_cache is not None:
+            self.metadata = self.notebook_cache.update(
+                self.relative_path, self._notebook, data=data,
+                size=size, mtime=mtime)
+        else:
+            self.metadata = NotebookMetadata.from_notebook(
+                self._notebook, size=size, mtime=mtime,
+                content_hash=hashlib.sha1(data).hexdigest())
+        return self._notebook
+
+    def load_metadata(self):
+        """Load notebook metadata, only reading the notebook if not cached"""
+        if self.notebook_cache is not None:
+            size, mtime = self.stat()
+            metadata = self.notebook_cache.get(self.relative_path,
+                                               self.absolute_path,
+                                               size=size, mtime=mtime)
+            if metadata is not None:
+                return metadata
+
+        self.load_notebook()
+        return self.metadata
+
     @property
     def cells(self):
         return self.notebook.cells
@@ -107,35 +204,151 @@ class Notebook:
 
         return relative_path
 
-    def convert_to_HTML(self,
-                        target_dir: Path,
-                        HTML_exporter: HTMLExporter = None):
-        """Convert single log notebook to HTML
+    def create_HTML_exporter(self) -> HTMLExporter:
+        """Create an HTML exporter using the notebook template
+
+        The exporter does not include the HTML preprocessors of the notebook,
+        as these are applied separately in ``preprocess_HTML``, and so the
+        exporter can be reused for other notebooks with the same template.
+        """
+        HTML_exporter = HTMLExporter()
+        if self.template_path is not None:
+            HTML_exporter.template_file = str(self.template_path)
+        return HTML_exporter
+
+    @staticmethod
+    def configure_HTML_exporter(HTML_exporter: HTMLExporter,
+                                highlighting: str = 'server',
+                                language: str = 'python'):
+        """Set up how an exporter highlights code
+
+        Code is either highlighted during conversion (server) or in the
+        browser (client). Filters are only assigned if they change, since
+        that recreates the Jinja environment of the exporter.
 
         Args:
-            target_dir: Target directory for output HTML files
-            HTML_exporter: exporter for converting notebook to HTML
+            HTML_exporter: Exporter, see ``create_HTML_exporter``
+            highlighting: Either 'server' or 'client'
+            language: Default language of code cells
+        """
+        filters = dict(HTML_exporter.filters)
+        if highlighting == 'client':
+            filters['highlight_code'] = ClientHighlightFilter(language)
+        else:
+            # Exporters may be shared with websites highlighting client-side
+            filters.pop('highlight_code', None)
+        if filters != HTML_exporter.filters:
+            HTML_exporter.filters = filters
+
+    @staticmethod
+    def get_highlight_settings(notebook, resources: dict) -> dict:
+        """Keyword arguments of ``configure_HTML_exporter`` for a
+        preprocessed notebook"""
+        return {'highlighting': resources.get('highlighting', 'server'),
+                'language': notebook.metadata.get('language_info', {}).get('name', 'python')}
+
+    def preprocess_HTML(self):
+        """Apply HTML preprocessors to a copy of the notebook
 
         Returns:
-            None
+            Preprocessed notebook copy
+            Resources (copy of template config) used for rendering
         """
-        logger.info(f'Starting HTML conversion of {self.relative_path}')
-
-        if HTML_exporter is None:
-            config = Config()
-            config.HTMLExporter.preprocessors = self.HTML_preprocessors
-            HTML_exporter = HTMLExporter(config=config)
+        notebook = deepcopy(self.notebook)
+        resources = copy(self.template_config)
+        for preprocessor_class in self.HTML_preprocessors:
+            notebook, resources = preprocessor_class().preprocess(notebook,
+                                                                  resources)
+        # MathJax is only loaded in pages containing math
+        notebook, resources = DetectMathPreprocessor().preprocess(notebook,
+                                                                  resources)
+        # The table of contents is embedded such that the sidebar does not
+        # need to search the page for headers
+        toc_config = resources.get('toc', {})
+        resources['toc_entries'] = get_table_of_contents(
+            notebook.cells, threshold=toc_config.get('threshold', 6))
+        return notebook, resources
+
+    def render_HTML(self,
+                    notebook,
+                    resources: dict,
+                    HTML_exporter: HTMLExporter = None,
+                    target_dir: Path = None) -> str:
+        """Render a preprocessed notebook to HTML code
 
-        if self.template_path is not None:
-            HTML_exporter.template_file = str(self.template_path)
+        Args:
+            notebook: Preprocessed notebook, see ``preprocess_HTML``
+            resources: Resources used for rendering
+            HTML_exporter: Optional exporter, created if not provided.
+                Should use the notebook template (see
+                ``create_HTML_exporter``), and not contain the notebook's
+                HTML preprocessors.
+            target_dir: Optional target directory of the HTML file. If the
+                cell cache is used, cells appended since the page was
+                previously rendered are added to the existing page.
 
-        # TODO ensure cells is synced
+        Returns:
+            HTML code
+        """
+        if HTML_exporter is None:
+            HTML_exporter = self.create_HTML_exporter()
+
+        # Exporters borrowed from an ExporterPool are already set up
+        highlight_settings = self.get_highlight_settings(notebook, resources)
+        self.configure_HTML_exporter(HTML_exporter, **highlight_settings)
+
+        try:
+            if self.cell_cache is not None:
+                # Only render cells that are not cached or appended
+                page_path = self.relative_path.with_suffix('.html')
+                # The cell cache may be shared by multiple websites
+                page_key = (Path(self.context.name) / page_path).as_posix()
+                HTML_output = self.cell_cache.render_page(
+                    notebook, resources, HTML_exporter,
+                    render_key=get_render_key(HTML_exporter, self.template_path,
+                                              **highlight_settings),
+                    page_key=page_key,
+                    previous_page_path=target_dir / page_path if target_dir else None)
+            else:
+                HTML_output, _ = HTML_exporter.from_notebook_node(notebook,
+                                                                  resources=resources)
+        except Exception:
+            if self.trusted_read:
+                # Validation was skipped while reading, check if that's the cause
+                validate_notebook(self.absolute_path)
+            raise
+        return HTML_output
+
+    def render_placeholder_HTML(self,
+                                message: str,
+                                HTML_exporter: HTMLExporter = None) -> str:
+        """Render a page stating that the notebook could not be converted
+
+        Used instead of the notebook page if converting the notebook exceeded
+        a limit of the watchdog, see ``Watchdog``.
 
-        # Convert notebook to HTML code
-        HTML_output, _ = HTML_exporter.from_notebook_node(self.notebook,
-                                                          resources=self.template_config)
+        Args:
+            message: Reason why the notebook could not be converted
+            HTML_exporter: Optional exporter, created if not provided
 
-        # Write HTML code into file
+        Returns:
+            HTML code
+        """
+        if HTML_exporter is None:
+            HTML_exporter = self.create_HTML_exporter()
+
+        placeholder = new_notebook(cells=[new_markdown_cell(
+            f'# {self.name}\n\n'
+            f'This notebook could not be converted to a web page.\n\n'
+            f'**Error:** {message}')])
+        resources = copy(self.template_config)
+        resources['toc_entries'] = []
+        HTML_output, _ = HTML_exporter.from_notebook_node(placeholder,
+                                                          resources=resources)
+        return HTML_output
+
+    def write_HTML(self, target_dir: Path, HTML_output: str):
+        """Write HTML code to the notebook HTML path in target_dir"""
         self.HTML_path = target_dir / self.relative_path.with_suffix('.html')
 
         logger.info(f'writing to {self.HTML_path}')
@@ -144,6 +357,51 @@ class Notebook:
 
         self.HTML_path.write_text(HTML_output, encoding='utf-8')
 
+    def convert_to_HTML(self,
+                        target_dir: Path,
+                        HTML_exporter: HTMLExporter = None,
+                        exporter_pool: ExporterPool = None):
+        """Convert single log notebook to HTML
+
+        The conversion consists of the stages read, preprocess, render, and
+        write. Many notebooks are converted more efficiently using a
+        ConversionPipeline, which overlaps these stages.
+
+        Args:
+            target_dir: Target directory for output HTML files
+            HTML_exporter: exporter for converting notebook to HTML.
+                Should use the notebook template (see
+                ``create_HTML_exporter``), and not contain the notebook's
+                HTML preprocessors.
+            exporter_pool: Optional pool from which an exporter is borrowed
+                if HTML_exporter is not provided
+
+        Returns:
+            None
+        """
+        logger.info(f'Starting HTML conversion of {self.relative_path}')
+        t0 = time.perf_counter()
+
+        notebook, resources = self.preprocess_HTML()
+        if HTML_exporter is None and exporter_pool is not None:
+            highlight_settings = self.get_highlight_settings(notebook, resources)
+            with exporter_pool.exporter(self, **highlight_settings) as HTML_exporter:
+                HTML_output = self.render_HTML(notebook, resources,
+                                               HTML_exporter=HTML_exporter,
+                                               target_dir=target_dir)
+        else:
+            HTML_output = self.render_HTML(notebook, resources,
+                                           HTML_exporter=HTML_exporter,
+                                           target_dir=target_dir)
+        self.write_HTML(target_dir, HTML_output)
+
+        if self.build_stats is not None:
+            self.build_stats.record_notebook(
+                self.relative_path,
+                seconds=time.perf_counter() - t0,
+                bytes=len(HTML_output.encode('utf-8')),
+                metadata=self.metadata)
+
         logger.info(f'HTML notebook converted: {self.relative_path}')
 
     def convert_to_PDF(self,
@@ -191,7 +449,7 @@ class Notebook:
 
         # Generate navigation bar sections
         self.template_config['navbar_sections'] = {}
-        for name, section in NotebookFolder.sections.items():
+        for name, section in self.context.sections.items():
             if 'notebook_folder' in section:
                 section_notebook = section['notebook_folder'].index_notebook
             else:
@@ -215,7 +473,7 @@ class Notebook:
         """Generate tipuesearch content
 
         """
-        if self.notebook is None:
+        if self.metadata is None and self.notebook is None:
             return []
 
         tipuesearch_content = {
@@ -226,10 +484,13 @@ class Notebook:
             # 'note': '',
             'url': str(self.relative_path.with_suffix('.html'))}
 
-        text = ''
-        for cell in self.notebook.cells:
-            if cell['cell_type'] == 'markdown':
-                text += cell['source'] + '\n'
+        if self.metadata is not None:
+            text = self.metadata.markdown_text
+        else:
+            text = ''
+            for cell in self.notebook.cells:
+                if cell['cell_type'] == 'markdown':
+                    text += cell['source'] + '\n'
 
         tipuesearch_content['text'] = text.replace('\n', '&nbsp&nbsp\n')
 
@@ -250,7 +511,7 @@ class LogNotebook(Notebook):
                  parent: 'NotebookFolder' = None,
                  **kwargs):
         super().__init__(path=path, name=name, index=index, read=read,
-                         parent=parent)
+                         parent=parent, **kwargs)
         self.summary_cells = self.extract_summary_cells()
 
     def generate_template(self,
@@ -261,20 +522,11 @@ class LogNotebook(Notebook):
         return self.template_config
 
     def extract_summary_cells(self):
-        start_index, stop_index = 0, 0
-        for k, cell in enumerate(self.notebook.cells):
-            if cell['cell_type'] != 'markdown':
-                continue
-            elif cell.source.lower().startswith('# summary'):
-                start_index = k + 1
-            elif start_index > 0 and cell.source.startswith('# '):
-                stop_index = k
-                break
-        else:
-            if start_index > 0:
-                stop_index = len(self.notebook.cells)
-
-        return self.notebook.cells[start_index:stop_index]
+        if self.metadata is not None:  # Avoid parsing the notebook
+            return self.metadata.summary_cells
+        if self.notebook is None:  # Notebook is not read
+            return []
+        return get_summary_cells(self.notebook.cells)
 
 
 class SummaryNotebook(Notebook):
@@ -292,6 +544,23 @@ class SummaryNotebook(Notebook):
 
 
 class LogIndexNotebook(Notebook):
+    """Index page of a notebook folder
+
+    The index of a large folder can be split into multiple pages, each
+    containing some of the folder elements. The first page is '{filename}.html',
+    subsequent pages are '{filename}-{page}.html'.
+
+    Args:
+        path: Path of index notebook (does not need to exist)
+        log_folder: Notebook folder to which the index belongs
+        name: Name of index
+        parent: Parent notebook folder
+        elements: Folder elements on this page. Default is all elements
+        page: Page number, starting at 1
+        num_pages: Total number of index pages of the folder
+        lazy_summaries: Load notebook summaries from a JSON file once they are
+            scrolled into view, instead of adding them to the page
+    """
     HTML_preprocessors = [AddTitlePreprocessor]
     notebook_header_config = {'min_level': 3, 'scale_all': True}
     def __init__(self,
@@ -299,18 +568,56 @@ class LogIndexNotebook(Notebook):
                  log_folder: 'NotebookFolder',
                  name: str,
                  parent: 'NotebookFolder' = None,
+                 elements: list = None,
+                 page: int = 1,
+                 num_pages: int = 1,
+                 lazy_summaries: bool = False,
                  **kwargs):
         super().__init__(path=path, name=name, read=False, parent=parent,
                          **kwargs)
         self.log_folder = log_folder
+        self.elements = elements
+        self.page = page
+        self.num_pages = num_pages
+        self.lazy_summaries = lazy_summaries
+        # Summary markdown of notebooks {link: source} that is loaded lazily
+        self.summaries = {}
+
+    @staticmethod
+    def page_filename(filename: str, page: int) -> str:
+        return filename if page == 1 else f'{filename}-{page}'
+
+    @property
+    def summaries_filename(self):
+        return self.relative_path.with_suffix('.summaries.json').name
 
     def generate_template(self,
                           config: dict):
         super().generate_template(config)
         log_notebook_config = self.template_config.get('log_index_notebook', {})
         self.template_config.update(**log_notebook_config)
+        self.template_config['lazy_summaries'] = bool(self.summaries)
         return self.template_config
 
+    def preprocess_HTML(self):
+        notebook, resources = super().preprocess_HTML()
+        # Lazily loaded summaries are not part of the notebook
+        if any(DetectMathPreprocessor.text_has_math(source)
+               for source in self.summaries.values()):
+            resources['has_math'] = True
+        return notebook, resources
+
+    def write_HTML(self, target_dir: Path, HTML_output: str):
+        """Write HTML code, and lazily loaded summaries as JSON"""
+        super().write_HTML(target_dir, HTML_output)
+
+        if self.summaries:
+            summaries_HTML = {link: markdown2html(source)
+                              for link, source in self.summaries.items()}
+            summaries_path = self.HTML_path.with_name(self.summaries_filename)
+            summaries_path.write_text(json.dumps(summaries_HTML),
+                                      encoding='utf-8')
+
     def compile(self):
         """
         Compile index notebook
@@ -321,19 +628,50 @@ class LogIndexNotebook(Notebook):
         """
         # Start with a fresh notebook
         self.notebook = new_notebook()
+        self.summaries = {}
 
-        if self.log_folder.summary_notebook:
+        if self.log_folder.summary_notebook and self.page == 1:
             self.parse_summary_notebook(self.log_folder.summary_notebook)
 
+        if self.num_pages > 1:
+            self.notebook.cells.append(self.create_pagination_cell())
+
         # Loop through log folder elements (sorted combined folders & files)
-        for log_element in self.log_folder:
+        elements = self.log_folder if self.elements is None else self.elements
+        for log_element in elements:
             if isinstance(log_element, NotebookFolder):
                 self.parse_log_folder(log_element)
             elif isinstance(log_element, Notebook):
                 self.parse_notebook(log_element)
 
+        if self.num_pages > 1:
+            self.notebook.cells.append(self.create_pagination_cell())
+
         return self.notebook
 
+    def create_pagination_cell(self):
+        """Create cell with links to the other index pages of the folder"""
+        filename = self.relative_path.stem
+        if self.page > 1:
+            filename = filename.rsplit('-', maxsplit=1)[0]
+
+        links = []
+        if self.page > 1:
+            link = self.page_filename(filename, self.page - 1)
+            links.append(f'<a href="{link}.html">&laquo; Previous</a>')
+        for page in range(1, self.num_pages + 1):
+            if page == self.page:
+                links.append(f'<b>{page}</b>')
+            else:
+                link = self.page_filename(filename, page)
+                links.append(f'<a href="{link}.html">{page}</a>')
+        if self.page < self.num_pages:
+            link = self.page_filename(filename, self.page + 1)
+            links.append(f'<a href="{link}.html">Next &raquo;</a>')
+
+        return new_markdown_cell(
+            f'<div class="index-pagination">{" ".join(links)}</div>')
+
     def parse_summary_notebook(self, summary_notebook):
         summary_cells = increase_header_level(summary_notebook.cells,
                                               **self.notebook_header_config)
@@ -359,6 +697,7 @@ class LogIndexNotebook(Notebook):
     def parse_notebook(self, notebook):
         link = notebook.get_link(self.relative_path)
         content = f'## <a href="{link}">{notebook}</a>\n'
+        cells = [new_markdown_cell(content)]
 
         if getattr(notebook, 'summary_cells', []):
             summary_cells = notebook.summary_cells
@@ -368,19 +707,44 @@ class LogIndexNotebook(Notebook):
             summary_cells = reroute_internal_links(summary_cells,
                                                    base_link=relative_link)
 
-            # Currently only add first cell
-            content += summary_cells[0]['source']
+            # Currently only add first cell. It is added as a separate cell
+            # such that its rendered HTML is reused from the cell cache when
+            # the index page is rebuilt. It is not shared with the notebook
+            # page, since its headers and links are rewritten.
+            if self.lazy_summaries:
+                self.summaries[str(link)] = summary_cells[0]['source']
+                cells.append(new_markdown_cell(
+                    f'<div class="lazy-summary" '
+                    f'data-summaries="{self.summaries_filename}" '
+                    f'data-link="{link}"></div>'))
+            else:
+                cells.append(new_markdown_cell(summary_cells[0]['source']))
 
-        cell = new_markdown_cell(content)
-        self.notebook.cells.append(cell)
-        return [cell]
+        self.notebook.cells += cells
+        return cells
 
 
 class NotebookFolder:
-    base_dir: Path = None
-    template_config = {}
-    sections = {}
-
+    """Folder containing notebooks and notebook folders
+
+    The root folder of a website creates its BuildContext if none is
+    provided, subfolders share the context of their parent.
+
+    Args:
+        path: Path of folder, either absolute or relative to the base dir
+        name: Name of folder
+        index: Optional index of folder, from '{index} - {name}'
+        base_dir: Base directory of the notebooks. If neither a base dir nor a
+            context is provided for the root folder, path is the base dir.
+        parent: Parent notebook folder
+        sections: Optional main sections of the website
+        indexed_elements: Whether folder elements have the form
+            '{index} - {name}'
+        notebook_class: Class of notebooks in folder
+        template_config: Default template config of notebooks
+        snapshot: Snapshot of the notebook directories, scanned if not provided
+        context: Build context of the website
+    """
     def __init__(self, path: Union[str, Path],
                  name: str = None,
                  index: int = None,
@@ -389,36 +753,38 @@ class NotebookFolder:
                  sections: list = None,
                  indexed_elements: bool = True,
                  notebook_class = Notebook,
-                 template_config: dict = None):
+                 template_config: dict = None,
+                 snapshot: FilesystemSnapshot = None,
+                 context: BuildContext = None):
         self.name = name
         self.index = index
         self.parent = parent
         self.indexed_elements = indexed_elements
         self.notebook_class = notebook_class
 
-        # Update template settings if provided
-        if template_config is not None:
-            NotebookFolder.template_config = template_config
-            Notebook.template_config = template_config
-
         # Convert to Path if necessary
         if not isinstance(path, Path):
             path = Path(path)
 
-        if NotebookFolder.base_dir is None and base_dir is None:
-            logger.info(f'Setting base dir to provided path {path}')
-            base_dir = path.absolute()
-            path = Path('.')
+        if context is None and parent is not None:
+            context = parent.context
+        elif context is None:
+            if base_dir is None:
+                logger.info(f'Setting base dir to provided path {path}')
+                base_dir = path.absolute()
+                path = Path('.')
+            context = BuildContext(base_dir, name=name or '', snapshot=snapshot)
+        self.context = context
 
-        if base_dir is not None:
-            # assert base_dir.is_absolute(), "Must provide absolute folder_path"
-            NotebookFolder.base_dir = base_dir
-            Notebook.base_dir = base_dir
+        # Update template settings if provided
+        if template_config is not None:
+            self.context.template_config = template_config
+        self.template_config = self.context.template_config
 
         # Set absolute and relative path
         if path.is_absolute():
             self.absolute_path: Path = path
-            self.relative_path: Path = path.relative_to(NotebookFolder.base_dir)
+            self.relative_path: Path = path.relative_to(self.base_dir)
         else:
             self.absolute_path: Path = self.base_dir / path
             self.relative_path: Path = path
@@ -432,6 +798,8 @@ class NotebookFolder:
 
         # Index notebook can be compiled via self.compile_index_notebook
         self.index_notebook: LogIndexNotebook = None
+        # All index pages, the first of which is the index notebook
+        self.index_pages: List[LogIndexNotebook] = []
 
     def __iter__(self):
         contents = [*self.notebook_folders, *self.notebooks]
@@ -448,6 +816,18 @@ class NotebookFolder:
         else:
             return self.name
 
+    @property
+    def base_dir(self) -> Path:
+        return self.context.base_dir
+
+    @property
+    def snapshot(self) -> FilesystemSnapshot:
+        return self.context.snapshot
+
+    @property
+    def sections(self) -> dict:
+        return self.context.sections
+
     @property
     def parents(self):
         if self.parent is None:
@@ -471,7 +851,7 @@ class NotebookFolder:
 
             # TODO raise warning if combined indices are not sequential
         else:
-            NotebookFolder.sections = sections
+            self.context.sections = sections
             for name, section in sections.items():
                 if isinstance(section, str):  # Path provided instead of dict
                     path = section
@@ -485,24 +865,24 @@ class NotebookFolder:
                     path = Path(path)
 
                 # register section
-                NotebookFolder.sections[name]['path'] = path
-                NotebookFolder.sections[name]['notebook_class'] = notebook_class
+                self.sections[name]['path'] = path
+                self.sections[name]['notebook_class'] = notebook_class
 
                 absolute_path = self.base_dir / path
-                if absolute_path.is_dir():  # Section is a folder
+                if self.snapshot.is_dir(absolute_path):  # Section is a folder
                     notebook_folder = NotebookFolder(name=name,
                                                      index=None,
                                                      parent=self,
-                                                     **NotebookFolder.sections[name])
+                                                     **self.sections[name])
                     self.notebook_folders.append(notebook_folder)
-                    NotebookFolder.sections[name]['notebook_folder'] = notebook_folder
+                    self.sections[name]['notebook_folder'] = notebook_folder
                 elif absolute_path.suffix == '.ipynb':  # Section is a notebook
                     notebook = notebook_class(name=name,
                                               index=None,
                                               parent=self,
-                                              **NotebookFolder.sections[name])
+                                              **self.sections[name])
                     self.notebooks.append(notebook)
-                    NotebookFolder.sections[name]['notebook'] = notebook
+                    self.sections[name]['notebook'] = notebook
                 else:
                     raise TypeError(f'Section {name} must be dir or notebook')
 
@@ -516,15 +896,17 @@ class NotebookFolder:
         Notebook folders are sorted by their index
         """
         # Retrieve log folders
+        directory = self.snapshot[self.absolute_path]
         if self.indexed_elements:  #Folders must start with an index
-            log_folder_paths = self.absolute_path.glob('[0-9]* - *')
+            log_folder_entries = directory.glob('[0-9]* - *')
         else:
-            log_folder_paths = self.absolute_path.glob('*')
+            log_folder_entries = directory.glob('*')
 
         log_folders = []
-        for log_folder_path in log_folder_paths:
-            if not log_folder_path.is_dir():
+        for log_folder_entry in log_folder_entries:
+            if not log_folder_entry.is_dir:
                 continue
+            log_folder_path = self.absolute_path / log_folder_entry.name
 
             if self.indexed_elements:  # extract index and name '{idx} - {name}'
                 index, name = log_folder_path.stem.split(' - ', maxsplit=1)
@@ -553,13 +935,17 @@ class NotebookFolder:
     def extract_files(self, ignore_indices: List[int] = None,
                       ignore_names: List[str] = None):
         # Retrieve log notebooks
+        directory = self.snapshot[self.absolute_path]
         if self.indexed_elements:  # starting with an index)
-            log_notebook_paths = self.absolute_path.glob('[0-9]* - *.ipynb')
+            log_notebook_entries = directory.glob('[0-9]* - *.ipynb')
         else:
-            log_notebook_paths = self.absolute_path.glob('*.ipynb')
+            log_notebook_entries = directory.glob('*.ipynb')
 
         log_notebooks = []
-        for log_notebook_path in log_notebook_paths:
+        for log_notebook_entry in log_notebook_entries:
+            if log_notebook_entry.is_dir:
+                continue
+            log_notebook_path = self.absolute_path / log_notebook_entry.name
             if self.indexed_elements:
                 # extract index and name '{idx} - {name}'
                 index, name = log_notebook_path.stem.split(' - ', maxsplit=1)
@@ -585,14 +971,54 @@ class NotebookFolder:
 
     def extract_summary_notebook(self):
         # Add a summary notebook if it exists
-        for path in self.absolute_path.iterdir():
-            if path.name.lower().endswith('summary.ipynb'):
-                return SummaryNotebook(path, name='Summary', index=None,
+        for entry in self.snapshot[self.absolute_path]:
+            if entry.name.lower().endswith('summary.ipynb'):
+                return SummaryNotebook(self.absolute_path / entry.name,
+                                       name='Summary', index=None,
                                        parent=self)
         else:
             # No summary notebook found
             return None
 
+    def iter_notebooks(self, recursive: bool = True):
+        """Iterate over all notebooks read from disk, including summaries
+
+        Index notebooks are not included since they are compiled.
+        """
+        yield from self.notebooks
+        if self.summary_notebook is not None:
+            yield self.summary_notebook
+
+        if recursive:
+            for log_folder in self.notebook_folders:
+                yield from log_folder.iter_notebooks(recursive=True)
+
+    def iter_pages(self, recursive: bool = True):
+        """Iterate over all notebooks that are converted to a separate page"""
+        yield from self.notebooks
+
+        if recursive:
+            for log_folder in self.notebook_folders:
+                yield from log_folder.iter_pages(recursive=True)
+
+    def iter_index_notebooks(self, recursive: bool = True):
+        """Iterate over all compiled index notebooks, including all pages"""
+        yield from self.index_pages
+
+        if recursive:
+            for log_folder in self.notebook_folders:
+                yield from log_folder.iter_index_notebooks(recursive=True)
+
+    def validate_notebooks(self, recursive: bool = True):
+        """Validate all notebooks against the nbformat schema
+
+        Returns:
+            List of notebooks that are invalid
+        """
+        return [notebook for notebook in self.iter_notebooks(recursive=recursive)
+                if not validate_notebook(notebook.absolute_path,
+                                         notebook=notebook.notebook)]
+
     def get_link(self, base_path: Path, offset: int = 0):
         """Get relative link to index notebook with respect to base path"""
         assert self.index_notebook, "Cannot link to {self}: no index notebook"
@@ -610,10 +1036,10 @@ class NotebookFolder:
             self.template_config['base_path'] = Path('/'.join(['..'] * log_notebook.level))
             log_notebook.generate_template(self.template_config)
 
-        # Generate index template
-        if self.index_notebook is not None:
-            self.template_config['base_path'] = Path('/'.join(['..'] * self.index_notebook.level))
-            self.index_notebook.generate_template(self.template_config)
+        # Generate index templates
+        for index_page in self.index_pages:
+            self.template_config['base_path'] = Path('/'.join(['..'] * index_page.level))
+            index_page.generate_template(self.template_config)
 
         if recursive:
             for log_subfolder in self.notebook_folders:
@@ -621,26 +1047,25 @@ class NotebookFolder:
 
     def convert_to_HTML(self,
                         target_dir: Path,
-                        recursive: bool = True):
+                        recursive: bool = True,
+                        **pipeline_kwargs):
         """Convert notebooks in a folder structure to HTML files
 
+        Notebooks are converted using a ConversionPipeline
+
         Args:
             target_dir: Target directory for output HTML files
             recursive: Also include subdirectories
+            **pipeline_kwargs: Optional kwargs for the ConversionPipeline
 
         Returns:
-            None
+            List of (notebook, stage name, exception) of notebooks that failed
         """
-        for log_notebook in self.notebooks:
-            log_notebook.convert_to_HTML(target_dir=target_dir)
+        notebooks = [*self.iter_pages(recursive=recursive),
+                     *self.iter_index_notebooks(recursive=recursive)]
 
-        if self.index_notebook is not None:
-            self.index_notebook.convert_to_HTML(target_dir=target_dir)
-
-        # Convert log notebook folders
-        if recursive:
-            for log_folder in self.notebook_folders:
-                log_folder.convert_to_HTML(target_dir=target_dir)
+        pipeline = ConversionPipeline(target_dir=target_dir, **pipeline_kwargs)
+        return pipeline.run(notebooks)
 
     def convert_to_PDF(self,
                         target_dir: Path,
@@ -657,8 +1082,8 @@ class NotebookFolder:
         for log_notebook in self.notebooks:
             log_notebook.convert_to_PDF(target_dir=target_dir)
 
-        if self.index_notebook is not None:
-            self.index_notebook.convert_to_PDF(target_dir=target_dir)
+        for index_page in self.index_pages:
+            index_page.convert_to_PDF(target_dir=target_dir)
 
         # Convert log notebook folders
         if recursive:
@@ -668,7 +1093,10 @@ class NotebookFolder:
     def compile_index_notebook(self,
                                filename: str = 'index',
                                save: bool = False,
-                               recursive: bool = True):
+                               recursive: bool = True,
+                               page_size: int = None,
+                               newest_first: bool = False,
+                               lazy_summaries: bool = False):
         """
         Compile index notebook from its notebooks and optional summary
 
@@ -676,25 +1104,55 @@ class NotebookFolder:
             filename: Name of the notebook (default 'Index').
                  Not relevant if save = False
             save: Save index notebook (default False)
+            page_size: Maximum number of folder elements per index page.
+                Default is a single page containing all elements
+            newest_first: List elements from highest to lowest index
+            lazy_summaries: Load notebook summaries lazily, see LogIndexNotebook
 
         Returns:
             Index notebook
 
         Note:
-            Index notebook is also saved to self.index_notebook
+            Index notebook is also saved to self.index_notebook, and all index
+            pages to self.index_pages
         """
-        path = self.absolute_path / Path(filename).with_suffix('.ipynb')
-        self.index_notebook = LogIndexNotebook(path=path,
-                                               log_folder=self,
-                                               name=self.name,
-                                               index=self.index,
-                                               parent=self.parent)
+        # Elements are ordered by their index, see __iter__
+        elements = list(self)
+        if newest_first:
+            elements.reverse()
+
+        if page_size:
+            pages = [elements[k:k + page_size]
+                     for k in range(0, len(elements), page_size)] or [[]]
+        else:
+            pages = [elements]
+
+        self.index_pages = []
+        for page, page_elements in enumerate(pages, start=1):
+            page_filename = LogIndexNotebook.page_filename(filename, page)
+            path = self.absolute_path / Path(page_filename).with_suffix('.ipynb')
+            self.index_pages.append(LogIndexNotebook(path=path,
+                                                     log_folder=self,
+                                                     name=self.name,
+                                                     index=self.index,
+                                                     parent=self.parent,
+                                                     context=self.context,
+                                                     elements=page_elements,
+                                                     page=page,
+                                                     num_pages=len(pages),
+                                                     lazy_summaries=lazy_summaries))
+        self.index_notebook = self.index_pages[0]
 
         if recursive:
             for log_folder in self.notebook_folders:
-                log_folder.compile_index_notebook(filename=filename, save=save)
-
-        self.index_notebook.compile()
+                log_folder.compile_index_notebook(filename=filename,
+                                                  save=save,
+                                                  page_size=page_size,
+                                                  newest_first=newest_first,
+                                                  lazy_summaries=lazy_summaries)
+
+        for index_page in self.index_pages:
+            index_page.compile()
 
         # TODO add save
         return self.index_notebook
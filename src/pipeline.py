@@ -0,0 +1,326 @@
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Callable, List
+
+from .watchdog import Watchdog, NotebookLimitExceeded
+
+
+__all__ = ['ExporterPool',
+           'ConversionPipeline']
+
+logger = logging.getLogger(__name__)
+
+# Sentinel signalling a stage worker that there are no more items
+_STOP = object()
+
+
+class _Stage:
+    """Pool of worker threads applying a function to items from a queue
+
+    Results are put in the output queue, which is bounded such that a stage
+    blocks once it is too far ahead of the next stage.
+    """
+    def __init__(self, name: str, function: Callable, workers: int,
+                 input_queue: queue.Queue, output_queue: queue.Queue = None,
+                 on_error: Callable = None):
+        self.name = name
+        self.function = function
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.on_error = on_error
+        self.threads = [threading.Thread(target=self._work,
+                                         name=f'{name}-{k}',
+                                         daemon=True)
+                        for k in range(workers)]
+
+    def _work(self):
+        while True:
+            item = self.input_queue.get()
+            if item is _STOP:
+                break
+
+            t0 = time.perf_counter()
+            try:
+                result = self.function(item)
+            except Exception as e:
+                item['seconds'] += time.perf_counter() - t0
+                # The worker must keep consuming items until it is stopped,
+                # else earlier stages block on the bounded queue
+                try:
+                    self.on_error(item, self.name, e)
+                except Exception as error_handler_exception:
+                    logger.exception(f'Error while handling failure of '
+                                     f'{self.name} stage: {error_handler_exception!r}')
+                continue
+            item['seconds'] += time.perf_counter() - t0
+
+            if self.output_queue is not None:
+                self.output_queue.put(result)
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self, next_stage: '_Stage' = None):
+        """Wait for all workers to finish, then stop the next stage"""
+        for thread in self.threads:
+            thread.join()
+        if next_stage is not None:
+            for _ in next_stage.threads:
+                next_stage.input_queue.put(_STOP)
+
+
+class ExporterPool:
+    """Pool of HTML exporters that can be shared by pipelines
+
+    Exporters are not thread-safe, so an exporter is only used by one thread
+    at a time. Since creating an exporter (loading and compiling its
+    templates) is relatively slow, exporters are returned to the pool after
+    use, and reused by other threads, pipelines and websites.
+
+    Args:
+        template_cache_dir: Optional directory in which compiled templates
+            are stored, such that templates are only compiled again when they
+            change, rather than on every run
+    """
+    def __init__(self, template_cache_dir: Path = None):
+        # Idle exporters {template path: [exporter, ...]}
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+        self.bytecode_cache = None
+        if template_cache_dir is not None:
+            from jinja2 import FileSystemBytecodeCache
+            Path(template_cache_dir).mkdir(parents=True, exist_ok=True)
+            self.bytecode_cache = FileSystemBytecodeCache(str(template_cache_dir))
+
+    @contextmanager
+    def exporter(self, notebook, **highlight_settings):
+        """Borrow an exporter for the notebook's template
+
+        Exporters are pooled per template and highlight settings (see
+        ``Notebook.configure_HTML_exporter``), such that their Jinja
+        environment is not recreated when switching between notebooks.
+
+        Args:
+            notebook: Notebook whose template is used
+            **highlight_settings: Settings of the exporter, see
+                ``Notebook.get_highlight_settings``
+        """
+        key = (notebook.template_path, tuple(sorted(highlight_settings.items())))
+        with self._lock:
+            idle = self._idle[key]
+            HTML_exporter = idle.pop() if idle else None
+        if HTML_exporter is None:
+            HTML_exporter = notebook.create_HTML_exporter()
+        notebook.configure_HTML_exporter(HTML_exporter, **highlight_settings)
+        # The environment is recreated whenever a trait affecting it changes
+        if self.bytecode_cache is not None:
+            HTML_exporter.environment.bytecode_cache = self.bytecode_cache
+
+        try:
+            yield HTML_exporter
+        finally:
+            with self._lock:
+                self._idle[key].append(HTML_exporter)
+
+
+class ConversionPipeline:
+    """Convert notebooks to HTML in overlapping read, preprocess, render and
+    write stages
+
+    Each stage has its own worker threads, and stages are connected by bounded
+    queues. Reading notebooks from and writing pages to a (network) drive
+    therefore happens while other notebooks are being rendered, and the total
+    time approaches that of the slowest stage. Since at most ``queue_size``
+    notebooks are waiting between two stages, memory usage stays bounded.
+
+    Rendering happens in threads rather than processes, since the nbconvert
+    exporters and the NotebookFolder tree cannot be sent to other processes.
+    Because rendering is mostly pure Python, the GIL means that notebooks are
+    effectively rendered one at a time, and more render threads only add
+    contention. The default of two render threads lets one thread render
+    while the other reads cached cells from disk.
+
+    A notebook that fails to convert is logged and skipped, failures are
+    available in ``ConversionPipeline.failures`` after running. If a watchdog
+    is provided, reading, preprocessing and rendering a notebook is subject
+    to its time and memory limits. A notebook exceeding a limit is replaced
+    by a placeholder page stating the error.
+
+    Args:
+        target_dir: Target directory for output HTML files
+        read_workers: Number of threads reading notebooks
+        preprocess_workers: Number of threads applying HTML preprocessors
+        render_workers: Number of threads rendering HTML
+        write_workers: Number of threads writing HTML files
+        queue_size: Maximum number of notebooks waiting between two stages
+        write_retries: Number of times a failed write is retried
+        retry_delay: Delay before the first retry, doubled for every retry
+        exporter_pool: Pool of exporters, which can be shared with other
+            pipelines. A new pool is created if not provided.
+        watchdog: Optional watchdog limiting the time and memory used to
+            convert a notebook. Should be started before running.
+    """
+    def __init__(self,
+                 target_dir: Path,
+                 read_workers: int = 4,
+                 preprocess_workers: int = 1,
+                 render_workers: int = 2,
+                 write_workers: int = 4,
+                 queue_size: int = 8,
+                 write_retries: int = 3,
+                 retry_delay: float = 1,
+                 exporter_pool: ExporterPool = None,
+                 watchdog: Watchdog = None):
+        self.target_dir = Path(target_dir)
+        self.workers = {'read': read_workers,
+                        'preprocess': preprocess_workers,
+                        'render': render_workers,
+                        'write': write_workers}
+        self.queue_size = queue_size
+        self.write_retries = write_retries
+        self.retry_delay = retry_delay
+
+        self.exporter_pool = exporter_pool or ExporterPool()
+        self.watchdog = watchdog
+
+        self.failures = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _watch(self, item):
+        """Apply the watchdog limits to a stage of converting a notebook"""
+        if self.watchdog is None:
+            yield
+        else:
+            with self.watchdog.watch(item['notebook'], elapsed=item['seconds']):
+                yield
+
+    def _read(self, item):
+        notebook = item['notebook']
+        logger.info(f'Starting HTML conversion of {notebook.relative_path}')
+        if self.watchdog is not None:
+            self.watchdog.check_size(notebook)
+        with self._watch(item):
+            # Accessing the notebook reads it if needed
+            notebook.notebook
+        return item
+
+    def _preprocess(self, item):
+        with self._watch(item):
+            item['nb'], item['resources'] = item['notebook'].preprocess_HTML()
+        return item
+
+    def _render(self, item):
+        notebook = item['notebook']
+        highlight_settings = notebook.get_highlight_settings(item['nb'], item['resources'])
+        with self.exporter_pool.exporter(notebook, **highlight_settings) as HTML_exporter:
+            with self._watch(item):
+                item['output'] = notebook.render_HTML(
+                    item.pop('nb'), item.pop('resources'),
+                    HTML_exporter=HTML_exporter,
+                    target_dir=self.target_dir)
+        return item
+
+    def _write(self, item):
+        notebook = item['notebook']
+        for attempt in range(self.write_retries + 1):
+            try:
+                notebook.write_HTML(self.target_dir, item['output'])
+                break
+            except OSError as e:
+                if attempt == self.write_retries:
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning(f'Writing {notebook.relative_path} failed ({e}), '
+                               f'retrying in {delay} s')
+                time.sleep(delay)
+
+        if notebook.build_stats is not None:
+            notebook.build_stats.record_notebook(
+                notebook.relative_path,
+                seconds=item['seconds'],
+                bytes=len(item['output'].encode('utf-8')),
+                metadata=notebook.metadata)
+
+        # Release parsed notebook, it can be read again when needed
+        if notebook._read:
+            notebook.notebook = None
+
+        logger.info(f'HTML notebook converted: {notebook.relative_path}')
+
+    def _write_placeholder(self, notebook, exception: Exception):
+        """Write a page stating why the notebook could not be converted"""
+        try:
+            with self.exporter_pool.exporter(notebook) as HTML_exporter:
+                HTML_output = notebook.render_placeholder_HTML(
+                    str(exception), HTML_exporter=HTML_exporter)
+            notebook.write_HTML(self.target_dir, HTML_output)
+        except Exception as e:
+            logger.error(f'Could not write placeholder page of '
+                         f'{notebook.relative_path}: {e!r}')
+            return False
+        return True
+
+    def _on_error(self, item, stage_name, exception):
+        notebook = item['notebook']
+        logger.error(f'Could not {stage_name} {notebook.relative_path}: '
+                     f'{exception!r}')
+
+        placeholder = False
+        if isinstance(exception, NotebookLimitExceeded):
+            # Release the (possibly huge) notebook before rendering a placeholder
+            item.pop('nb', None)
+            if notebook._read:
+                notebook.notebook = None
+            placeholder = self._write_placeholder(notebook, exception)
+
+        if notebook.build_stats is not None:
+            notebook.build_stats.record_failure(
+                notebook.relative_path,
+                stage=stage_name,
+                error=str(exception) or repr(exception),
+                seconds=item['seconds'],
+                placeholder=placeholder)
+        with self._lock:
+            self.failures.append((notebook, stage_name, exception))
+
+    def run(self, notebooks: List['Notebook']):
+        """Convert notebooks to HTML
+
+        Args:
+            notebooks: Notebooks to convert. Templates must already have been
+                generated.
+
+        Returns:
+            List of (notebook, stage name, exception) of notebooks that failed
+        """
+        queues = [queue.Queue(maxsize=self.queue_size)
+                  for _ in range(len(self.workers))]
+        functions = [self._read, self._preprocess, self._render, self._write]
+        stages = []
+        for k, (name, workers) in enumerate(self.workers.items()):
+            output_queue = queues[k + 1] if k + 1 < len(queues) else None
+            stages.append(_Stage(name, functions[k], workers,
+                                 input_queue=queues[k],
+                                 output_queue=output_queue,
+                                 on_error=self._on_error))
+
+        for stage in stages:
+            stage.start()
+
+        for notebook in notebooks:
+            queues[0].put({'notebook': notebook, 'seconds': 0})
+        for _ in stages[0].threads:
+            queues[0].put(_STOP)
+
+        for stage, next_stage in zip(stages, [*stages[1:], None]):
+            stage.join(next_stage=next_stage)
+
+        return self.failures
@@ -0,0 +1,180 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+
+__all__ = ['BuildPlan']
+
+logger = logging.getLogger(__name__)
+
+
+class BuildPlan:
+    """Overview of what a build would regenerate and why, without rendering
+
+    Each output is compared with the inputs it depends on. An output is
+    regenerated if it does not exist yet, if its notebook (or for index
+    pages, one of the folder elements) was modified after the output was
+    written, or if the templates or config were modified since. Pages that
+    are up to date are still converted by a build, but all their cells are
+    then taken from the cell cache.
+
+    Time and size estimates use the costs recorded in previous builds (see
+    ``BuildStats.load_costs``). Pages without recorded costs are estimated
+    using the average cost of the other pages.
+
+    Args:
+        target_dir: Root directory of the website
+        costs: Per-page costs of previous builds
+            {relative notebook path: {'seconds': float, 'bytes': int}}
+        inputs_mtime: Latest modification time of the templates and config
+    """
+    # {item kind: title in plan}
+    item_kinds = {'notebook': 'Notebooks',
+                  'index page': 'Index pages',
+                  'search content': 'Search content',
+                  'asset': 'Assets'}
+
+    def __init__(self, target_dir: Union[str, Path],
+                 costs: Dict[str, dict] = None,
+                 inputs_mtime: float = 0):
+        self.target_dir = Path(target_dir)
+        self.costs = costs if costs is not None else {}
+        self.inputs_mtime = inputs_mtime
+        # {'kind', 'path', 'reason', 'seconds', 'bytes'}, reason is None if
+        # the output is up to date
+        self.items: List[dict] = []
+
+    @staticmethod
+    def _format_bytes(bytes: float) -> str:
+        if bytes < 1e6:
+            return f'{bytes / 1e3:.0f} kB'
+        return f'{bytes / 1e6:.1f} MB'
+
+    @staticmethod
+    def _mtime(path: Path) -> float:
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def get_reason(self, output_path: Path, source_mtime: float = 0,
+                   source_reason: str = 'notebook modified') -> str:
+        """Reason why an output would be regenerated, None if it is up to date"""
+        output_mtime = self._mtime(output_path)
+        if output_mtime is None:
+            return 'no previous output'
+        elif source_mtime > output_mtime:
+            return source_reason
+        elif self.inputs_mtime > output_mtime:
+            return 'templates or config modified'
+        else:
+            return None
+
+    def add(self, kind: str, path: Path, reason: str,
+            seconds: float = None, bytes: int = None):
+        self.items.append({'kind': kind, 'path': Path(path).as_posix(),
+                           'reason': reason, 'seconds': seconds, 'bytes': bytes})
+
+    def add_page(self, notebook, kind: str, source_mtime: float,
+                 source_reason: str = 'notebook modified'):
+        """Add a page, using its cost recorded in previous builds"""
+        output_path = self.target_dir / notebook.relative_path.with_suffix('.html')
+        cost = self.costs.get(notebook.relative_path.as_posix(), {})
+        self.add(kind, notebook.relative_path.with_suffix('.html'),
+                 reason=self.get_reason(output_path, source_mtime, source_reason),
+                 seconds=cost.get('seconds'), bytes=cost.get('bytes'))
+
+    def plan_notebooks(self, notebooks: Iterable):
+        for notebook in notebooks:
+            _, mtime = notebook.stat()
+            self.add_page(notebook, 'notebook', source_mtime=mtime)
+
+    def plan_index_pages(self, index_pages: Iterable):
+        for index_page in index_pages:
+            # Index pages show the title and summary of each folder element
+            folder = index_page.log_folder
+            mtimes = [folder.snapshot[folder.absolute_path].mtime]
+            if folder.summary_notebook is not None:
+                mtimes.append(folder.summary_notebook.stat()[1])
+            for element in index_page.elements:
+                if hasattr(element, 'stat'):
+                    mtimes.append(element.stat()[1])
+                else:  # Notebook folder
+                    mtimes.append(folder.snapshot[element.absolute_path].mtime)
+            self.add_page(index_page, 'index page', source_mtime=max(mtimes),
+                          source_reason='folder contents modified')
+
+    def plan_search_content(self, filename: str = 'search_manifest.js'):
+        """The search content changes whenever a notebook page changes"""
+        output_path = self.target_dir / filename
+        notebook_reasons = [item['reason'] for item in self.items
+                            if item['kind'] == 'notebook' and item['reason']]
+        if self._mtime(output_path) is None:
+            reason = 'no previous output'
+        elif any(reason != 'templates or config modified'
+                 for reason in notebook_reasons):
+            reason = 'notebook pages modified'
+        else:
+            reason = None
+        self.add('search content', filename, reason=reason)
+
+    def plan_assets(self, paths: Iterable[Union[str, Path]],
+                    depends_on_pages: bool = False):
+        """Add assets generated from the config, or also from all pages"""
+        pages_modified = any(item['reason'] for item in self.items
+                             if item['kind'] in ['notebook', 'index page'])
+        for path in paths:
+            reason = self.get_reason(self.target_dir / path)
+            if reason is None and depends_on_pages and pages_modified:
+                reason = 'pages modified'
+            self.add('asset', path, reason=reason)
+
+    def estimate(self) -> Dict[str, float]:
+        """Estimated total conversion time and output size of all pages
+
+        All pages are included, since up to date pages are also converted
+        (from cached cells), and their recorded costs reflect that.
+        """
+        pages = [item for item in self.items
+                 if item['kind'] in ['notebook', 'index page']]
+        costed = [item for item in pages if item['seconds'] is not None]
+        if costed:
+            mean_seconds = sum(item['seconds'] for item in costed) / len(costed)
+            mean_bytes = sum(item['bytes'] for item in costed) / len(costed)
+        else:
+            mean_seconds = mean_bytes = 0
+
+        return {
+            'seconds': sum(mean_seconds if item['seconds'] is None else item['seconds']
+                           for item in pages),
+            'bytes': sum(mean_bytes if item['bytes'] is None else item['bytes']
+                         for item in pages),
+            'regenerated_bytes': sum(mean_bytes if item['bytes'] is None else item['bytes']
+                                     for item in pages if item['reason']),
+            'uncosted': len(pages) - len(costed)}
+
+    def format(self) -> str:
+        """Human-readable plan listing all outputs that would be regenerated"""
+        lines = []
+        for kind, title in self.item_kinds.items():
+            items = [item for item in self.items if item['kind'] == kind]
+            if not items:
+                continue
+            regenerated = [item for item in items if item['reason']]
+            lines.append(f'{title}: {len(regenerated)} of {len(items)} regenerated')
+            for item in regenerated:
+                cost = ''
+                if item['seconds'] is not None:
+                    cost = (f' ({item["seconds"]:.1f} s, '
+                            f'{self._format_bytes(item["bytes"])})')
+                lines.append(f'  {item["path"]}: {item["reason"]}{cost}')
+
+        estimate = self.estimate()
+        lines.append(f'Estimated conversion time {estimate["seconds"]:.1f} s, '
+                     f'{self._format_bytes(estimate["regenerated_bytes"])} of '
+                     f'{self._format_bytes(estimate["bytes"])} of pages regenerated')
+        if estimate['uncosted']:
+            lines.append(f'{estimate["uncosted"]} pages have no recorded cost, '
+                         f'their cost is estimated from the other pages')
+        return '\n'.join(lines)
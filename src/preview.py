@@ -0,0 +1,252 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Callable
+from collections import defaultdict
+from urllib.parse import quote, unquote, urlparse
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from .assets import site_libs_dir
+from .pipeline import ExporterPool
+
+
+__all__ = ['PreviewServer']
+
+logger = logging.getLogger(__name__)
+
+
+class _PreviewRequestHandler(SimpleHTTPRequestHandler):
+    """Request handler rendering pages of the preview before serving them"""
+    def _prepare(self) -> bool:
+        try:
+            self.server.preview.prepare(self.path)
+            return True
+        except Exception as e:
+            logger.exception(f'Could not render {self.path}')
+            self.send_error(500, f'Could not render page: {e!r}')
+            return False
+
+    def _redirect_to_root(self) -> bool:
+        """Redirect requests of '/' to the website root"""
+        if urlparse(self.path).path != '/':
+            return False
+        self.send_response(302)
+        self.send_header('Location', self.server.preview.root_url)
+        self.end_headers()
+        return True
+
+    def do_GET(self):
+        if not self._redirect_to_root() and self._prepare():
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self._redirect_to_root() and self._prepare():
+            super().do_HEAD()
+
+    def translate_path(self, path):
+        return str(self.server.preview.translate_path(path))
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class PreviewServer:
+    """Local HTTP server that renders pages when they are first requested
+
+    The notebook folder tree is built up front, but a notebook or index page
+    is only converted (see ``Notebook.convert_to_HTML``) once it is requested,
+    so the time until the first page is shown does not depend on the size of
+    the website. Rendered pages are kept until the modification time of their
+    notebook changes. Index pages are rendered again once one of their
+    notebooks or folders is modified, and the notebook folder tree is
+    reloaded if notebooks are added or removed.
+
+    Pages are rendered while holding a lock of the page only, such that a
+    slow page does not block requests of other pages.
+
+    The website is served at ``http://{host}:{port}/{name}/``, and site-libs
+    is served directly from the converter at ``/site-libs``. Search content is
+    not generated, so search is unavailable in the preview.
+
+    Args:
+        notebook_folder: Root notebook folder, whose index notebooks have been
+            compiled and whose templates have been generated
+        target_dir: Directory in which rendered pages are saved
+        site_depth: Depth of the website root below the folder containing
+            site-libs, see the template config
+        exporter_pool: Optional pool of exporters used to render pages
+        reload: Optional function returning a new root notebook folder, in the
+            same state as notebook_folder, once notebooks are added or removed
+        host: Host name of server
+        port: Port of server
+    """
+    def __init__(self, notebook_folder, target_dir: Path,
+                 site_depth: int = 1,
+                 exporter_pool: ExporterPool = None,
+                 reload: Callable[[], 'NotebookFolder'] = None,
+                 host: str = 'localhost',
+                 port: int = 8000):
+        self.target_dir = Path(target_dir)
+        self.exporter_pool = exporter_pool or ExporterPool()
+        self.reload = reload
+        self.host = host
+        self.port = port
+
+        # URL path of the website root, such that site-libs is at /site-libs
+        folders = ['preview'] * (site_depth - 1) + [notebook_folder.name]
+        self.root_url = '/' + '/'.join(quote(folder) for folder in folders) + '/'
+
+        # {page path relative to target_dir: notebook or index page}
+        self.pages = {}
+        self._set_notebook_folder(notebook_folder)
+        # {page path: modification times of its inputs when it was rendered}
+        self.rendered = {}
+        # Lock of self.pages and self._page_locks
+        self._lock = threading.Lock()
+        # {page path: lock held while rendering the page}
+        self._page_locks = defaultdict(threading.Lock)
+
+    def _set_notebook_folder(self, notebook_folder):
+        self.notebook_folder = notebook_folder
+        self.pages = {
+            notebook.relative_path.with_suffix('.html').as_posix(): notebook
+            for notebook in [*notebook_folder.iter_pages(),
+                             *notebook_folder.iter_index_notebooks()]}
+
+    def _relative_path(self, url: str) -> str:
+        """Path relative to the website root, None if outside the website"""
+        path = unquote(urlparse(url).path)
+        root_path = unquote(self.root_url)
+        if not path.startswith(root_path):
+            return None
+        relative_path = path[len(root_path):]
+        if relative_path == '' or relative_path.endswith('/'):
+            relative_path += 'index.html'
+        return relative_path
+
+    def translate_path(self, url: str) -> Path:
+        """Local path of the file requested by a URL"""
+        path = unquote(urlparse(url).path)
+        if '..' in Path(path).parts:
+            return self.target_dir.parent / '.outside-website'
+        if path.startswith('/site-libs/'):
+            return site_libs_dir / path[len('/site-libs/'):]
+
+        relative_path = self._relative_path(url)
+        if relative_path is None:
+            # Path outside the website, which does not exist
+            return self.target_dir.parent / '.outside-website'
+        return self.target_dir / relative_path
+
+    @staticmethod
+    def _is_index_page(notebook) -> bool:
+        return hasattr(notebook, 'log_folder')
+
+    @staticmethod
+    def _get_mtime(path: Path):
+        """Modification time of a path, None if it does not exist"""
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _get_inputs(self, notebook) -> dict:
+        """Modification times of the files from which a page is rendered
+
+        Returns:
+            {path: modification time} of the notebook, or for index pages of
+            the folder, its summary notebook and the elements on the page
+        """
+        if not self._is_index_page(notebook):
+            return {str(notebook.absolute_path): self._get_mtime(notebook.absolute_path)}
+
+        log_folder = notebook.log_folder
+        paths = [log_folder.absolute_path]
+        if log_folder.summary_notebook is not None and notebook.page == 1:
+            paths.append(log_folder.summary_notebook.absolute_path)
+        elements = log_folder if notebook.elements is None else notebook.elements
+        paths += [element.absolute_path for element in elements]
+        return {str(path): self._get_mtime(path) for path in paths}
+
+    def _update_index_page(self, relative_path: str, index_notebook,
+                           previous_inputs: dict, inputs: dict):
+        """Update an index page whose notebooks or folders were modified
+
+        Returns:
+            The index page, which is a new one if the notebook folder tree
+            was reloaded, or None if the page no longer exists
+        """
+        if inputs.keys() != previous_inputs.keys() or any(
+                os.path.isdir(path) and previous_inputs[path] != mtime
+                for path, mtime in inputs.items()):
+            # Notebooks or folders were added or removed
+            if self.reload is not None:
+                logger.info('Reloading notebook folders')
+                notebook_folder = self.reload()
+                with self._lock:
+                    self._set_notebook_folder(notebook_folder)
+                    return self.pages.get(relative_path)
+
+        # Summaries of modified notebooks are read again
+        log_folder = index_notebook.log_folder
+        for element in [log_folder.summary_notebook, *log_folder]:
+            path = str(element.absolute_path) if element is not None else None
+            if path not in inputs or inputs[path] == previous_inputs.get(path):
+                continue
+            if not getattr(element, '_read', False):  # Notebook folder
+                continue
+            if hasattr(element, 'summary_cells'):
+                element.load_notebook()
+                element.summary_cells = element.extract_summary_cells()
+            element.notebook = None
+        index_notebook.compile()
+        return index_notebook
+
+    def prepare(self, url: str):
+        """Render the requested page if it was not rendered or is outdated"""
+        relative_path = self._relative_path(url)
+        with self._lock:
+            notebook = self.pages.get(relative_path)
+            page_lock = self._page_locks[relative_path]
+        if notebook is None:
+            return
+
+        with page_lock:
+            inputs = self._get_inputs(notebook)
+            previous_inputs = self.rendered.get(relative_path)
+            if previous_inputs == inputs:
+                return
+
+            if self._is_index_page(notebook) and previous_inputs is not None:
+                notebook = self._update_index_page(relative_path, notebook,
+                                                   previous_inputs, inputs)
+                if notebook is None:
+                    return
+                inputs = self._get_inputs(notebook)
+
+            if notebook._read:
+                # Read the modified notebook again
+                notebook.notebook = None
+            notebook.convert_to_HTML(self.target_dir,
+                                     exporter_pool=self.exporter_pool)
+            if notebook._read:
+                notebook.notebook = None
+            self.rendered[relative_path] = inputs
+
+    def create_server(self) -> ThreadingHTTPServer:
+        """Create the HTTP server, which is started using serve_forever"""
+        server = ThreadingHTTPServer((self.host, self.port), _PreviewRequestHandler)
+        server.preview = self
+        return server
+
+    def serve_forever(self):
+        self.target_dir.mkdir(parents=True, exist_ok=True)
+        server = self.create_server()
+        logger.info(f'Serving preview at http://{self.host}:{self.port}{self.root_url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
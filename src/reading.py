@@ -0,0 +1,83 @@
+import json
+import logging
+from pathlib import Path
+from typing import Union
+import nbformat
+from nbformat.v4.rwbase import rejoin_lines, strip_transient
+
+# Use a faster JSON decoder for trusted reads if one is installed
+try:
+    import orjson as fast_json
+except ImportError:
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = json
+
+
+__all__ = ['read_notebook',
+           'reads_notebook',
+           'validate_notebook']
+
+logger = logging.getLogger(__name__)
+
+
+def read_notebook(path: Union[str, Path], trusted: bool = False):
+    """Read a notebook file into an nbformat NotebookNode
+
+    Args:
+        path: Notebook filepath
+        trusted: Trust that the notebook is valid. If True, the notebook is
+            parsed with the fastest available JSON decoder (orjson, ujson, or
+            the standard library as fallback), and the jsonschema validation of
+            nbformat.read is skipped. Validation can be performed afterwards
+            using ``validate_notebook``.
+            Notebooks that are not nbformat 4 are always read via nbformat.
+
+    Returns:
+        NotebookNode in its original nbformat version
+    """
+    return reads_notebook(Path(path).read_bytes(), trusted=trusted)
+
+
+def reads_notebook(data: bytes, trusted: bool = False):
+    """Read a notebook from the raw contents of a notebook file
+
+    See ``read_notebook`` for details.
+    """
+    if not trusted:
+        return nbformat.reads(data.decode('utf-8'), as_version=nbformat.NO_CONVERT)
+
+    notebook_dict = fast_json.loads(data)
+    if notebook_dict.get('nbformat') != 4:
+        return nbformat.reads(data.decode('utf-8'), as_version=nbformat.NO_CONVERT)
+
+    # Equivalent to nbformat.v4 reader, without validation
+    notebook = nbformat.from_dict(notebook_dict)
+    notebook = rejoin_lines(notebook)
+    notebook = strip_transient(notebook)
+    return notebook
+
+
+def validate_notebook(path: Union[str, Path], notebook=None) -> bool:
+    """Validate a notebook file against the nbformat schema
+
+    Any validation errors are logged.
+
+    Args:
+        path: Notebook filepath
+        notebook: Optional NotebookNode that was already read from path.
+            If not provided, the notebook is read from path.
+
+    Returns:
+        True if the notebook is valid
+    """
+    try:
+        if notebook is None:
+            notebook = read_notebook(path, trusted=True)
+        nbformat.validate(notebook)
+    except (ValueError, nbformat.ValidationError) as e:
+        logger.error(f'Notebook {path} is invalid: {e}')
+        return False
+    else:
+        return True
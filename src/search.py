@@ -0,0 +1,53 @@
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Union
+
+
+__all__ = ['write_search_content']
+
+logger = logging.getLogger(__name__)
+
+content_prefix = 'tipuesearch_content'
+manifest_filename = 'search_manifest.js'
+
+
+def write_search_content(pages: List[dict],
+                         target_dir: Union[str, Path]) -> Path:
+    """Write search content to a content-hashed file and update the manifest
+
+    The search content is only loaded by pages once the search box is used
+    (see js/search.js). Since its filename contains a hash of its contents,
+    browsers can cache it indefinitely. The small manifest, loaded by every
+    page, contains the filename of the current search content. Search content
+    of previous builds is removed.
+
+    Args:
+        pages: Search content of every page, see
+            ``NotebookFolder.generate_tipuesearch_content``
+        target_dir: Root directory of the website
+
+    Returns:
+        Path of search content file
+    """
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    content = f'var tipuesearch = {{"pages": {json.dumps(pages)}}};'
+    content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()[:12]
+    content_path = target_dir / f'{content_prefix}.{content_hash}.js'
+
+    if not content_path.exists():
+        content_path.write_text(content, encoding='utf-8')
+        logger.info(f'Search content written to {content_path.name}')
+
+    manifest = {'content': content_path.name}
+    (target_dir / manifest_filename).write_text(
+        f'var search_manifest = {json.dumps(manifest)};', encoding='utf-8')
+
+    for filepath in target_dir.glob(f'{content_prefix}.*.js'):
+        if filepath != content_path:
+            filepath.unlink()
+
+    return content_path
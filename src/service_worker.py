@@ -0,0 +1,68 @@
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Union
+
+from .assets import site_libs_dir
+
+
+__all__ = ['write_page_hashes', 'write_service_worker']
+
+logger = logging.getLogger(__name__)
+
+page_hashes_filename = 'page_hashes.json'
+service_worker_filename = 'service_worker.js'
+
+
+def write_page_hashes(target_dir: Union[str, Path]) -> Dict[str, str]:
+    """Write the hash of every page of the website to page_hashes.json
+
+    The service worker serves cached pages whose hash matches, and fetches
+    all other pages.
+
+    Args:
+        target_dir: Root directory of the website
+
+    Returns:
+        {page path relative to target_dir: SHA-1 hash of page}
+    """
+    target_dir = Path(target_dir)
+    page_hashes = {
+        page_path.relative_to(target_dir).as_posix():
+            hashlib.sha1(page_path.read_bytes()).hexdigest()
+        for page_path in sorted(target_dir.rglob('*.html'))}
+    (target_dir / page_hashes_filename).write_text(json.dumps(page_hashes),
+                                                   encoding='utf-8')
+    return page_hashes
+
+
+def write_service_worker(target_dir: Union[str, Path],
+                         precache_urls: Iterable[str] = ()) -> Path:
+    """Write the service worker (see js/service_worker.js) to the website root
+
+    The service worker must be in the website root, such that it controls
+    all pages. Whenever the precached files change, the service worker
+    changes as well, and browsers install the new version.
+
+    Args:
+        target_dir: Root directory of the website
+        precache_urls: URLs relative to the website root that are cached when
+            the service worker is installed, e.g. fingerprinted assets
+
+    Returns:
+        Path of service worker
+    """
+    target_dir = Path(target_dir)
+    precache_urls = sorted(precache_urls)
+    source = (site_libs_dir / 'js' / service_worker_filename).read_text(encoding='utf-8')
+    cache_version = hashlib.sha1(
+        json.dumps([precache_urls, source]).encode('utf-8')).hexdigest()[:12]
+
+    service_worker_path = target_dir / service_worker_filename
+    service_worker_path.write_text(
+        f'var precache_urls = {json.dumps(precache_urls)};\n'
+        f'var cache_version = {json.dumps(cache_version)};\n\n'
+        f'{source}', encoding='utf-8')
+    logger.info(f'Service worker written, precaching {len(precache_urls)} files')
+    return service_worker_path
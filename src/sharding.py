@@ -0,0 +1,111 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+
+__all__ = ['parse_shard',
+           'assign_shards',
+           'write_shard_manifest',
+           'load_shard_manifests']
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse a shard specification 'i/N' into (i, N), where 1 <= i <= N"""
+    try:
+        shard_index, num_shards = (int(val) for val in shard.split('/'))
+    except ValueError:
+        raise ValueError(f'Shard must have form "i/N", not {shard}')
+    if not 1 <= shard_index <= num_shards:
+        raise ValueError(f'Shard index must be between 1 and {num_shards}')
+    return shard_index, num_shards
+
+
+def assign_shards(notebooks: list,
+                  num_shards: int,
+                  costs: Dict[str, dict] = None) -> List[list]:
+    """Deterministically divide notebooks into shards of similar total cost
+
+    Notebooks are assigned from most to least expensive to the shard with the
+    lowest total cost so far. The cost of a notebook is its conversion time in
+    a previous build. Notebooks without a recorded cost are assumed to have the
+    average cost. Ties are broken by notebook path and shard index, such that
+    every machine arrives at the same assignment given the same costs.
+
+    Args:
+        notebooks: Notebooks to divide
+        num_shards: Number of shards
+        costs: Per-notebook costs {relative path: {'seconds': ...}} recorded
+            in previous builds, see BuildStats
+
+    Returns:
+        List of notebooks for each shard
+    """
+    costs = costs or {}
+    known_costs = [cost['seconds'] for cost in costs.values()]
+    default_cost = sum(known_costs) / len(known_costs) if known_costs else 1
+
+    def notebook_cost(notebook):
+        cost = costs.get(notebook.relative_path.as_posix())
+        return cost['seconds'] if cost is not None else default_cost
+
+    sorted_notebooks = sorted(
+        notebooks,
+        key=lambda notebook: (-notebook_cost(notebook),
+                              notebook.relative_path.as_posix()))
+
+    shards = [[] for _ in range(num_shards)]
+    shard_costs = [0] * num_shards
+    for notebook in sorted_notebooks:
+        shard_index = min(range(num_shards), key=lambda k: (shard_costs[k], k))
+        shards[shard_index].append(notebook)
+        shard_costs[shard_index] += notebook_cost(notebook)
+
+    logger.info('Estimated shard costs: ' +
+                ', '.join(f'{cost:.1f}s' for cost in shard_costs))
+    return shards
+
+
+def _manifest_filepath(manifest_dir: Union[str, Path],
+                       shard_index: int,
+                       num_shards: int) -> Path:
+    return Path(manifest_dir) / f'shard-{shard_index}-of-{num_shards}.json'
+
+
+def write_shard_manifest(manifest_dir: Union[str, Path],
+                         shard_index: int,
+                         num_shards: int,
+                         notebooks: list,
+                         costs: Dict[str, dict]):
+    """Write the manifest of a shard, used to merge shards
+
+    The manifest contains the metadata of every notebook in the shard, which
+    provides the search content and index summaries without having to parse
+    the notebooks again during the merge.
+    """
+    manifest = {
+        'shard': shard_index,
+        'num_shards': num_shards,
+        'pages': [notebook.relative_path.with_suffix('.html').as_posix()
+                  for notebook in notebooks],
+        'notebooks': {notebook.relative_path.as_posix(): notebook.metadata.to_dict()
+                      for notebook in notebooks},
+        'costs': costs}
+    filepath = _manifest_filepath(manifest_dir, shard_index, num_shards)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_text(json.dumps(manifest), encoding='utf-8')
+
+
+def load_shard_manifests(manifest_dir: Union[str, Path],
+                         num_shards: int) -> List[dict]:
+    """Load the manifests of all shards, raising an error if any is missing"""
+    manifests = []
+    for shard_index in range(1, num_shards + 1):
+        filepath = _manifest_filepath(manifest_dir, shard_index, num_shards)
+        if not filepath.exists():
+            raise FileNotFoundError(f'Shard {shard_index}/{num_shards} has '
+                                    f'no manifest {filepath}')
+        manifests.append(json.loads(filepath.read_text(encoding='utf-8')))
+    return manifests
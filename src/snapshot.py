@@ -0,0 +1,299 @@
+import os
+import json
+import hashlib
+import fnmatch
+import logging
+from pathlib import Path
+from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor
+
+
+__all__ = ['DirectoryEntry',
+           'DirectorySnapshot',
+           'FilesystemSnapshot']
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryEntry:
+    """Single entry of a directory listing, including its cached stat result"""
+    __slots__ = ('name', 'is_dir', 'size', 'mtime')
+
+    def __init__(self, name: str, is_dir: bool, size: int, mtime: float):
+        self.name = name
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self):
+        return f'DirectoryEntry({self.name!r}, is_dir={self.is_dir})'
+
+    @classmethod
+    def from_dir_entry(cls, entry: os.DirEntry):
+        """Entry of a directory listing, returns None if it cannot be stat'ed
+
+        E.g. broken symbolic links, or files that are removed during the scan.
+        """
+        # On Windows the stat result comes for free with the directory listing
+        try:
+            stat = entry.stat()
+        except OSError as e:
+            logger.warning(f'Skipping {entry.path}: {e}')
+            return None
+        return cls(name=entry.name,
+                   is_dir=entry.is_dir(),
+                   size=stat.st_size,
+                   mtime=stat.st_mtime)
+
+    @property
+    def suffix(self):
+        return Path(self.name).suffix
+
+    @property
+    def stem(self):
+        return Path(self.name).stem
+
+    def to_list(self):
+        return [self.name, self.is_dir, self.size, self.mtime]
+
+    def __eq__(self, other):
+        if not isinstance(other, DirectoryEntry):
+            return NotImplemented
+        return self.to_list() == other.to_list()
+
+    @classmethod
+    def from_list(cls, item):
+        return cls(*item)
+
+
+class DirectorySnapshot:
+    """Listing of a single directory, obtained via a single os.scandir call
+
+    Args:
+        path: Absolute path of directory
+        mtime: Modification time of the directory when it was scanned.
+            Used to determine if a persisted snapshot is still valid.
+        entries: Directory entries
+    """
+    def __init__(self, path: Path, mtime: float, entries: List[DirectoryEntry]):
+        self.path = path
+        self.mtime = mtime
+        self.entries = sorted(entries, key=lambda entry: entry.name)
+        self._entries_by_name = {entry.name: entry for entry in self.entries}
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, name):
+        return name in self._entries_by_name
+
+    def __getitem__(self, name) -> DirectoryEntry:
+        try:
+            return self._entries_by_name[name]
+        except KeyError:
+            raise KeyError(f'{name} not found in {self.path}')
+
+    @classmethod
+    def scan(cls, path: Path, mtime: float = None):
+        if mtime is None:
+            mtime = os.stat(path).st_mtime
+        with os.scandir(path) as directory_entries:
+            entries = [DirectoryEntry.from_dir_entry(entry)
+                       for entry in directory_entries]
+        return cls(path=path, mtime=mtime,
+                   entries=[entry for entry in entries if entry is not None])
+
+    def restat(self, mtime: float):
+        """Snapshot with the same entries and fresh stat results
+
+        Used when the directory is unchanged, such that it is not listed
+        again. Returns None if an entry cannot be stat'ed anymore.
+        """
+        entries = []
+        for entry in self.entries:
+            try:
+                stat = os.stat(self.path / entry.name)
+            except OSError:
+                return None
+            entries.append(DirectoryEntry(name=entry.name,
+                                          is_dir=entry.is_dir,
+                                          size=stat.st_size,
+                                          mtime=stat.st_mtime))
+        return DirectorySnapshot(path=self.path, mtime=mtime, entries=entries)
+
+    def glob(self, pattern: str) -> List[DirectoryEntry]:
+        """Entries whose name match pattern (case-insensitive on Windows)"""
+        return [entry for entry in self.entries
+                if fnmatch.fnmatch(entry.name, pattern)]
+
+    @property
+    def folders(self):
+        return [entry for entry in self.entries if entry.is_dir]
+
+    @property
+    def files(self):
+        return [entry for entry in self.entries if not entry.is_dir]
+
+
+class FilesystemSnapshot:
+    """Snapshot of all directories below a base directory
+
+    Each directory is listed once with os.scandir, and its entries (including
+    their stat results) are kept in memory. Directories are scanned
+    concurrently, which hides most of the latency of network drives.
+
+    A snapshot can be saved and passed to a future scan as ``previous``.
+    Directories whose modification time is unchanged are then not listed
+    again, only their entries are stat'ed. The modification time of a
+    directory changes when entries are added, removed or renamed, but not
+    when a file in it is modified in-place.
+
+    Args:
+        base_dir: Absolute directory that is recursively scanned
+        max_workers: Number of threads used for scanning
+    """
+    version = 1
+    ignore_folders = ['.ipynb_checkpoints']
+
+    def __init__(self, base_dir: Path, max_workers: int = 8):
+        self.base_dir = Path(base_dir).absolute()
+        self.max_workers = max_workers
+        self.directories: Dict[Path, DirectorySnapshot] = {}
+
+    def __getitem__(self, path: Path) -> DirectorySnapshot:
+        path = Path(path).absolute()
+        if path not in self.directories:
+            # Directory was not part of the initial scan, list it now
+            self.directories[path] = DirectorySnapshot.scan(path)
+        return self.directories[path]
+
+    def __contains__(self, path):
+        return Path(path).absolute() in self.directories
+
+    def is_dir(self, path: Path) -> bool:
+        path = Path(path).absolute()
+        if path in self.directories:
+            return True
+        try:
+            return self[path.parent][path.name].is_dir
+        except (KeyError, FileNotFoundError):
+            return False
+
+    def stat(self, path: Path) -> DirectoryEntry:
+        """Cached stat result of a path, raises KeyError if it does not exist"""
+        path = Path(path).absolute()
+        return self[path.parent][path.name]
+
+    def _scan_directory(self, path: Path, previous: 'FilesystemSnapshot' = None):
+        mtime = os.stat(path).st_mtime
+        previous_directory = (previous.directories.get(path)
+                              if previous is not None else None)
+        if previous_directory is None or previous_directory.mtime != mtime:
+            return DirectorySnapshot.scan(path, mtime=mtime)
+
+        directory = previous_directory.restat(mtime)
+        if directory is None:
+            return DirectorySnapshot.scan(path, mtime=mtime)
+        if directory.entries == previous_directory.entries:
+            return previous_directory
+        return directory
+
+    def _should_descend(self, entry: DirectoryEntry):
+        return (entry.is_dir
+                and not entry.name.startswith('.')
+                and entry.name not in self.ignore_folders)
+
+    def scan(self, previous: 'FilesystemSnapshot' = None):
+        """Recursively scan all directories below base_dir
+
+        Args:
+            previous: Optional previous snapshot. Directories whose
+                modification time is unchanged are not listed again, and
+                keep their previous snapshot if the stat results of their
+                entries are unchanged as well.
+
+        Returns:
+            Number of directories that changed since the previous snapshot
+        """
+        if previous is not None and previous.base_dir != self.base_dir:
+            previous = None
+
+        changed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {self.base_dir: executor.submit(self._scan_directory,
+                                                      self.base_dir, previous)}
+            while futures:
+                path, future = futures.popitem()
+                directory = future.result()
+                self.directories[path] = directory
+                if previous is None or previous.directories.get(path) is not directory:
+                    changed += 1
+
+                for entry in directory.folders:
+                    if self._should_descend(entry):
+                        subpath = path / entry.name
+                        futures[subpath] = executor.submit(
+                            self._scan_directory, subpath, previous)
+
+        logger.info(f'Scanned {len(self.directories)} directories '
+                    f'({changed} changed)')
+        return changed
+
+    def count_files(self, suffix: str) -> int:
+        """Number of files with suffix in all scanned directories"""
+        return sum(entry.suffix == suffix
+                   for directory in self.directories.values()
+                   for entry in directory.files)
+
+    def fingerprint(self) -> str:
+        """Hash of all scanned directories and their entries
+
+        The fingerprint only changes if a directory or one of its entries is
+        modified, and can therefore be used to detect that nothing changed
+        since a previous build.
+        """
+        fingerprint = hashlib.sha1()
+        for path in sorted(self.directories):
+            directory = self.directories[path]
+            fingerprint.update(json.dumps(
+                [str(path), directory.mtime,
+                 [entry.to_list() for entry in directory]]).encode('utf-8'))
+        return fingerprint.hexdigest()
+
+    def save(self, filepath: Union[str, Path]):
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        snapshot = {
+            'version': self.version,
+            'base_dir': str(self.base_dir),
+            'directories': {
+                str(path.relative_to(self.base_dir)): {
+                    'mtime': directory.mtime,
+                    'entries': [entry.to_list() for entry in directory]}
+                for path, directory in self.directories.items()
+                if self.base_dir == path or self.base_dir in path.parents}}
+        filepath.write_text(json.dumps(snapshot), encoding='utf-8')
+
+    @classmethod
+    def load(cls, filepath: Union[str, Path], **kwargs):
+        """Load a saved snapshot, returns None if it does not exist or is invalid"""
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return None
+
+        try:
+            snapshot = json.loads(filepath.read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f'Could not read filesystem snapshot {filepath}')
+            return None
+        if snapshot.get('version') != cls.version:
+            return None
+
+        filesystem_snapshot = cls(Path(snapshot['base_dir']), **kwargs)
+        for relative_path, directory in snapshot['directories'].items():
+            path = filesystem_snapshot.base_dir / relative_path
+            entries = [DirectoryEntry.from_list(entry)
+                       for entry in directory['entries']]
+            filesystem_snapshot.directories[path] = DirectorySnapshot(
+                path=path, mtime=directory['mtime'], entries=entries)
+        return filesystem_snapshot
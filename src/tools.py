@@ -1,15 +1,19 @@
 import re
+import html
+import json
 from typing import Union
 from copy import copy
 import yaml
 import logging
 import pprint
 from pathlib import Path
+from html.parser import HTMLParser
 import string
 
 
 __all__ = ['DEFAULT_CONF',
            'load_config',
+           'write_latex_macros',
            'generate_template']
 
 logger = logging.getLogger(__name__)
@@ -17,6 +21,7 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_CONF = {
     'target_dir': 'doc',
+    'cache_dir': '.cache',
     'log_notebook_structure': {
         'log_folders': [],
         'log_notebooks': []
@@ -57,6 +62,18 @@ def load_config(config_path):
     return conf
 
 
+def write_latex_macros(latex_macros: str, save_path: Path):
+    """Write LaTeX macros to a script shared by all pages containing math
+
+    Instead of adding the macros to every page, pages load this script, which
+    is cached by the browser. The macros are defined by js/mathjax.js.
+    """
+    save_path = Path(save_path)
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    save_path.write_text(f'var latex_macros = {json.dumps(latex_macros)};\n',
+                         encoding='utf-8')
+
+
 class TemplateFormatter(string.Template):
     delimiter = '$%'
 
@@ -71,6 +88,36 @@ def generate_template(template_path, **kwargs):
     return template
 
 
+class ClientHighlightFilter:
+    """Replacement of the nbconvert highlight_code filter for client-side
+    highlighting
+
+    Instead of highlighting code with Pygments, code is escaped and wrapped in
+    a ``<pre><code>`` block tagged with the language, which is highlighted by
+    highlight.js in the browser (see js/auto_highlight.js).
+
+    Args:
+        language: Default language, usually the notebook kernel language
+    """
+    def __init__(self, language: str = 'python'):
+        self.language = language
+
+    # Filters are compared when they are assigned to an exporter, which only
+    # recreates its Jinja environment if they changed
+    def __eq__(self, other):
+        if not isinstance(other, ClientHighlightFilter):
+            return NotImplemented
+        return self.language == other.language
+
+    def __hash__(self):
+        return hash((ClientHighlightFilter, self.language))
+
+    def __call__(self, source: str, language: str = None, metadata: dict = None):
+        language = language or self.language
+        return (f'<div class="highlight"><pre><code class="language-{language}">'
+                f'{html.escape(source)}</code></pre></div>')
+
+
 cell_header_regex = re.compile('(#+) (.+)')
 def get_line_information(line: str) -> dict:
     """Get information about a (potential) markdown header line
@@ -108,6 +155,158 @@ def get_minimum_header_level(cells: list):
     return minimum_level
 
 
+def get_header_outline(cells: list):
+    """Get all markdown headers in cells
+
+    Args:
+        cells: List of notebook cells usually from notebook.cells
+
+    Returns:
+        List of (level, title) tuples, one for each header
+    """
+    outline = []
+    for cell in cells:
+        if cell['cell_type'] != 'markdown':
+            continue
+
+        for line in cell['source'].splitlines():
+            line_information = get_line_information(line)
+            if line_information['is_header']:
+                outline.append((line_information['level'],
+                                line_information['title']))
+    return outline
+
+
+class _HTMLHeaderParser(HTMLParser):
+    """Collects the level, id and text of all headers in HTML code
+
+    The anchor link that nbconvert appends to headers is excluded from the text.
+    """
+    header_tags = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+    def __init__(self):
+        super().__init__()
+        self.headers = []
+        self._header = None
+        self._in_anchor_link = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.header_tags:
+            self._header = [int(tag[1]), attrs.get('id'), '']
+        elif tag == 'a' and 'anchor-link' in (attrs.get('class') or '').split():
+            self._in_anchor_link = True
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._in_anchor_link = False
+        elif tag in self.header_tags and self._header is not None:
+            self.headers.append(tuple(self._header))
+            self._header = None
+
+    def handle_data(self, data):
+        if self._header is not None and not self._in_anchor_link:
+            self._header[2] += data
+
+
+HTML_header_regex = re.compile('<h[1-6][ >]', re.IGNORECASE)
+def get_HTML_headers(cells: list) -> list:
+    """Get all headers of the rendered cells, as (level, id, title) tuples
+
+    Markdown cells are rendered with the same markdown renderer as used by
+    nbconvert, such that headers in code blocks are ignored, and the ids are
+    those of the headers in the rendered page. Headers without an id, such as
+    those in raw cells (e.g. the page title) and in HTML outputs, are included
+    as well, since they affect the header levels.
+    """
+    # Imported here, such that loading the config does not import nbconvert
+    from nbconvert.filters import markdown2html
+
+    parser = _HTMLHeaderParser()
+    for cell in cells:
+        if cell['cell_type'] == 'markdown':
+            parser.feed(markdown2html(cell['source']))
+        elif cell['cell_type'] == 'raw':
+            parser.feed(cell['source'])
+        elif cell['cell_type'] == 'code':
+            for output in cell.get('outputs', []):
+                output_HTML = output.get('data', {}).get('text/html', '')
+                if isinstance(output_HTML, list):
+                    output_HTML = ''.join(output_HTML)
+                if HTML_header_regex.search(output_HTML):
+                    parser.feed(output_HTML)
+        parser.close()
+        parser.reset()
+    return parser.headers
+
+
+def get_table_of_contents(cells: list, threshold: int = 6):
+    """Get the table of contents from the headers in cells
+
+    Levels and anchors follow the sidebar's table of contents (js/doc_toc.js).
+    Header levels are relative to the highest level header in the page
+    (including the page title), such that the highest level is 1. Headers
+    with a level above the threshold, or without an id, are skipped. Since
+    headers with the same text have the same id, the anchor of a header is
+    its id followed by its section number without dots, e.g. 'Results-12'.
+
+    Args:
+        cells: List of notebook cells usually from notebook.cells
+        threshold: Maximum (relative) header level to include
+
+    Returns:
+        List of [level, title, anchor, section number, header id], one for
+        each header
+    """
+    headers = get_HTML_headers(cells)
+    if not headers:
+        return []
+
+    minimum_level = min(level for level, header_id, title in headers)
+    section_numbers = [0] * 6
+    table_of_contents = []
+    for level, header_id, title in headers:
+        level = level - minimum_level + 1
+        if level > threshold or not header_id:
+            continue
+
+        section_numbers[level - 1] += 1
+        section_numbers[level:] = [0] * (6 - level)
+        section_number = '.'.join(map(str, section_numbers[:level]))
+
+        anchor = header_id.replace('$', '').replace('\\', '', 1)
+        anchor = f'{anchor}-{section_number.replace(".", "")}'
+        table_of_contents.append([level, title.strip(), anchor, section_number,
+                                  header_id])
+    return table_of_contents
+
+
+def get_summary_cells(cells: list):
+    """Get cells between a '# Summary' header and the next level-one header
+
+    Args:
+        cells: List of notebook cells usually from notebook.cells
+
+    Returns:
+        Summary cells, excluding the summary header. Empty if there is no
+        summary header.
+    """
+    start_index, stop_index = 0, 0
+    for k, cell in enumerate(cells):
+        if cell['cell_type'] != 'markdown':
+            continue
+        elif cell['source'].lower().startswith('# summary'):
+            start_index = k + 1
+        elif start_index > 0 and cell['source'].startswith('# '):
+            stop_index = k
+            break
+    else:
+        if start_index > 0:
+            stop_index = len(cells)
+
+    return cells[start_index:stop_index]
+
+
 def increase_header_level(cells: list,
                           min_level: int = None,
                           scale_all: Union[int, bool] = False):
@@ -0,0 +1,213 @@
+import os
+import time
+import ctypes
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Union
+
+# psutil is used to measure memory usage if installed, otherwise memory usage
+# is read from /proc, which is only available on Linux
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+__all__ = ['NotebookLimitExceeded', 'Watchdog', 'get_memory_usage']
+
+logger = logging.getLogger(__name__)
+
+
+class NotebookLimitExceeded(Exception):
+    """Conversion of a notebook exceeded a limit of the watchdog"""
+
+
+def get_memory_usage() -> Union[int, None]:
+    """Resident memory of the current process in bytes, None if unknown"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _interrupt_thread(thread_id: int, exception_class=NotebookLimitExceeded):
+    """Raise an exception in another thread, or clear it if exception_class is None
+
+    The exception is raised once the thread executes Python bytecode, so a
+    thread blocked in a single long-running C call is interrupted afterwards.
+    """
+    exception = ctypes.py_object(exception_class) if exception_class else None
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id),
+                                               exception)
+
+
+def _notebook_size(notebook) -> int:
+    """Size of notebook file in bytes, 0 if it has no file (index notebooks)"""
+    try:
+        size, _ = notebook.stat()
+        return size
+    except (OSError, TypeError, AttributeError):
+        return 0
+
+
+class Watchdog:
+    """Enforces time and memory limits on the conversion of notebooks
+
+    Conversions run in worker threads, which cannot be killed. Instead, the
+    watchdog thread raises NotebookLimitExceeded in the thread converting a
+    notebook that exceeds its time limit. If the memory usage of the process
+    exceeds its limit, the largest notebook that is being converted is
+    interrupted. Memory freed by Python is rarely returned to the operating
+    system, so after an interruption the memory usage is measured again once
+    the interrupted conversion has ended, and further conversions are only
+    interrupted if the memory usage grows beyond that baseline. Notebooks
+    larger than a maximum size are not read at all.
+
+    Args:
+        max_seconds: Maximum conversion time of a notebook in seconds
+        max_memory: Maximum memory usage of the process in MB
+        max_notebook_size: Maximum size of a notebook file in MB
+        interval: Interval in seconds between checks of the limits
+    """
+    def __init__(self, max_seconds: float = None,
+                 max_memory: float = None,
+                 max_notebook_size: float = None,
+                 interval: float = 1):
+        self.max_seconds = max_seconds
+        self.max_memory = max_memory
+        self.max_notebook_size = max_notebook_size
+        self.interval = interval
+
+        # Conversions in progress {thread id: {'notebook', 'start', 'reason'}}
+        self.active = {}
+        # Entry interrupted because of memory usage, until it has ended
+        self._memory_interrupted = None
+        # Memory usage in bytes after the last interrupted conversion ended
+        self._memory_baseline = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        if max_memory is not None and get_memory_usage() is None:
+            logger.warning('Memory usage cannot be measured, install psutil '
+                           'to limit the memory usage of conversions')
+            self.max_memory = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        if self._thread is None and (self.max_seconds or self.max_memory):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._monitor,
+                                            name='watchdog', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def check_size(self, notebook):
+        """Raise NotebookLimitExceeded if the notebook file is too large"""
+        if self.max_notebook_size is None:
+            return
+        size = _notebook_size(notebook)
+        if size > self.max_notebook_size * 1e6:
+            raise NotebookLimitExceeded(
+                f'Notebook size {size / 1e6:.0f} MB exceeds the maximum of '
+                f'{self.max_notebook_size} MB')
+
+    @contextmanager
+    def watch(self, notebook, elapsed: float = 0):
+        """Watch the conversion of a notebook in the current thread
+
+        Args:
+            notebook: Notebook that is converted
+            elapsed: Time in seconds already spent converting the notebook
+
+        Raises:
+            NotebookLimitExceeded if a limit is exceeded
+        """
+        thread_id = threading.get_ident()
+        entry = {'notebook': notebook,
+                 'start': time.perf_counter() - elapsed,
+                 'reason': None}
+        with self._lock:
+            self.active[thread_id] = entry
+        try:
+            yield
+        except NotebookLimitExceeded:
+            if entry['reason'] is None:
+                raise
+            raise NotebookLimitExceeded(entry['reason']) from None
+        finally:
+            # The exception may also be raised while cleaning up, e.g. while
+            # waiting for the lock. The entry is therefore removed before
+            # anything that can block, and removal is retried until the
+            # exception has either been raised or cleared.
+            while True:
+                try:
+                    self.active.pop(thread_id, None)
+                    # Once the monitor releases the lock, it no longer
+                    # refers to the entry
+                    with self._lock:
+                        # Clear the exception in case it was not raised yet
+                        _interrupt_thread(thread_id, None)
+                    break
+                except NotebookLimitExceeded:
+                    continue
+
+    def _interrupt(self, thread_id: int, entry: dict, reason: str):
+        if entry['reason'] is None and self.active.get(thread_id) is entry:
+            logger.warning(f'Interrupting conversion of '
+                           f'{entry["notebook"].relative_path}: {reason}')
+            entry['reason'] = reason
+            _interrupt_thread(thread_id)
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                now = time.perf_counter()
+                # Entries are removed without the lock, see watch
+                active = list(self.active.items())
+                if self.max_seconds is not None:
+                    for thread_id, entry in active:
+                        if now - entry['start'] > self.max_seconds:
+                            self._interrupt(thread_id, entry,
+                                            f'Conversion took longer than '
+                                            f'{self.max_seconds} s')
+
+                if self.max_memory is not None:
+                    self._check_memory(active)
+
+    def _check_memory(self, active: list):
+        interrupted = self._memory_interrupted
+        if any(entry is interrupted for _, entry in active):
+            # Wait until the interrupted conversion has released its memory
+            return
+        memory = get_memory_usage()
+        limit = self.max_memory * 1e6
+        if interrupted is not None:
+            self._memory_interrupted = None
+            self._memory_baseline = memory if memory > limit else None
+        elif self._memory_baseline is not None and memory <= limit:
+            self._memory_baseline = None
+        if not active or memory <= max(limit, self._memory_baseline or 0):
+            return
+        # The largest notebook most likely uses the most memory
+        thread_id, entry = max(
+            active, key=lambda item: _notebook_size(item[1]['notebook']))
+        self._interrupt(thread_id, entry,
+                        f'Memory usage {memory / 1e6:.0f} MB exceeded the '
+                        f'maximum of {self.max_memory} MB')
+        self._memory_interrupted = entry
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the converter modules as the src package, like convert_notebooks.py
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
@@ -0,0 +1,113 @@
+import re
+import json
+
+from src.assets import (collect_used_names, purge_css, purge_stylesheets,
+                        AssetManifest, write_caching_rules, deny_web_access)
+
+
+def test_collect_used_names(tmp_path):
+    page_path = tmp_path / 'page.html'
+    page_path.write_text('<div class="cell text_cell" id="main"></div>')
+    summaries_path = tmp_path / 'index.summaries.json'
+    summaries_path.write_text(json.dumps({'log.html': '<p class="summary">Text</p>'}))
+    script_path = tmp_path / 'script.js'
+    script_path.write_text("element.addClass('ui-widget');")
+
+    names = collect_used_names(pages=[page_path], scripts=[script_path],
+                               fragments=[summaries_path])
+    assert {'cell', 'text_cell', 'main', 'summary', 'ui-widget'} <= names
+    assert 'Text' not in names
+
+
+def test_purge_css():
+    css = ('/* comment */ .used{color:red} .unused, #main{margin:0} '
+           '.unused{padding:0} @media print{.unused{x:y} .used a{x:y}} '
+           '@font-face{font-family:x}')
+    purged_css = purge_css(css, used_names={'used', 'main'})
+    assert purged_css.split('\n') == ['.used{color:red}', '#main{margin:0}',
+                                      '@media print{.used a{x:y}}',
+                                      '@font-face{font-family:x}']
+
+
+def test_purged_stylesheet_without_manifest(tmp_path):
+    purge_stylesheets({'jt.css': 'css/jt.css'}, target_dir=tmp_path,
+                      used_names=set(), site_depth=1)
+    assert (tmp_path / 'css' / 'jt.css').exists()
+
+
+def test_purged_stylesheet_is_fingerprinted(tmp_path):
+    manifest = AssetManifest(tmp_path, site_depth=1)
+    assert manifest.purged_url('jt.css') == 'assets/purged/jt.css'
+
+    # Page rendered before the stylesheet was ever purged
+    page_path = tmp_path / 'page.html'
+    page_path.write_text('<link href="./assets/purged/jt.css" />')
+
+    purge_stylesheets({'jt.css': 'css/jt.css'}, target_dir=tmp_path,
+                      used_names={'cell'}, site_depth=1, asset_manifest=manifest)
+    url = manifest.purged_url('jt.css')
+    assert url.startswith('assets/purged/jt.') and url != 'assets/purged/jt.css'
+    assert (tmp_path / url).exists()
+    assert url in manifest.urls
+
+    assert manifest.update_purged_urls([page_path]) == 1
+    assert page_path.read_text() == f'<link href="./{url}" />'
+    assert manifest.update_purged_urls([page_path]) == 0
+    manifest.save()
+
+    # The next build renders pages with the URL of the previous build, which
+    # is replaced once the stylesheet changes
+    next_manifest = AssetManifest(tmp_path, site_depth=1)
+    assert next_manifest.purged_url('jt.css') == url
+    purge_stylesheets({'jt.css': 'css/jt.css'}, target_dir=tmp_path,
+                      used_names={'cell', 'text_cell'}, site_depth=1,
+                      asset_manifest=next_manifest)
+    next_url = next_manifest.purged_url('jt.css')
+    assert next_url != url
+    next_manifest.update_purged_urls([page_path])
+    assert page_path.read_text() == f'<link href="./{next_url}" />'
+
+    next_manifest.save()
+    assert not (tmp_path / url).exists()
+
+
+def test_fingerprinted_asset(tmp_path):
+    manifest = AssetManifest(tmp_path, site_depth=1)
+    url = manifest.url('js/search.js')
+    assert url.startswith('assets/js/search.') and url.endswith('.js')
+    assert (tmp_path / url).exists()
+    assert manifest.url('js/missing.js') is None
+    assert manifest.urls == [url]
+
+
+def test_write_caching_rules(tmp_path):
+    write_caching_rules(tmp_path, nginx_path=tmp_path / 'nginx' / 'caching.conf')
+    assert 'immutable' in (tmp_path / '.htaccess').read_text()
+    assert 'immutable' in (tmp_path / 'nginx' / 'caching.conf').read_text()
+
+
+def test_deny_web_access(tmp_path):
+    deny_web_access(tmp_path / '.build')
+    assert 'Require all denied' in (tmp_path / '.build' / '.htaccess').read_text()
+
+    write_caching_rules(tmp_path, nginx_path=tmp_path / '.build' / 'nginx_caching.conf')
+    assert 'deny all' in (tmp_path / '.build' / 'nginx_caching.conf').read_text()
+
+
+def nginx_location(config: str, url: str) -> str:
+    """Body of the first regex location matching url, as selected by nginx"""
+    for modifier, pattern, body in re.findall(r'location (~\*?) "(.*?)" \{(.*?)\}',
+                                              config, flags=re.DOTALL):
+        flags = re.IGNORECASE if modifier == '~*' else 0
+        if re.search(pattern, url, flags=flags):
+            return body.strip()
+    return None
+
+
+def test_nginx_denies_build_information(tmp_path):
+    write_caching_rules(tmp_path, nginx_path=tmp_path / 'nginx' / 'caching.conf')
+    config = (tmp_path / 'nginx' / 'caching.conf').read_text()
+    assert nginx_location(config, '/website/.build/build_report.json') == 'deny all;'
+    assert nginx_location(config, '/website/.build/shards/shard_1.json') == 'deny all;'
+    assert 'no-cache' in nginx_location(config, '/website/index.html')
+    assert 'immutable' in nginx_location(config, '/website/site-libs/app.0123456789ab.js')
@@ -0,0 +1,71 @@
+import nbformat
+from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell, new_output
+
+from src.cache import NotebookCache, NotebookMetadata
+
+
+def create_notebook_file(path):
+    notebook = new_notebook(cells=[
+        new_markdown_cell('# Summary\nFirst result'),
+        new_code_cell('plot()', outputs=[
+            new_output('display_data', data={'image/png': 'abcd', 'text/plain': 'fig'})]),
+        new_markdown_cell('# Measurements\n## Setup')])
+    nbformat.write(notebook, str(path))
+    return notebook
+
+
+def update(cache, path, notebook):
+    data = path.read_bytes()
+    stat = path.stat()
+    return cache.update(path.name, notebook, data=data,
+                        size=stat.st_size, mtime=stat.st_mtime)
+
+
+def test_metadata(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    notebook = create_notebook_file(path)
+    metadata = NotebookMetadata.from_notebook(notebook, size=1, mtime=2,
+                                              content_hash='hash')
+    assert metadata.headers == [(1, 'Summary'), (1, 'Measurements'), (2, 'Setup')]
+    # Summary cells are stored without their outputs
+    assert [cell['source'] for cell in metadata.summary_cells] == ['plot()']
+    assert metadata.summary_cells[0]['outputs'] == []
+    assert metadata.outputs['code_cells'] == 1
+    assert metadata.outputs['output_types'] == {'image/png': 1, 'text/plain': 1}
+    assert metadata.outputs['output_size'] == 7
+    assert 'First result' in metadata.markdown_text
+
+
+def test_cache_roundtrip(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    notebook = create_notebook_file(path)
+    cache = NotebookCache(tmp_path / 'cache')
+    metadata = update(cache, path, notebook)
+    cache.save()
+
+    cache = NotebookCache(tmp_path / 'cache')
+    stat = path.stat()
+    cached_metadata = cache.get(path.name, path, size=stat.st_size, mtime=stat.st_mtime)
+    assert cached_metadata.to_dict() == metadata.to_dict()
+    assert cache.hits == 1
+
+
+def test_touched_notebook_is_still_cached(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    cache = NotebookCache(tmp_path / 'cache')
+    metadata = update(cache, path, create_notebook_file(path))
+
+    # Same contents, different modification time
+    mtime = metadata.mtime + 10
+    assert cache.get(path.name, path, size=metadata.size, mtime=mtime) is metadata
+    assert metadata.mtime == mtime
+
+
+def test_modified_notebook_is_not_cached(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    cache = NotebookCache(tmp_path / 'cache')
+    metadata = update(cache, path, create_notebook_file(path))
+
+    path.write_text(path.read_text().replace('First result', 'Second result'))
+    assert cache.get(path.name, path, size=metadata.size, mtime=metadata.mtime + 10) is None
+    assert cache.misses == 1
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+from nbconvert import HTMLExporter
+from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
+
+from src.cell_cache import CellCache, get_render_key
+
+
+@pytest.fixture
+def cell_cache(tmp_path):
+    return CellCache(tmp_path / 'cells')
+
+
+def test_render_cells_of_new_notebook(cell_cache):
+    # new_notebook creates nbformat 4.5 notebooks, whose cell ids must be unique
+    notebook = new_notebook(cells=[new_markdown_cell('# Title'),
+                                   new_markdown_cell('Some text'),
+                                   new_code_cell('1 + 1')])
+    assert notebook.nbformat_minor >= 5
+
+    fragments = cell_cache.render_cells(notebook, {}, HTMLExporter(),
+                                        render_key='key')
+    assert len(fragments) == 3
+    assert 'Title' in fragments[0]
+    assert 'Some text' in fragments[1]
+    assert 'jp-CodeCell' in fragments[2]
+    assert cell_cache.misses == 3
+
+
+def test_render_cells_uses_cache(cell_cache):
+    notebook = new_notebook(cells=[new_markdown_cell('first'),
+                                   new_markdown_cell('second')])
+    exporter = HTMLExporter()
+    fragments = cell_cache.render_cells(notebook, {}, exporter, render_key='key')
+
+    notebook.cells.append(new_markdown_cell('third'))
+    new_fragments = cell_cache.render_cells(notebook, {}, exporter, render_key='key')
+    assert new_fragments[:2] == fragments
+    assert 'third' in new_fragments[2]
+    assert cell_cache.hits == 2
+
+
+def test_render_cells_of_notebook_without_ids(cell_cache):
+    notebook = new_notebook(cells=[new_markdown_cell('a'), new_markdown_cell('b')])
+    notebook.nbformat_minor = 4
+    for cell in notebook.cells:
+        del cell['id']
+
+    fragments = cell_cache.render_cells(notebook, {}, HTMLExporter(), render_key='key')
+    assert len(fragments) == 2
+
+
+def test_render_page_appends_cells(cell_cache, tmp_path):
+    notebook = new_notebook(cells=[new_markdown_cell('first')])
+    exporter = HTMLExporter()
+    page_path = tmp_path / 'page.html'
+    page = cell_cache.render_page(notebook, {}, exporter, render_key='key',
+                                  page_key='page', previous_page_path=page_path)
+    page_path.write_text(page, encoding='utf-8')
+
+    notebook.cells.append(new_markdown_cell('second'))
+    page = cell_cache.render_page(notebook, {}, exporter, render_key='key',
+                                  page_key='page', previous_page_path=page_path)
+    assert page.index('first') < page.index('second')
+
+
+def test_render_page_appends_cells_to_rewritten_page(cell_cache, tmp_path):
+    notebook = new_notebook(cells=[new_markdown_cell('first')])
+    exporter = HTMLExporter()
+    page_path = tmp_path / 'page.html'
+    page = cell_cache.render_page(notebook, {}, exporter, render_key='key',
+                                  page_key='page', previous_page_path=page_path)
+    # E.g. URLs of purged stylesheets are updated once all pages are written
+    page = page.replace('</head>', '<link href="assets/purged/jt.0123abcd.css">\n</head>')
+    page_path.write_text(page, encoding='utf-8')
+
+    notebook.cells.append(new_markdown_cell('second'))
+    new_page = cell_cache.render_page(notebook, {}, exporter, render_key='key',
+                                      page_key='page', previous_page_path=page_path)
+    # Only the appended cell is rendered, the first one is taken from the page
+    assert cell_cache.hits == 0 and cell_cache.misses == 2
+    assert new_page.index('first') < new_page.index('second')
+
+    # Cells modified in the written page are rendered again
+    page_path.write_text(new_page.replace('second', 'modified'), encoding='utf-8')
+    notebook.cells.append(new_markdown_cell('third'))
+    cell_cache.render_page(notebook, {}, exporter, render_key='key',
+                           page_key='page', previous_page_path=page_path)
+    assert cell_cache.hits == 2
+
+
+def test_eviction(tmp_path):
+    cell_cache = CellCache(tmp_path, max_size=10)
+    cell_cache.put('a' * 40, '12345678')
+    cell_cache.put('b' * 40, '12345678')
+    assert 'a' * 40 not in cell_cache
+    assert cell_cache.get('b' * 40) == '12345678'
+
+    cell_cache.save()
+    assert 'b' * 40 in CellCache(tmp_path, max_size=10)
+
+
+def test_render_key_changes_with_template(tmp_path):
+    template_path = tmp_path / 'notebook.html'
+    template_path.write_text('original')
+    exporter = HTMLExporter()
+    render_key = get_render_key(exporter, template_path)
+    assert get_render_key(exporter, template_path) == render_key
+    assert get_render_key(exporter, template_path, highlighting='client') != render_key
+
+    # The same exporter is reused after the template is modified
+    time.sleep(0.01)
+    template_path.write_text('modified template')
+    assert get_render_key(exporter, template_path) != render_key
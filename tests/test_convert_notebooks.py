@@ -0,0 +1,167 @@
+import json
+import shutil
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+import yaml
+
+import convert_notebooks
+from convert_notebooks import parse_args, get_build_fingerprint, build_website
+from src.pipeline import ConversionPipeline
+from src.snapshot import FilesystemSnapshot
+from src.tools import _convert_dirs_to_paths
+
+repo_dir = Path(convert_notebooks.__file__).absolute().parent
+
+
+@pytest.fixture
+def config(tmp_path):
+    base_dir = tmp_path / 'notebooks'
+    (base_dir / 'logs').mkdir(parents=True)
+    (base_dir / 'logs' / 'log.ipynb').write_text('{}')
+    template_dir = tmp_path / 'templates'
+    template_dir.mkdir()
+    (template_dir / 'notebook.html').write_text('template')
+    return {'name': 'test',
+            'base_dir': base_dir,
+            'template': {'template_dir': template_dir}}
+
+
+def get_fingerprint(config, previous=None, args=('config.yml',)):
+    snapshot = FilesystemSnapshot(config['base_dir'])
+    snapshot.scan(previous=previous)
+    return snapshot, get_build_fingerprint(config, snapshot, parse_args(list(args)))
+
+
+@pytest.fixture
+def website(tmp_path, monkeypatch):
+    """Build the example notebooks, recording the notebooks that are converted"""
+    shutil.copytree(repo_dir / 'example_notebooks', tmp_path / 'notebooks')
+    website_config = yaml.safe_load((repo_dir / 'config.yml').read_text())
+    website_config.update(base_dir=str(tmp_path / 'notebooks'),
+                          html_target_dir=str(tmp_path / 'docs'),
+                          cache_dir=str(tmp_path / 'cache'))
+    website_config['template']['template_dir'] = str(repo_dir / 'templates')
+    website_config = _convert_dirs_to_paths(website_config)
+    monkeypatch.setattr(convert_notebooks, 'load_config',
+                        lambda config_path: deepcopy(website_config))
+
+    converted = []
+
+    def run(pipeline, notebooks):
+        converted.extend(notebook.relative_path for notebook in notebooks)
+        return pipeline.failures
+
+    monkeypatch.setattr(ConversionPipeline, 'run', run)
+    return website_config, converted
+
+
+def test_unchanged_build_is_skipped(website):
+    config, converted = website
+    args = parse_args(['config.yml'])
+    assert build_website('config.yml', args)
+    assert Path('Analysis/1 - First measurements.ipynb') in converted
+
+    converted.clear()
+    assert build_website('config.yml', args)
+    assert converted == []
+
+    # Modified in place, such that the modification time of its folder is unchanged
+    with open(config['base_dir'] / 'Analysis' / '1 - First measurements.ipynb', 'a') as f:
+        f.write('\n')
+    assert build_website('config.yml', args)
+    assert Path('Analysis/1 - First measurements.ipynb') in converted
+
+
+def test_in_place_edit_invalidates_fingerprint(config):
+    snapshot, fingerprint = get_fingerprint(config)
+    # Modified in place, such that the modification time of its folder is unchanged
+    with open(config['base_dir'] / 'logs' / 'log.ipynb', 'a') as notebook_file:
+        notebook_file.write('\n')
+    assert get_fingerprint(config, previous=snapshot)[1] != fingerprint
+
+
+def test_template_and_arguments_invalidate_fingerprint(config):
+    snapshot, fingerprint = get_fingerprint(config)
+    assert get_fingerprint(config, args=['config.yml', '--trusted'])[1] != fingerprint
+
+    (config['template']['template_dir'] / 'notebook.html').write_text('modified template')
+    assert get_fingerprint(config, previous=snapshot)[1] != fingerprint
+
+
+def test_plan_is_a_dry_run(website, capsys):
+    config, converted = website
+    cache_dir = config['cache_dir'] / config['name']
+    assert build_website('config.yml', parse_args(['config.yml', '--plan']))
+    assert 'Build plan of' in capsys.readouterr().out
+    assert not cache_dir.exists()
+
+    assert build_website('config.yml', parse_args(['config.yml']))
+    cache_files = {path: path.stat().st_mtime_ns for path in cache_dir.rglob('*')}
+    converted.clear()
+
+    # Nothing changed since the build, but the plan is still shown
+    assert build_website('config.yml', parse_args(['config.yml', '--plan']))
+    assert 'Build plan of' in capsys.readouterr().out
+    assert converted == []
+    assert {path: path.stat().st_mtime_ns for path in cache_dir.rglob('*')} == cache_files
+
+
+def test_site_libs_invalidate_fingerprint(config, tmp_path, monkeypatch):
+    site_libs_dir = tmp_path / 'site-libs'
+    (site_libs_dir / 'js').mkdir(parents=True)
+    (site_libs_dir / 'js' / 'search.js').write_text('search()')
+    monkeypatch.setattr(convert_notebooks, 'site_libs_dir', site_libs_dir)
+    snapshot, fingerprint = get_fingerprint(config)
+
+    # Fingerprinted assets are copied from site-libs, also if no notebook changed
+    (site_libs_dir / 'js' / 'search.js').write_text('search(query)')
+    assert get_fingerprint(config, previous=snapshot)[1] != fingerprint
+
+
+def read_metrics(config) -> dict:
+    metrics_path, = config['metrics_dir'].glob('*.prom')
+    samples = {}
+    for line in metrics_path.read_text().splitlines():
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name.split('{')[0]] = float(value)
+    return samples
+
+
+def test_metrics_count_skipped_notebooks(website, tmp_path):
+    config, converted = website
+    config['metrics_dir'] = tmp_path / 'metrics'
+    scanned = sum(1 for _ in config['base_dir'].rglob('*.ipynb'))
+
+    assert build_website('config.yml', parse_args(['config.yml']))
+    metrics = read_metrics(config)
+    assert metrics['notebook_website_notebooks_scanned'] == scanned
+    assert metrics['notebook_website_notebooks_skipped'] == 0
+    assert metrics['notebook_website_build_up_to_date'] == 0
+
+    # Nothing changed, all notebooks are skipped
+    assert build_website('config.yml', parse_args(['config.yml']))
+    metrics = read_metrics(config)
+    assert metrics['notebook_website_notebooks_skipped'] == scanned
+    assert metrics['notebook_website_build_up_to_date'] == 1
+
+    # Notebooks of the other shard are skipped
+    converted.clear()
+    assert build_website('config.yml', parse_args(['config.yml', '--shard', '1/2']))
+    metrics = read_metrics(config)
+    pages = len(converted) + metrics['notebook_website_notebooks_skipped']
+    assert 0 < len(converted) < pages
+
+
+def test_validate_reports_invalid_notebooks(website):
+    config, converted = website
+    assert build_website('config.yml', parse_args(['config.yml', '--validate']))
+
+    notebook_path = config['base_dir'] / 'Analysis' / '1 - First measurements.ipynb'
+    notebook = json.loads(notebook_path.read_text())
+    notebook['cells'][0]['cell_type'] = 'unknown'
+    notebook_path.write_text(json.dumps(notebook))
+    assert not build_website('config.yml', parse_args(['config.yml', '--validate']))
+    assert converted == []
@@ -0,0 +1,52 @@
+import pytest
+from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell, new_output
+
+from src.context import BuildContext
+from src.converter_preprocessors import DetectMathPreprocessor
+from src.notebooks import LogIndexNotebook
+
+
+@pytest.mark.parametrize('text', [
+    'Inline $x^2$ math',
+    '$$\\int_0^1 f(x) dx$$',
+    'Costs $5, or $a + b$',
+    '\\(x\\)',
+    '\\begin{align} x \\end{align}'])
+def test_detect_math(text):
+    assert DetectMathPreprocessor.text_has_math(text)
+
+
+@pytest.mark.parametrize('text', [
+    'No math',
+    'It costs $5 and $10',
+    'Between $ 5 and 10 $',
+    'From $5 to 10$20'])
+def test_detect_no_math(text):
+    assert not DetectMathPreprocessor.text_has_math(text)
+
+
+def test_detect_math_in_outputs():
+    cell = new_code_cell('x', outputs=[
+        new_output('display_data', data={'text/latex': '$x$'})])
+    notebook = new_notebook(cells=[new_markdown_cell('It costs $5 and $10'), cell])
+    _, resources = DetectMathPreprocessor().preprocess(notebook, {})
+    assert resources['has_math']
+
+    notebook.cells.pop()
+    _, resources = DetectMathPreprocessor().preprocess(notebook, {})
+    assert not resources['has_math']
+
+
+def test_detect_math_in_lazy_summaries(tmp_path):
+    context = BuildContext(tmp_path, template_config={'notebook_name': 'Index'})
+    index_notebook = LogIndexNotebook(tmp_path / 'index.ipynb', log_folder=None,
+                                      name='Index', context=context,
+                                      lazy_summaries=True)
+    index_notebook.notebook = new_notebook(cells=[new_markdown_cell(
+        '<div class="lazy-summary" data-link="log.html"></div>')])
+    _, resources = index_notebook.preprocess_HTML()
+    assert not resources['has_math']
+
+    index_notebook.summaries['log.html'] = 'Measured $T_1$'
+    _, resources = index_notebook.preprocess_HTML()
+    assert resources['has_math']
@@ -0,0 +1,48 @@
+from src.build_stats import BuildStats
+from src.history import BuildHistory
+
+
+def record_build(history, costs, failures=()):
+    build_stats = BuildStats()
+    for path, (seconds, bytes) in costs.items():
+        build_stats.record_notebook(path, seconds=seconds, bytes=bytes)
+    for path in failures:
+        build_stats.record_failure(path, stage='render', error='Timeout', seconds=60)
+    return history.record(build_stats, duration=10)
+
+
+def test_record(tmp_path):
+    history = BuildHistory(tmp_path / '.build' / BuildHistory.filename)
+    assert history.builds() == []
+    first_id = record_build(history, {'a.ipynb': (1, 1000), 'b.ipynb': (2, 2000)})
+    second_id = record_build(history, {'a.ipynb': (1, 1000)}, failures=['b.ipynb'])
+
+    builds = history.builds()
+    assert [build['id'] for build in builds] == [first_id, second_id]
+    assert builds[0]['pages'] == 2 and builds[0]['bytes'] == 3000
+    assert builds[1]['failures'] == 1
+    assert [row['path'] for row in history.slowest(first_id)] == ['b.ipynb', 'a.ipynb']
+
+
+def test_jumps(tmp_path):
+    history = BuildHistory(tmp_path / BuildHistory.filename)
+    record_build(history, {'slow.ipynb': (2, 1000), 'large.ipynb': (1, 1e6),
+                           'fast.ipynb': (0.1, 1000)})
+    # Failed conversions are not compared
+    record_build(history, {}, failures=['slow.ipynb'])
+    build_id = record_build(history, {'slow.ipynb': (10, 1000), 'large.ipynb': (1, 3e6),
+                                      'fast.ipynb': (0.5, 1000)})
+
+    jumps = history.jumps()
+    assert [(jump['path'], jump['metric']) for jump in jumps] == [
+        ('slow.ipynb', 'seconds'), ('large.ipynb', 'bytes')]
+    assert jumps[0]['previous'] == 2 and jumps[0]['current'] == 10
+    assert jumps[0]['build_id'] == build_id
+
+    report = history.format_report()
+    assert 'slow.ipynb (build 3): 2.0 s -> 10.0 s' in report
+    assert 'large.ipynb (build 3): 1.0 MB -> 3.0 MB' in report
+
+
+def test_empty_report(tmp_path):
+    assert BuildHistory(tmp_path / BuildHistory.filename).format_report() == 'No builds recorded'
@@ -0,0 +1,42 @@
+import sys
+import importlib
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import src
+
+repo_dir = Path(__file__).absolute().parents[1]
+
+
+@pytest.mark.parametrize('submodule', sorted(src._submodule_names))
+def test_exported_names(submodule):
+    module = importlib.import_module(f'src.{submodule}')
+    if hasattr(module, '__all__'):
+        assert sorted(src._submodule_names[submodule]) == sorted(module.__all__)
+    for name in src._submodule_names[submodule]:
+        assert getattr(src, name) is getattr(module, name)
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError, match='has no attribute'):
+        src.MissingName
+    assert 'NotebookFolder' in dir(src)
+
+
+def test_heavy_modules_are_imported_lazily():
+    code = '\n'.join([
+        'import sys',
+        'import convert_notebooks',
+        "assert 'nbconvert' not in sys.modules, 'nbconvert imported by convert_notebooks'",
+        "assert 'src.notebooks' not in sys.modules",
+        'from src import FilesystemSnapshot, BuildStats',
+        "assert 'nbconvert' not in sys.modules, 'nbconvert imported by src.snapshot'",
+        'from src import NotebookFolder',
+        "assert 'nbconvert' in sys.modules",
+    ])
+    # A separate interpreter, since the tests already imported nbconvert
+    result = subprocess.run([sys.executable, '-c', code], cwd=repo_dir,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
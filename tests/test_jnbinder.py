@@ -0,0 +1,188 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'site-libs'))
+import jnbinder  # noqa: E402
+
+
+def git(cwd, *args):
+    subprocess.run(['git', '-c', 'user.name=Tester', '-c', 'user.email=tester@example.com',
+                    *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    git(tmp_path, 'init', '-q')
+    (tmp_path / 'logs').mkdir()
+    (tmp_path / 'logs' / 'a.ipynb').write_text('{}')
+    (tmp_path / 'b.ipynb').write_text('{}')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, 'commit', '-q', '-m', 'First')
+    (tmp_path / 'logs' / 'a.ipynb').write_text('{"cells": []}')
+    git(tmp_path, 'commit', '-q', '-am', 'Second')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(jnbinder, '_git_repos', {})
+    monkeypatch.setattr(jnbinder, '_file_commits', {})
+    return tmp_path
+
+
+def test_collect_file_commits(git_repo):
+    cache_file = git_repo / '.sos' / 'commits.json'
+    files = jnbinder.collect_file_commits(cache_file=str(cache_file))
+    assert set(files) == {'logs/a.ipynb', 'b.ipynb'}
+    assert files['logs/a.ipynb']['revisions'] == 2
+    assert files['b.ipynb']['revisions'] == 1
+    assert files['b.ipynb']['author'] == 'Tester'
+    assert files['logs/a.ipynb']['long'] != files['b.ipynb']['long']
+    assert files['logs/a.ipynb']['long'].startswith(files['logs/a.ipynb']['short'])
+    assert cache_file.exists()
+
+    # The next process reads the commits of the same HEAD from the cache file
+    jnbinder._file_commits.clear()
+    cache_file.write_text(cache_file.read_text().replace('Tester', 'Cached'))
+    files = jnbinder.collect_file_commits(cache_file=str(cache_file))
+    assert files['b.ipynb']['author'] == 'Cached'
+
+
+def test_get_commit_info(git_repo):
+    conf = {'add_commit_info': True, 'repo': 'https://github.com/user/repo',
+            '__about_commit__': ''}
+    info = jnbinder.get_commit_info('logs/a.ipynb', conf)
+    assert 'revision 2' in info and 'Tester' in info
+    assert jnbinder.get_commit_info('missing.ipynb', conf) == ''
+    assert jnbinder.get_commit_info('logs/a.ipynb', dict(conf, add_commit_info=False)) == ''
+
+
+def test_commit_info_of_path_not_in_history(git_repo, tmp_path_factory, monkeypatch):
+    conf = {'add_commit_info': True, 'repo': 'https://github.com/user/repo',
+            '__about_commit__': ''}
+    # Files that were never committed have no commit info
+    (git_repo / 'logs' / 'untracked.ipynb').write_text('{}')
+    assert jnbinder.get_commit_info('logs/untracked.ipynb', conf) == ''
+
+    # Errors other than failing git commands are not hidden
+    with pytest.raises(KeyError):
+        jnbinder.get_commit_info('logs/a.ipynb', {'add_commit_info': True})
+
+    # Outside a git repository there is no commit info either
+    monkeypatch.chdir(tmp_path_factory.mktemp('no_repo'))
+    assert jnbinder.get_commit_info('b.ipynb', conf) == ''
+
+
+PAGE = '''<html><head><title>Page title</title></head><body>
+<h1 id="Analysis">Analysis<a class="anchor-link" href="#Analysis">&#182;</a></h1>
+<p>Text</p>
+<h2><a id="fit"></a>Fit &amp; results</h2>
+</body></html>'''
+
+
+def test_get_headers():
+    title, headers = jnbinder.get_headers(PAGE.encode('utf-8'))
+    assert title == 'Page title'
+    assert headers == [
+        {'level': 'h1', 'text': 'Analysis¶', 'id': None, 'anchor': '#Analysis'},
+        {'level': 'h2', 'text': 'Fit & results', 'id': 'fit', 'anchor': None}]
+
+
+def test_parse_html_headers(tmp_path):
+    page_path = tmp_path / 'page.html'
+    page_path.write_text(PAGE, encoding='utf-8')
+    entries = jnbinder.parse_html_headers('logs/page.html', str(page_path))
+    assert [entry['url'] for entry in entries] == ['logs/page.html#Analysis',
+                                                   'logs/page.html#fit']
+    assert entries[0]['mainTitle'] == entries[0]['title'] == 'Analysis'
+    assert entries[1]['text'] == 'Fit results '
+
+    # Same entries as the BeautifulSoup version
+    assert entries == [json.loads(entry) for entry in
+                       jnbinder.parse_html('logs/page.html', str(page_path))]
+
+
+def test_generate_tipue_content(tmp_path):
+    docs_dir = tmp_path / 'docs'
+    (docs_dir / 'site_libs' / 'tipuesearch').mkdir(parents=True)
+    html_files = []
+    for name in ['a', 'b']:
+        page_path = docs_dir / f'{name}.html'
+        page_path.write_text(PAGE.replace('Analysis', name.upper()), encoding='utf-8')
+        html_files.append(str(page_path))
+    cache_file = tmp_path / 'tipue.json'
+    content_path = docs_dir / 'site_libs' / 'tipuesearch' / 'tipuesearch_content.js'
+
+    jnbinder.generate_tipue_content(html_files, 'https://site/', str(docs_dir) + '/',
+                                    workers=1, cache_file=str(cache_file))
+    content = content_path.read_text()
+    assert content.startswith('var tipuesearch = {"pages": [')
+    assert '"url": "https://site/a.html#A"' in content
+    assert '"url": "https://site/b.html#fit"' in content
+
+    # Unchanged pages are read from the cache, changed pages are parsed again
+    cache_file.write_text(cache_file.read_text().replace('"mainTitle": "A"',
+                                                         '"mainTitle": "Cached"'))
+    Path(html_files[1]).write_text(PAGE.replace('Analysis', 'Changed'), encoding='utf-8')
+    jnbinder.generate_tipue_content(html_files, 'https://site/', str(docs_dir) + '/',
+                                    workers=1, cache_file=str(cache_file))
+    content = content_path.read_text()
+    assert '"mainTitle": "Cached"' in content
+    assert '"url": "https://site/b.html#Changed"' in content
+
+
+def write_notebook(path, *sources):
+    path.write_text(jnbinder.make_nb([jnbinder.markdown_cell(source) for source in sources]),
+                    encoding='utf-8')
+
+
+def test_read_first_cell(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    write_notebook(path, '# Title\n', 'x' * 1000)
+    # The first cell spans several chunks
+    assert jnbinder.read_first_cell(str(path), chunk_size=8)['source'] == ['# Title\n']
+
+    write_notebook(path)
+    assert jnbinder.read_first_cell(str(path)) is None
+
+    # Notebooks not starting with their cells are read fully
+    path.write_text('{"metadata": {}, "cells": [{"cell_type": "markdown", "source": "A\\nB"}]}')
+    cell = jnbinder.read_first_cell(str(path))
+    assert jnbinder.get_source_lines(cell) == ['A\n', 'B']
+    assert jnbinder.get_source_lines(None) == []
+
+
+@pytest.mark.parametrize('notebook', [
+    # The metadata contains a "cells" key of its own
+    {'metadata': {'extension': {'cells': [{'source': 'Wrong'}]}},
+     'cells': [{'cell_type': 'markdown', 'metadata': {}, 'source': ['# Title\n']}]},
+    {'nbformat': 4, 'nbformat_minor': 4, 'cells': [], 'metadata': {}},
+    {'cells': [{'cell_type': 'markdown', 'metadata': {}, 'source': '[{"cells": []}]'}],
+     'metadata': {}},
+])
+@pytest.mark.parametrize('chunk_size', [4, 16, 65536])
+def test_read_first_cell_matches_full_parse(tmp_path, notebook, chunk_size):
+    path = tmp_path / 'log.ipynb'
+    path.write_text(json.dumps(notebook, indent=1))
+    cells = json.loads(path.read_text())['cells']
+    expected = cells[0] if cells else None
+    assert jnbinder.read_first_cell(str(path), chunk_size=chunk_size) == expected
+
+
+def test_make_index_nb(tmp_path):
+    path = tmp_path / 'logs'
+    path.mkdir()
+    write_notebook(path / 'first_log.ipynb', '# First log\n', 'x' * 100000)
+    write_notebook(path / 'second_log.ipynb', '\n', '# Second')
+    write_notebook(path / 'empty.ipynb')
+    write_notebook(path / 'index.ipynb', '# Index')
+
+    cells = json.loads(jnbinder.make_index_nb(str(path), exclude=[]))['cells']
+    # The second notebook has no text in its first cell
+    assert [cell['source'][0] for cell in cells[1:]] == [
+        '[**first log**](%s/first_log.html)<br>\n' % path]
+    assert cells[1]['source'][1] == '&nbsp; &nbsp;First log'
+
+    toc = jnbinder.get_notebook_toc(str(path), exclude=[])
+    assert "{'First-log-1': 'first_log'}" in toc
+    assert "{'first_log': 'First log'}" in toc
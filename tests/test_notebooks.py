@@ -0,0 +1,223 @@
+import re
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import nbformat
+import pytest
+import yaml
+from jinja2 import TemplateNotFound
+from nbconvert import HTMLExporter
+from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell
+
+from src.context import BuildContext
+from src.notebooks import LogNotebook, NotebookFolder
+from src.pipeline import ExporterPool
+from src.tools import _convert_dirs_to_paths
+
+repo_dir = Path(__file__).absolute().parents[1]
+
+
+def has_base_template() -> bool:
+    """Whether basic.tpl, extended by the website templates, is available"""
+    try:
+        HTMLExporter().environment.get_template('basic.tpl')
+    except TemplateNotFound:
+        return False
+    return True
+
+
+requires_base_template = pytest.mark.skipif(
+    not has_base_template(), reason='Website templates extend basic.tpl of nbconvert 5')
+
+
+def render_page(tmp_path, cells, **template_config) -> str:
+    """Render a notebook with the website templates"""
+    notebook_dir = tmp_path / 'notebooks'
+    notebook_dir.mkdir(parents=True)
+    nbformat.write(new_notebook(cells=cells), str(notebook_dir / '1 - Log.ipynb'))
+    config = yaml.safe_load((repo_dir / 'config.yml').read_text())['template']
+    config.update(template_dir=repo_dir / 'templates', **template_config)
+    folder = NotebookFolder(path=notebook_dir, name='website', notebook_class=LogNotebook)
+    folder.compile_index_notebook()
+    folder.generate_template(config=_convert_dirs_to_paths(config))
+    notebook, = folder.notebooks
+    notebook.convert_to_HTML(tmp_path / 'html', exporter_pool=ExporterPool())
+    return (tmp_path / 'html' / notebook.relative_path.with_suffix('.html')).read_text()
+
+
+def test_summary_cells_of_notebook_without_metadata(tmp_path):
+    context = BuildContext(tmp_path)
+    notebook = LogNotebook(Path('log.ipynb'), read=False, context=context)
+    assert notebook.summary_cells == []
+
+    # Notebooks that are not read from disk have no cached metadata
+    notebook.notebook = new_notebook(cells=[
+        new_markdown_cell('# Summary'), new_code_cell('plot()'),
+        new_markdown_cell('# Details'), new_code_cell('details()')])
+    assert notebook.metadata is None
+    assert [cell.source for cell in notebook.extract_summary_cells()] == ['plot()']
+
+
+def test_client_highlighting_keeps_exporter_environment(tmp_path):
+    notebook_file = new_notebook(cells=[new_code_cell('x = 1')],
+                                 metadata={'language_info': {'name': 'julia'}})
+    nbformat.write(notebook_file, str(tmp_path / 'log.ipynb'))
+    notebook = LogNotebook(Path('log.ipynb'), context=BuildContext(tmp_path))
+    exporter_pool = ExporterPool(template_cache_dir=tmp_path / 'templates')
+
+    nb, resources = notebook.notebook, {'highlighting': 'client'}
+    highlight_settings = notebook.get_highlight_settings(nb, resources)
+    assert highlight_settings == {'highlighting': 'client', 'language': 'julia'}
+    with exporter_pool.exporter(notebook, **highlight_settings) as HTML_exporter:
+        environment = HTML_exporter.environment
+        assert environment.bytecode_cache is exporter_pool.bytecode_cache
+        HTML_output = notebook.render_HTML(nb, resources, HTML_exporter=HTML_exporter)
+        assert 'class="language-julia"' in HTML_output
+        # Rendering does not recreate the environment (and its template cache)
+        assert HTML_exporter.environment is environment
+
+    with exporter_pool.exporter(notebook, **highlight_settings) as HTML_exporter:
+        assert HTML_exporter.environment is environment
+
+    # Exporters of other settings are pooled separately
+    with exporter_pool.exporter(notebook, highlighting='server',
+                                language='julia') as HTML_exporter:
+        assert 'highlight_code' not in HTML_exporter.filters
+        assert HTML_exporter.environment.bytecode_cache is exporter_pool.bytecode_cache
+
+
+def test_bytecode_cache_survives_environment_changes(tmp_path):
+    notebook = LogNotebook(Path('log.ipynb'), read=False, context=BuildContext(tmp_path))
+    exporter_pool = ExporterPool(template_cache_dir=tmp_path / 'templates')
+    with exporter_pool.exporter(notebook) as HTML_exporter:
+        # Changing a trait that affects the environment recreates it
+        HTML_exporter.filters = {'shout': str.upper}
+        assert HTML_exporter.environment.bytecode_cache is None
+
+    with exporter_pool.exporter(notebook) as HTML_exporter:
+        assert HTML_exporter.environment.bytecode_cache is exporter_pool.bytecode_cache
+
+
+def test_paginated_index_pages(tmp_path):
+    folder_path = tmp_path / 'Follow-up'
+    shutil.copytree(repo_dir / 'example_notebooks' / 'Analysis' / '2 - Follow-up measurements',
+                    folder_path)
+    folder = NotebookFolder(path=folder_path, name='Follow-up', notebook_class=LogNotebook)
+
+    index_notebook = folder.compile_index_notebook()
+    assert folder.index_pages == [index_notebook]
+    sources = [cell.source for cell in index_notebook.notebook.cells]
+    assert 'Summary of first follow up measurements here' in sources
+    assert not any('index-pagination' in source for source in sources)
+
+    folder.compile_index_notebook(page_size=1, newest_first=True, lazy_summaries=True)
+    assert [page.relative_path for page in folder.index_pages] == [
+        Path('index.ipynb'), Path('index-2.ipynb')]
+    assert [page.page for page in folder.index_pages] == [1, 2]
+    assert list(folder.iter_index_notebooks()) == folder.index_pages
+    first_page, second_page = folder.index_pages
+
+    # The folder summary is only shown on the first page
+    first_sources = [cell.source for cell in first_page.notebook.cells]
+    second_sources = [cell.source for cell in second_page.notebook.cells]
+    summary_source = folder.summary_notebook.cells[0].source
+    assert summary_source in first_sources[0]
+    assert not any(summary_source in source for source in second_sources)
+
+    # Newest notebooks are listed first, and pages link to each other
+    assert '2 - Second follow up measurements' in first_sources[2]
+    assert '1 - First follow up measurements' in second_sources[1]
+    assert first_sources[1] == first_sources[-1]
+    assert '<a href="index-2.html">Next &raquo;</a>' in first_sources[1]
+    assert '<a href="index.html">&laquo; Previous</a>' in second_sources[0]
+
+    # Summaries are written to JSON instead of added to the page
+    assert 'data-summaries="index-2.summaries.json"' in second_sources[2]
+    assert second_page.summaries == {
+        '1 - First follow up measurements.html': 'Summary of first follow up measurements here'}
+    second_page.write_HTML(tmp_path / 'html', '<html></html>')
+    summaries = json.loads((tmp_path / 'html' / 'index-2.summaries.json').read_text())
+    assert 'Summary of first follow up measurements here' in summaries[
+        '1 - First follow up measurements.html']
+
+
+@requires_base_template
+def test_search_content_is_not_loaded_by_pages(tmp_path):
+    HTML_output = render_page(tmp_path, [new_markdown_cell('# Title')])
+    assert 'search_manifest.js' in HTML_output
+    assert 'js/search.js' in HTML_output
+    assert 'tipuesearch_content' not in HTML_output
+
+
+def test_websites_do_not_share_state(tmp_path):
+    websites = {}
+    for name in ['first', 'second']:
+        folder_path = tmp_path / name / 'Follow-up'
+        shutil.copytree(repo_dir / 'example_notebooks' / 'Analysis' / '2 - Follow-up measurements',
+                        folder_path)
+        websites[name] = BuildContext(tmp_path / name, name=name,
+                                      template_config={'website': name})
+
+    # Websites are parsed concurrently, as done for multiple config files
+    with ThreadPoolExecutor() as executor:
+        folders = dict(zip(websites, executor.map(
+            lambda context: NotebookFolder(path=Path('.'), name=context.name,
+                                           sections={'Follow-up': {'path': 'Follow-up'}},
+                                           notebook_class=LogNotebook,
+                                           context=context),
+            websites.values())))
+
+    for name, folder in folders.items():
+        assert folder.context is websites[name]
+        assert folder.base_dir == tmp_path / name
+        assert list(folder.sections) == ['Follow-up']
+        for notebook in folder.iter_notebooks():
+            assert notebook.context is websites[name]
+            assert tmp_path / name in notebook.absolute_path.parents
+            assert notebook.template_config == {'website': name}
+    assert folders['first'].sections is not folders['second'].sections
+
+
+@requires_base_template
+def test_service_worker_is_registered_if_enabled(tmp_path):
+    cells = [new_markdown_cell('# Title')]
+    assert 'serviceWorker' not in render_page(tmp_path / 'default', cells)
+    HTML_output = render_page(tmp_path / 'enabled', cells, service_worker=True)
+    assert "navigator.serviceWorker.register('./service_worker.js')" in HTML_output
+
+
+@requires_base_template
+def test_mathjax_is_only_loaded_for_pages_with_math(tmp_path):
+    def mathjax_scripts(HTML_output):
+        return [src for src in re.findall(r'<script[^>]* src="([^"]*)"', HTML_output)
+                if 'mathjax' in src.lower()]
+
+    HTML_output = render_page(tmp_path / 'text', [new_markdown_cell('Costs $5 or $10')])
+    assert mathjax_scripts(HTML_output) == []
+
+    HTML_output = render_page(tmp_path / 'math', [new_markdown_cell('Energy $E = mc^2$')])
+    # The configuration is loaded before MathJax
+    configuration, *mathjax = mathjax_scripts(HTML_output)
+    assert configuration == '../site-libs/js/mathjax.js'
+    assert len(mathjax) == 1
+
+
+@requires_base_template
+def test_lean_pages_defer_scripts_and_stylesheets(tmp_path):
+    cells = [new_markdown_cell('# Title')]
+    HTML_output = render_page(tmp_path / 'default', cells)
+    assert 'rel="preload"' not in HTML_output
+    assert not re.findall(r'<script[^>]* defer', HTML_output)
+
+    HTML_output = render_page(tmp_path / 'lean', cells, lean=True)
+    head = HTML_output[:HTML_output.index('</head>')]
+    # Site-libs scripts of the page are deferred, such that they do not block rendering
+    site_libs_scripts = re.findall(r'<script[^>]*src="\.\./site-libs/[^"]*"[^>]*>', head)
+    assert site_libs_scripts
+    assert all('defer' in script for script in site_libs_scripts)
+    # Critical CSS is inlined, and purged stylesheets are loaded without blocking
+    assert '<style>' in head
+    assert re.search(r'<link[^>]*href="\./css/jt\.css"[^>]*rel="preload"|'
+                     r'<link[^>]*rel="preload"[^>]*href="\./css/jt\.css"', head)
@@ -0,0 +1,81 @@
+import threading
+from pathlib import Path
+
+from src.pipeline import ConversionPipeline
+
+
+class FakeNotebook:
+    """Stand-in for Notebook, rendering its name instead of a template"""
+    template_path = None
+    build_stats = None
+    _read = False
+
+    def __init__(self, name: str, fail_stage: str = None):
+        self.relative_path = Path(f'{name}.ipynb')
+        self.notebook = name
+        self.fail_stage = fail_stage
+
+    def create_HTML_exporter(self):
+        return object()
+
+    @staticmethod
+    def configure_HTML_exporter(HTML_exporter, **highlight_settings):
+        pass
+
+    @staticmethod
+    def get_highlight_settings(notebook, resources):
+        return {}
+
+    def preprocess_HTML(self):
+        if self.fail_stage == 'preprocess':
+            raise ValueError('Invalid notebook')
+        return self.notebook, {}
+
+    def render_HTML(self, notebook, resources, HTML_exporter, target_dir):
+        if self.fail_stage == 'render':
+            raise ValueError('Could not render')
+        return f'<p>{notebook}</p>'
+
+    def write_HTML(self, target_dir, HTML_output):
+        (Path(target_dir) / self.relative_path.with_suffix('.html')).write_text(HTML_output)
+
+
+def run_pipeline(pipeline, notebooks, timeout=10):
+    """Run pipeline in a thread, such that a hanging pipeline fails the test"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(failures=pipeline.run(notebooks)),
+                              daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'Pipeline did not finish'
+    return result['failures']
+
+
+def test_run(tmp_path):
+    notebooks = [FakeNotebook(f'notebook{k}') for k in range(20)]
+    pipeline = ConversionPipeline(tmp_path, queue_size=2)
+    assert run_pipeline(pipeline, notebooks) == []
+    assert (tmp_path / 'notebook19.html').read_text() == '<p>notebook19</p>'
+
+
+def test_failures_are_skipped(tmp_path):
+    notebooks = [FakeNotebook('valid'),
+                 FakeNotebook('invalid', fail_stage='preprocess'),
+                 FakeNotebook('unrenderable', fail_stage='render')]
+    failures = run_pipeline(ConversionPipeline(tmp_path), notebooks)
+    assert sorted((notebook.notebook, stage) for notebook, stage, _ in failures) == [
+        ('invalid', 'preprocess'), ('unrenderable', 'render')]
+    assert (tmp_path / 'valid.html').exists()
+    assert not (tmp_path / 'invalid.html').exists()
+
+
+def test_failing_error_handler_does_not_hang(tmp_path):
+    class FailingPipeline(ConversionPipeline):
+        def _on_error(self, item, stage_name, exception):
+            raise RuntimeError('Error handler failed')
+
+    notebooks = [FakeNotebook(f'invalid{k}', fail_stage='render') for k in range(10)]
+    notebooks.append(FakeNotebook('valid'))
+    pipeline = FailingPipeline(tmp_path, render_workers=1, queue_size=1)
+    run_pipeline(pipeline, notebooks)
+    assert (tmp_path / 'valid.html').exists()
@@ -0,0 +1,172 @@
+import os
+import time
+import threading
+import http.client
+from pathlib import Path
+
+from src.preview import PreviewServer
+
+
+class FakeNotebook:
+    """Stand-in for LogNotebook, rendering its summary"""
+    _read = True
+
+    def __init__(self, folder: 'FakeFolder', name: str):
+        self.absolute_path = folder.absolute_path / f'{name}.ipynb'
+        self.relative_path = self.absolute_path.relative_to(folder.base_dir)
+        self.absolute_path.write_text('first summary')
+        self.summary_cells = self.extract_summary_cells()
+        self.notebook = None
+        self.conversions = 0
+        self.converting = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def load_notebook(self):
+        self.notebook = self.absolute_path.read_text()
+
+    def extract_summary_cells(self):
+        return [self.absolute_path.read_text()]
+
+    def convert_to_HTML(self, target_dir, exporter_pool=None):
+        self.converting.set()
+        self.release.wait(10)
+        self.conversions += 1
+        HTML_path = target_dir / self.relative_path.with_suffix('.html')
+        HTML_path.parent.mkdir(parents=True, exist_ok=True)
+        HTML_path.write_text(self.summary_cells[0])
+
+
+class FakeIndexNotebook(FakeNotebook):
+    """Stand-in for LogIndexNotebook, listing the summaries of its folder"""
+    elements = None
+    page = 1
+
+    def __init__(self, folder: 'FakeFolder'):
+        self.log_folder = folder
+        self.absolute_path = folder.absolute_path / 'index.ipynb'
+        self.relative_path = self.absolute_path.relative_to(folder.base_dir)
+        self.conversions = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.converting = threading.Event()
+        self.compile()
+
+    def compile(self):
+        self.summary_cells = [' '.join(notebook.summary_cells[0] for notebook in self.log_folder)]
+
+
+class FakeFolder:
+    summary_notebook = None
+
+    def __init__(self, base_dir: Path, names):
+        self.name = 'website'
+        self.base_dir = base_dir
+        self.absolute_path = base_dir
+        base_dir.mkdir(parents=True, exist_ok=True)
+        self.notebooks = [FakeNotebook(self, name) for name in names]
+        self.index_notebook = FakeIndexNotebook(self)
+
+    def __iter__(self):
+        return iter(self.notebooks)
+
+    def iter_pages(self):
+        return iter(self.notebooks)
+
+    def iter_index_notebooks(self):
+        return iter([self.index_notebook])
+
+
+def modify(path: Path, text: str):
+    path.write_text(text)
+    # Ensure the modification time changes on file systems with coarse mtimes
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+
+def test_pages_are_rendered_again_once_modified(tmp_path):
+    folder = FakeFolder(tmp_path / 'notebooks', ['a', 'b'])
+    preview = PreviewServer(folder, target_dir=tmp_path / 'preview')
+    notebook = folder.notebooks[0]
+
+    preview.prepare('/website/a.html')
+    preview.prepare('/website/a.html')
+    assert notebook.conversions == 1
+
+    modify(notebook.absolute_path, 'second summary')
+    preview.prepare('/website/a.html')
+    assert notebook.conversions == 2
+
+
+def test_index_page_is_rendered_again_once_a_notebook_is_modified(tmp_path):
+    folder = FakeFolder(tmp_path / 'notebooks', ['a', 'b'])
+    preview = PreviewServer(folder, target_dir=tmp_path / 'preview')
+
+    preview.prepare('/website/')
+    assert (tmp_path / 'preview' / 'index.html').read_text() == 'first summary first summary'
+
+    modify(folder.notebooks[1].absolute_path, 'second summary')
+    preview.prepare('/website/index.html')
+    assert folder.index_notebook.conversions == 2
+    assert (tmp_path / 'preview' / 'index.html').read_text() == 'first summary second summary'
+
+
+def test_notebook_folders_are_reloaded_once_a_notebook_is_added(tmp_path):
+    base_dir = tmp_path / 'notebooks'
+    folder = FakeFolder(base_dir, ['a'])
+    preview = PreviewServer(folder, target_dir=tmp_path / 'preview',
+                            reload=lambda: FakeFolder(base_dir, ['a', 'b']))
+    preview.prepare('/website/index.html')
+    assert '/website/b.html' not in preview.pages
+
+    # FakeFolder writes the new notebook, modifying the folder
+    stat = os.stat(base_dir)
+    os.utime(base_dir, (stat.st_atime, stat.st_mtime + 1))
+    preview.prepare('/website/index.html')
+    assert 'b.html' in preview.pages
+    assert preview.pages['index.html'] is not folder.index_notebook
+    assert preview.pages['index.html'].conversions == 1
+
+
+def test_slow_page_does_not_block_other_pages(tmp_path):
+    folder = FakeFolder(tmp_path / 'notebooks', ['slow', 'fast'])
+    preview = PreviewServer(folder, target_dir=tmp_path / 'preview')
+    slow_notebook, fast_notebook = folder.notebooks
+
+    slow_notebook.release.clear()
+    thread = threading.Thread(target=preview.prepare, args=('/website/slow.html',))
+    thread.start()
+    try:
+        assert slow_notebook.converting.wait(10)
+        t0 = time.perf_counter()
+        preview.prepare('/website/fast.html')
+        assert fast_notebook.conversions == 1
+        assert time.perf_counter() - t0 < 5
+    finally:
+        slow_notebook.release.set()
+        thread.join(10)
+    assert slow_notebook.conversions == 1
+
+
+def test_root_is_redirected(tmp_path):
+    folder = FakeFolder(tmp_path / 'notebooks', ['a'])
+    preview = PreviewServer(folder, target_dir=tmp_path / 'preview', port=0)
+    server = preview.create_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for method in ['GET', 'HEAD']:
+            connection = http.client.HTTPConnection('localhost', server.server_address[1])
+            connection.request(method, '/')
+            response = connection.getresponse()
+            assert response.status == 302
+            assert response.getheader('Location') == '/website/'
+            connection.close()
+
+        connection = http.client.HTTPConnection('localhost', server.server_address[1])
+        connection.request('HEAD', '/website/a.html')
+        assert connection.getresponse().status == 200
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
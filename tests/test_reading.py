@@ -0,0 +1,45 @@
+import json
+
+import nbformat
+from nbformat.v4 import new_notebook, new_markdown_cell, new_code_cell, new_output
+
+from src.reading import read_notebook, reads_notebook, validate_notebook
+
+
+def test_trusted_read_matches_nbformat(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    notebook = new_notebook(cells=[
+        new_markdown_cell('# Title\nText'),
+        new_code_cell('x = 1\nx', outputs=[new_output('execute_result', {'text/plain': '1'},
+                                                      execution_count=1)])])
+    nbformat.write(notebook, str(path))
+
+    trusted_notebook = read_notebook(path, trusted=True)
+    assert trusted_notebook == read_notebook(path)
+    # Sources split into lines are joined, and cells are NotebookNodes
+    assert trusted_notebook.cells[1].source == 'x = 1\nx'
+    assert trusted_notebook.cells[1].outputs[0].data['text/plain'] == '1'
+
+
+def test_invalid_notebook_is_validated_afterwards(tmp_path):
+    path = tmp_path / 'log.ipynb'
+    notebook = json.loads(nbformat.writes(new_notebook(cells=[new_markdown_cell('Text')])))
+    notebook['cells'][0]['cell_type'] = 'unknown'
+    path.write_text(json.dumps(notebook))
+
+    # The schema is not checked while reading a trusted notebook
+    assert read_notebook(path, trusted=True).cells[0].cell_type == 'unknown'
+    assert not validate_notebook(path)
+    assert not validate_notebook(path, notebook=read_notebook(path, trusted=True))
+
+    nbformat.write(new_notebook(cells=[new_markdown_cell('Text')]), str(path))
+    assert validate_notebook(path)
+
+
+def test_trusted_read_of_older_nbformat():
+    notebook = nbformat.v3.new_notebook(worksheets=[nbformat.v3.new_worksheet(
+        cells=[nbformat.v3.new_text_cell('markdown', source='Text')])])
+    data = nbformat.writes(notebook, version=3).encode('utf-8')
+    # Notebooks that are not nbformat 4 are read by nbformat
+    assert reads_notebook(data, trusted=True) == reads_notebook(data)
+    assert reads_notebook(data, trusted=True).nbformat == 3
@@ -0,0 +1,30 @@
+import json
+
+from src.search import write_search_content
+
+
+def read_manifest(target_dir) -> dict:
+    manifest = (target_dir / 'search_manifest.js').read_text()
+    prefix = 'var search_manifest = '
+    assert manifest.startswith(prefix) and manifest.endswith(';')
+    return json.loads(manifest[len(prefix):-1])
+
+
+def test_search_content_is_content_hashed(tmp_path):
+    pages = [{'title': 'Log', 'text': 'Measurement', 'tags': '', 'url': 'log.html'}]
+    content_path = write_search_content(pages, target_dir=tmp_path)
+    assert read_manifest(tmp_path) == {'content': content_path.name}
+    content = content_path.read_text()
+    assert json.loads(content[content.index('{'):-1]) == {'pages': pages}
+
+    # Unchanged content keeps its filename, such that it stays cached
+    mtime = content_path.stat().st_mtime_ns
+    assert write_search_content(pages, target_dir=tmp_path) == content_path
+    assert content_path.stat().st_mtime_ns == mtime
+
+    # Modified content gets a new filename, and previous content is removed
+    pages.append({'title': 'Index', 'text': '', 'tags': '', 'url': 'index.html'})
+    new_content_path = write_search_content(pages, target_dir=tmp_path)
+    assert new_content_path != content_path
+    assert read_manifest(tmp_path) == {'content': new_content_path.name}
+    assert list(tmp_path.glob('tipuesearch_content.*.js')) == [new_content_path]
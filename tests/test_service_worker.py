@@ -0,0 +1,50 @@
+import json
+
+from src.assets import AssetManifest
+from src.service_worker import write_page_hashes, write_service_worker
+
+
+def read_service_worker_settings(service_worker_path) -> dict:
+    """Variables defined by the generated head of the service worker"""
+    settings = {}
+    for line in service_worker_path.read_text().splitlines():
+        if not line.startswith('var ') or ' = ' not in line or not line.endswith(';'):
+            break
+        name, value = line[len('var '):-1].split(' = ', maxsplit=1)
+        settings[name] = json.loads(value)
+    return settings
+
+
+def test_page_hashes(tmp_path):
+    (tmp_path / 'Analysis').mkdir()
+    (tmp_path / 'index.html').write_text('index')
+    (tmp_path / 'Analysis' / 'log.html').write_text('log')
+    (tmp_path / 'search_manifest.js').write_text('manifest')
+
+    page_hashes = write_page_hashes(tmp_path)
+    assert set(page_hashes) == {'index.html', 'Analysis/log.html'}
+    assert json.loads((tmp_path / 'page_hashes.json').read_text()) == page_hashes
+
+    # Only the hash of the modified page changes
+    (tmp_path / 'Analysis' / 'log.html').write_text('modified log')
+    new_page_hashes = write_page_hashes(tmp_path)
+    assert new_page_hashes['index.html'] == page_hashes['index.html']
+    assert new_page_hashes['Analysis/log.html'] != page_hashes['Analysis/log.html']
+
+
+def test_service_worker_precaches_fingerprinted_assets(tmp_path):
+    manifest = AssetManifest(tmp_path, site_depth=1)
+    urls = [manifest.url('js/search.js'), manifest.url('js/auto_highlight.js')]
+
+    service_worker_path = write_service_worker(tmp_path, precache_urls=manifest.urls)
+    assert service_worker_path == tmp_path / 'service_worker.js'
+    settings = read_service_worker_settings(service_worker_path)
+    assert settings['precache_urls'] == sorted(urls)
+    assert 'caches.open' in service_worker_path.read_text()
+
+    # Browsers install a new service worker once the precached assets change
+    write_service_worker(tmp_path, precache_urls=reversed(manifest.urls))
+    assert read_service_worker_settings(service_worker_path) == settings
+    write_service_worker(tmp_path, precache_urls=urls[:1])
+    assert (read_service_worker_settings(service_worker_path)['cache_version']
+            != settings['cache_version'])
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+import pytest
+
+from src.build_stats import BuildStats
+from src.cache import NotebookMetadata
+from src.sharding import (parse_shard, assign_shards, write_shard_manifest,
+                          load_shard_manifests)
+
+
+class FakeNotebook:
+    def __init__(self, relative_path: str):
+        self.relative_path = Path(relative_path)
+        self.metadata = NotebookMetadata(size=1, mtime=2, content_hash='hash')
+
+
+def test_parse_shard():
+    assert parse_shard('2/3') == (2, 3)
+    for shard in ['0/3', '4/3', '2', 'a/b']:
+        with pytest.raises(ValueError):
+            parse_shard(shard)
+
+
+def test_assign_shards_balances_costs():
+    notebooks = [FakeNotebook(f'{name}.ipynb') for name in 'abcdef']
+    costs = {'a.ipynb': {'seconds': 10}, 'b.ipynb': {'seconds': 6},
+             'c.ipynb': {'seconds': 4}, 'd.ipynb': {'seconds': 1}}
+    shards = assign_shards(notebooks, num_shards=2, costs=costs)
+
+    # e and f have the average cost of 5.25 s, most expensive first
+    assert [[notebook.relative_path.stem for notebook in shard]
+            for shard in shards] == [['a', 'f', 'd'], ['b', 'e', 'c']]
+
+
+def test_assign_shards_is_deterministic():
+    notebooks = [FakeNotebook(f'{k}.ipynb') for k in range(20)]
+    shards = assign_shards(notebooks, num_shards=3)
+    reversed_shards = assign_shards(notebooks[::-1], num_shards=3)
+    assert ([[notebook.relative_path for notebook in shard] for shard in shards]
+            == [[notebook.relative_path for notebook in shard] for shard in reversed_shards])
+    assert sorted(len(shard) for shard in shards) == [6, 7, 7]
+
+
+def test_shard_manifests(tmp_path):
+    notebooks = [FakeNotebook('logs/a.ipynb'), FakeNotebook('logs/b.ipynb')]
+    for shard_index, notebook in enumerate(notebooks, start=1):
+        write_shard_manifest(tmp_path, shard_index=shard_index, num_shards=2,
+                             notebooks=[notebook],
+                             costs={notebook.relative_path.as_posix(): {'seconds': 1}})
+
+    manifests = load_shard_manifests(tmp_path, num_shards=2)
+    assert [manifest['pages'] for manifest in manifests] == [['logs/a.html'],
+                                                            ['logs/b.html']]
+    assert manifests[1]['notebooks']['logs/b.ipynb']['content_hash'] == 'hash'
+
+    with pytest.raises(FileNotFoundError):
+        load_shard_manifests(tmp_path, num_shards=3)
+
+
+def test_costs_are_merged_between_builds(tmp_path):
+    costs_path = tmp_path / BuildStats.costs_filename
+    build_stats = BuildStats()
+    build_stats.record_notebook('a.ipynb', seconds=1, bytes=100)
+    build_stats.save_costs(costs_path)
+
+    build_stats = BuildStats()
+    build_stats.record_notebook('b.ipynb', seconds=2, bytes=200)
+    build_stats.save_costs(costs_path)
+    assert BuildStats.load_costs(costs_path) == {
+        'a.ipynb': {'seconds': 1, 'bytes': 100},
+        'b.ipynb': {'seconds': 2, 'bytes': 200}}
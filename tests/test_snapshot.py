@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from src import snapshot as snapshot_module
+from src.snapshot import FilesystemSnapshot
+
+
+@pytest.fixture
+def notebook_dir(tmp_path):
+    (tmp_path / 'logs').mkdir()
+    (tmp_path / 'logs' / 'log.ipynb').write_text('{}')
+    (tmp_path / 'index.ipynb').write_text('{}')
+    (tmp_path / '.ipynb_checkpoints').mkdir()
+    return tmp_path
+
+
+def test_scan(notebook_dir):
+    snapshot = FilesystemSnapshot(notebook_dir)
+    assert snapshot.scan() == 2
+    assert notebook_dir / 'logs' in snapshot
+    assert notebook_dir / '.ipynb_checkpoints' not in snapshot
+    assert snapshot.is_dir(notebook_dir / 'logs')
+    assert snapshot.stat(notebook_dir / 'logs' / 'log.ipynb').size == 2
+
+
+def test_unchanged_directories_are_reused(notebook_dir, tmp_path_factory):
+    snapshot = FilesystemSnapshot(notebook_dir)
+    snapshot.scan()
+    snapshot_path = tmp_path_factory.mktemp('cache') / 'snapshot.json'
+    snapshot.save(snapshot_path)
+
+    new_snapshot = FilesystemSnapshot(notebook_dir)
+    assert new_snapshot.scan(previous=FilesystemSnapshot.load(snapshot_path)) == 0
+    assert new_snapshot.fingerprint() == snapshot.fingerprint()
+
+
+def test_in_place_modification_is_detected(notebook_dir):
+    snapshot = FilesystemSnapshot(notebook_dir)
+    snapshot.scan()
+    directory_mtime = os.stat(notebook_dir / 'logs').st_mtime
+
+    notebook_path = notebook_dir / 'logs' / 'log.ipynb'
+    with open(notebook_path, 'a') as notebook_file:
+        notebook_file.write('\n')
+    # Writing to a file does not modify its directory
+    assert os.stat(notebook_dir / 'logs').st_mtime == directory_mtime
+
+    new_snapshot = FilesystemSnapshot(notebook_dir)
+    assert new_snapshot.scan(previous=snapshot) == 1
+    assert new_snapshot.stat(notebook_path).size == 3
+    assert new_snapshot.fingerprint() != snapshot.fingerprint()
+
+
+def test_unchanged_directories_are_not_listed(notebook_dir, monkeypatch):
+    snapshot = FilesystemSnapshot(notebook_dir)
+    snapshot.scan()
+
+    listed = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(snapshot_module.os, 'scandir', counting_scandir)
+    notebook_path = notebook_dir / 'logs' / 'log.ipynb'
+    with open(notebook_path, 'a') as notebook_file:
+        notebook_file.write('\n')
+    new_snapshot = FilesystemSnapshot(notebook_dir)
+    assert new_snapshot.scan(previous=snapshot) == 1
+    assert listed == []
+    assert new_snapshot.stat(notebook_path).size == 3
+
+    (notebook_dir / 'logs' / 'new.ipynb').write_text('{}')
+    newer_snapshot = FilesystemSnapshot(notebook_dir)
+    newer_snapshot.scan(previous=new_snapshot)
+    assert listed == [notebook_dir / 'logs']
+    assert 'new.ipynb' in newer_snapshot[notebook_dir / 'logs']
+
+
+def test_broken_symlink_is_skipped(notebook_dir):
+    try:
+        os.symlink(notebook_dir / 'missing.ipynb', notebook_dir / 'broken.ipynb')
+    except (OSError, NotImplementedError):
+        pytest.skip('Symbolic links are not supported')
+
+    snapshot = FilesystemSnapshot(notebook_dir)
+    snapshot.scan()
+    assert 'broken.ipynb' not in snapshot[notebook_dir]
+    assert 'index.ipynb' in snapshot[notebook_dir]
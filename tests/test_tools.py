@@ -0,0 +1,53 @@
+from nbformat.v4 import new_markdown_cell, new_raw_cell, new_code_cell, new_output
+
+from src.tools import get_table_of_contents
+
+
+def test_table_of_contents():
+    cells = [new_markdown_cell('# Introduction\nSome text'),
+             new_markdown_cell('## Setup\n### Sample\n## Results')]
+    assert get_table_of_contents(cells) == [
+        [1, 'Introduction', 'Introduction-1', '1', 'Introduction'],
+        [2, 'Setup', 'Setup-11', '1.1', 'Setup'],
+        [3, 'Sample', 'Sample-111', '1.1.1', 'Sample'],
+        [2, 'Results', 'Results-12', '1.2', 'Results']]
+
+
+def test_table_of_contents_threshold():
+    cells = [new_markdown_cell('# Introduction\n## Setup\n### Sample')]
+    assert [entry[1] for entry in get_table_of_contents(cells, threshold=2)] == [
+        'Introduction', 'Setup']
+
+
+def test_table_of_contents_ignores_code_blocks():
+    cells = [new_markdown_cell('## Analysis\n\n```\n# A comment\n```'),
+             new_code_cell('# Not a header')]
+    assert [entry[1] for entry in get_table_of_contents(cells)] == ['Analysis']
+
+
+def test_table_of_contents_levels_include_title():
+    # The page title (see AddTitlePreprocessor) has no id, so it is not
+    # included, but determines the highest level
+    cells = [new_raw_cell('<h1>Notebook</h1>'),
+             new_markdown_cell('## Results\n### Fit')]
+    assert get_table_of_contents(cells) == [
+        [2, 'Results', 'Results-01', '0.1', 'Results'],
+        [3, 'Fit', 'Fit-011', '0.1.1', 'Fit']]
+
+
+def test_table_of_contents_unique_anchors():
+    cells = [new_markdown_cell('# Day 1\n## Results'),
+             new_markdown_cell('# Day 2\n## Results'),
+             new_markdown_cell('# Energy $E_0$ in **eV**')]
+    toc = get_table_of_contents(cells)
+    assert [entry[2] for entry in toc] == [
+        'Day-1-1', 'Results-11', 'Day-2-2', 'Results-21', 'Energy-E_0-in-eV-3']
+    assert toc[-1][1] == 'Energy $E_0$ in eV'
+    assert toc[-1][4] == 'Energy-$E_0$-in-eV'
+
+
+def test_table_of_contents_of_HTML_outputs():
+    cell = new_code_cell('display(HTML(...))', outputs=[
+        new_output('display_data', data={'text/html': '<h1>Output</h1>'})])
+    cells = [cell, new_markdown_cell('## Results')]
+    assert get_table_of_contents(cells)[0][:4] == [2, 'Results', 'Results-01', '0.1']
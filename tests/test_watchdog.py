@@ -0,0 +1,98 @@
+import time
+import threading
+
+import pytest
+
+from src import watchdog as watchdog_module
+from src.watchdog import Watchdog, NotebookLimitExceeded
+
+
+class FakeNotebook:
+    relative_path = 'notebook.ipynb'
+
+    def __init__(self, size: int = 1000):
+        self.size = size
+
+    def stat(self):
+        return self.size, 0
+
+
+def busy_wait(seconds: float):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        pass
+
+
+def test_time_limit():
+    with Watchdog(max_seconds=0.1, interval=0.02) as watchdog:
+        with pytest.raises(NotebookLimitExceeded, match='longer than 0.1 s'):
+            with watchdog.watch(FakeNotebook()):
+                busy_wait(5)
+        assert watchdog.active == {}
+
+        # Conversions within the limit are not interrupted
+        with watchdog.watch(FakeNotebook()):
+            busy_wait(0.05)
+
+
+def test_memory_limit_interrupts_only_the_offender(monkeypatch):
+    monkeypatch.setattr(watchdog_module, 'get_memory_usage', lambda: 2e9)
+    with Watchdog(max_memory=1000, interval=0.02) as watchdog:
+        with pytest.raises(NotebookLimitExceeded, match='Memory usage'):
+            with watchdog.watch(FakeNotebook()):
+                busy_wait(5)
+        assert watchdog.active == {}
+
+        # The memory usage does not drop, but no longer grows either
+        for _ in range(2):
+            with watchdog.watch(FakeNotebook()):
+                busy_wait(0.2)
+
+
+def test_memory_limit_interrupts_once_memory_grows_again(monkeypatch):
+    memory = [2e9]
+    monkeypatch.setattr(watchdog_module, 'get_memory_usage', lambda: memory[0])
+    with Watchdog(max_memory=1000, interval=0.02) as watchdog:
+        with pytest.raises(NotebookLimitExceeded, match='Memory usage'):
+            with watchdog.watch(FakeNotebook()):
+                busy_wait(5)
+
+        with pytest.raises(NotebookLimitExceeded, match='Memory usage 3000 MB'):
+            with watchdog.watch(FakeNotebook()):
+                busy_wait(0.2)
+                memory[0] = 3e9
+                busy_wait(5)
+
+
+def test_notebook_size_limit():
+    watchdog = Watchdog(max_notebook_size=1)
+    watchdog.check_size(FakeNotebook(size=1000))
+    with pytest.raises(NotebookLimitExceeded):
+        watchdog.check_size(FakeNotebook(size=2e6))
+
+
+def test_exception_raised_during_cleanup():
+    class InterruptedLock:
+        """Lock raising the watchdog exception when acquired for cleanup, as
+        if it was raised while waiting for the lock"""
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.acquired = 0
+            self.interrupted = False
+
+        def __enter__(self):
+            self.acquired += 1
+            if self.acquired == 2:
+                self.interrupted = True
+                raise NotebookLimitExceeded()
+            return self.lock.__enter__()
+
+        def __exit__(self, *args):
+            return self.lock.__exit__(*args)
+
+    watchdog = Watchdog()
+    watchdog._lock = InterruptedLock()
+    with watchdog.watch(FakeNotebook()):
+        pass
+    assert watchdog._lock.interrupted
+    assert watchdog.active == {}